@@ -1,80 +1,225 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import delete, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
+import json
 
-from app.core.database import get_db
+from app.core.database import get_session, get_db_size
+from app.core.http_cache import body_etag, conditional_json, etag_matches, make_etag, not_modified
+from app.models.database import (
+    Signal as SignalModel, Trade as TradeModel, PriceBar as PriceBarModel
+)
 from app.models.schemas import (
     MonitoringResponse, MonitoringPair, DatabaseUsage,
-    CleanupRequest, CleanupResponse, SystemStatus
+    CleanupRequest, CleanupResponse, SystemStatus, DetailChartData
+)
+from app.services.data_source import DataSource, DataSourceFactory
+from app.services.refresh_scheduler import refresh_scheduler
+from app.services.adj_factors import adj_factor_store
+from app.services.cold_archive import cold_archive
+from app.services.fundamentals import fundamentals_store
+from app.services.moneyflow import moneyflow_store
+from app.services.tick_store import TICK_TABLES, delete_ticks, iter_rows
+from app.services.rollups import INTRADAY_RANGES, DAILY_RANGES, daily_chart, history_days, intraday_chart
+from app.services.pair_snapshot import (
+    pair_snapshot_store, parse_sort, query_fingerprint, encode_cursor, decode_cursor, RANGE_FIELDS
 )
-from app.services.data_source import DataSourceFactory
 from app.core.config import settings
 
 router = APIRouter()
 
-# 创建数据源实例
-data_source = DataSourceFactory.create_data_source(
-    'tushare',
-    token=settings.tushare_token
-)
+_data_source: Optional[DataSource] = None
+
+
+def get_data_source() -> DataSource:
+    """FastAPI依赖: 获取数据源 (首次使用时创建，导入本模块不初始化数据源)"""
+    global _data_source
+    if _data_source is None:
+        _data_source = DataSourceFactory.create_data_source(
+            settings.data_source_type,
+            token=settings.tushare_token
+        )
+    return _data_source
 
 
 @router.get("/pairs", response_model=MonitoringResponse)
 async def get_monitoring_pairs(
-    limit: int = Query(50, ge=1, le=200, description="返回数量限制"),
+    request: Request,
+    limit: int = Query(50, ge=1, le=200, description="每页数量"),
+    page: int = Query(1, ge=1, description="页码 (提供 cursor 时忽略)"),
+    cursor: Optional[str] = Query(None, description="分页游标"),
+    sort: Optional[str] = Query(None, description="多字段排序, 如 premium:asc,double_low:desc"),
     sort_by: str = Query("stock_change", description="排序字段"),
     sort_order: str = Query("desc", description="排序顺序"),
-    signal_filter: Optional[str] = Query(None, description="信号过滤")
+    signal_filter: Optional[str] = Query(None, description="信号过滤"),
+    min_premium: Optional[float] = Query(None, description="最小溢价率"),
+    max_premium: Optional[float] = Query(None, description="最大溢价率"),
+    min_double_low: Optional[float] = Query(None, description="最小双低值"),
+    max_double_low: Optional[float] = Query(None, description="最大双低值"),
+    min_price: Optional[float] = Query(None, description="最低转债价格"),
+    max_price: Optional[float] = Query(None, description="最高转债价格"),
+    min_remaining_years: Optional[float] = Query(None, description="最短剩余年限"),
+    max_remaining_years: Optional[float] = Query(None, description="最长剩余年限"),
+    min_large_flow: Optional[float] = Query(None, description="正股最小大单净流入占比(%)"),
+    max_large_flow: Optional[float] = Query(None, description="正股最大大单净流入占比(%)"),
+    min_roe: Optional[float] = Query(None, description="正股最小净资产收益率(%)"),
+    max_roe: Optional[float] = Query(None, description="正股最大净资产收益率(%)"),
+    min_debt_ratio: Optional[float] = Query(None, description="正股最小资产负债率(%)"),
+    max_debt_ratio: Optional[float] = Query(None, description="正股最大资产负债率(%)"),
+    min_revenue_yoy: Optional[float] = Query(None, description="正股最小营业收入同比增长率(%)"),
+    max_revenue_yoy: Optional[float] = Query(None, description="正股最大营业收入同比增长率(%)"),
+    data_source: DataSource = Depends(get_data_source)
 ):
-    """获取监控配对数据"""
+    """获取监控配对数据 (基于预排序快照的服务端过滤、排序和分页)"""
+    try:
+        sort_keys = parse_sort(sort, sort_by, sort_order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    ranges = {
+        RANGE_FIELDS['premium']: (min_premium, max_premium),
+        RANGE_FIELDS['double_low']: (min_double_low, max_double_low),
+        RANGE_FIELDS['price']: (min_price, max_price),
+        RANGE_FIELDS['remaining_years']: (min_remaining_years, max_remaining_years),
+        RANGE_FIELDS['large_flow']: (min_large_flow, max_large_flow),
+        RANGE_FIELDS['roe']: (min_roe, max_roe),
+        RANGE_FIELDS['debt_ratio']: (min_debt_ratio, max_debt_ratio),
+        RANGE_FIELDS['revenue_yoy']: (min_revenue_yoy, max_revenue_yoy),
+    }
+    ranges = {field: bounds for field, bounds in ranges.items() if bounds != (None, None)}
+    fingerprint = query_fingerprint(sort_keys, ranges, signal_filter)
+
+    offset = (page - 1) * limit
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if position["fingerprint"] != fingerprint:
+            raise HTTPException(status_code=400, detail="游标与查询条件不匹配")
+        offset = position["offset"]
+
     try:
-        pairs = await data_source.get_monitoring_pairs(limit=limit * 2)  # 获取更多用于筛选
-
-        # 应用筛选
-        if signal_filter == "with_signal":
-            pairs = [p for p in pairs if p.signal_type]
-        elif signal_filter == "no_signal":
-            pairs = [p for p in pairs if not p.signal_type]
-
-        # 应用排序
-        reverse = sort_order == "desc"
-        if sort_by == "stock_change":
-            pairs.sort(key=lambda x: x.stock_change, reverse=reverse)
-        elif sort_by == "bond_change":
-            pairs.sort(key=lambda x: x.bond_change, reverse=reverse)
-        elif sort_by == "premium":
-            pairs.sort(key=lambda x: x.premium, reverse=reverse)
-        elif sort_by == "double_low":
-            pairs.sort(key=lambda x: x.double_low, reverse=reverse)
-
-        # 限制返回数量
-        pairs = pairs[:limit]
-
-        return MonitoringResponse(
-            data=pairs,
-            total=len(pairs),
-            page=1,
-            page_size=limit
+        snapshot = await pair_snapshot_store.get(data_source)
+        if cursor:
+            # 游标固定在第一页所在的快照版本，翻页期间快照重建也不会重复或遗漏配对
+            snapshot = pair_snapshot_store.get_version(position["version"])
+            if snapshot is None:
+                raise HTTPException(status_code=410, detail="游标对应的数据快照已过期，请从第一页重新请求")
+        indices = snapshot.query(sort_keys, ranges, signal_filter)
+
+        # ETag 由快照版本和查询条件决定，未变化时不做序列化
+        etag = make_etag(snapshot.version, fingerprint, offset, limit)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        next_offset = offset + limit
+        next_cursor = (
+            encode_cursor(snapshot.version, next_offset, fingerprint)
+            if next_offset < len(indices) else None
+        )
+
+        body = snapshot.render_page(
+            indices, offset, limit,
+            total=len(indices),
+            page=offset // limit + 1,
+            page_size=limit,
+            next_cursor=next_cursor,
+            snapshot_version=snapshot.version
         )
+        return conditional_json(request, body, etag)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取监控数据失败: {str(e)}")
 
 
+@router.get("/search")
+async def search_stocks(
+    q: str = Query(..., min_length=1, description="代码前缀、名称或拼音首字母"),
+    limit: int = Query(20, ge=1, le=100, description="返回数量限制"),
+    data_source: DataSource = Depends(get_data_source)
+):
+    """搜索股票及其可转债"""
+    return await data_source.search_stocks(q, limit=limit)
+
+
 @router.get("/market-status")
-async def get_market_status():
-    """获取市场状态"""
+async def get_market_status(request: Request, data_source: DataSource = Depends(get_data_source)):
+    """获取市场状态 (由配对快照的全市场行情计算，不调用数据源接口)"""
     try:
-        return await data_source.get_market_status()
+        snapshot = await pair_snapshot_store.get(data_source)
+        etag = make_etag(snapshot.version, "market")
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        status = {**snapshot.regime, 'snapshot_version': snapshot.version}
+        body = json.dumps(status, ensure_ascii=False).encode()
+        return conditional_json(request, body, etag)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取市场状态失败: {str(e)}")
 
 
+@router.get("/chart", response_model=DetailChartData)
+async def get_chart(
+    stock_code: str = Query(..., description="正股代码"),
+    bond_code: Optional[str] = Query(None, description="可转债代码，为空时按正股查找"),
+    time_range: str = Query("1d", pattern="^(1d|5d|1M|3M|1Y)$", description="1d/5d 为分时，其余为日线"),
+    adjust: str = Query("none", pattern="^(none|qfq|hfq)$", description="正股复权方式: 不复权/前复权/后复权"),
+    db: AsyncSession = Depends(get_session),
+    data_source: DataSource = Depends(get_data_source)
+):
+    """正股与可转债图表数据 (分时读取K线汇总表，日线读取历史行情)"""
+    try:
+        if bond_code is None:
+            bonds = await data_source.get_bonds()
+            bond_code = next((bond['ts_code'] for bond in bonds if bond.get('stock_code') == stock_code), None)
+
+        if adjust != 'none' and settings.adj_factor_enabled:
+            await adj_factor_store.ensure_loaded([stock_code])
+
+        async def chart(code, adjust='none'):
+            if code is None:
+                return []
+            if time_range in INTRADAY_RANGES:
+                return await intraday_chart(db, code, time_range, adjust)
+            history = await data_source.get_price_history(code, days=history_days(time_range), adjust=adjust)
+            return daily_chart(history, DAILY_RANGES[time_range])
+
+        # 可转债没有复权因子，始终为原始价格
+        return DetailChartData(
+            stock_chart=await chart(stock_code, adjust),
+            bond_chart=await chart(bond_code),
+            time_range=time_range
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取图表数据失败: {str(e)}")
+
+
+@router.get("/data-source-status")
+async def get_data_source_status(data_source: DataSource = Depends(get_data_source)):
+    """数据源各接口的熔断状态"""
+    breakers = getattr(data_source, 'breakers', None)
+    return {
+        'breakers': breakers.describe() if breakers is not None else {},
+        'revalidating': len(getattr(data_source, '_revalidating', {})),
+        'bond_sync': getattr(data_source, 'last_bond_sync', None),
+        'moneyflow': moneyflow_store.describe(),
+        'fundamentals': fundamentals_store.describe(),
+        'adj_factors': adj_factor_store.describe(),
+    }
+
+
+@router.get("/schedule")
+async def get_refresh_schedule(limit: int = Query(100, ge=1, le=2000, description="返回数量限制")):
+    """获取自适应行情刷新调度 (按优先级降序)"""
+    return refresh_scheduler.describe(limit=limit)
+
+
 @router.get("/database-usage", response_model=DatabaseUsage)
-async def get_database_usage(db: AsyncSession = Depends(get_db)):
+async def get_database_usage(request: Request, db: AsyncSession = Depends(get_session)):
     """获取数据库使用情况"""
     try:
-        from app.core.database import get_db_size
         usage_data = await get_db_size()
 
         # 计算使用百分比 (Railway Hobby: 512MB)
@@ -83,7 +228,7 @@ async def get_database_usage(db: AsyncSession = Depends(get_db)):
         remaining_mb = railway_limit_mb - used_mb
         usage_percentage = (used_mb / railway_limit_mb) * 100
 
-        return DatabaseUsage(
+        usage = DatabaseUsage(
             database={
                 "name": usage_data["database"]["name"],
                 "size": usage_data["database"]["size"],
@@ -102,6 +247,11 @@ async def get_database_usage(db: AsyncSession = Depends(get_db)):
             record_counts=usage_data["record_counts"],
             last_updated=datetime.now().isoformat()
         )
+        # ETag 只取决于容量和记录数，不含更新时间
+        etag = body_etag(json.dumps(
+            [usage_data["database"]["size_bytes"], usage_data["record_counts"]], default=str
+        ).encode())
+        return conditional_json(request, usage.model_dump_json().encode(), etag)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取数据库使用情况失败: {str(e)}")
 
@@ -109,59 +259,76 @@ async def get_database_usage(db: AsyncSession = Depends(get_db)):
 @router.post("/cleanup", response_model=CleanupResponse)
 async def cleanup_data(
     request: CleanupRequest,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_session)
 ):
     """数据清理"""
     try:
         signals_deleted = 0
         trades_deleted = 0
         prices_deleted = 0
-
-        # 构建时间条件
-        time_condition = ""
-        if "hours" in request.time_range:
-            hours = request.time_range["hours"]
-            time_condition = f"AND created_at < NOW() - INTERVAL '{hours} hours'"
-        elif "start_date" in request.time_range and "end_date" in request.time_range:
-            start_date = request.time_range["start_date"]
-            end_date = request.time_range["end_date"]
-            time_condition = f"AND created_at BETWEEN '{start_date}' AND '{end_date}'"
+        # 实际删除前先归档，归档失败时整个清理回滚
+        archive = settings.archive_enabled and not request.preview_only
+        archived = {}
+
+        # 构建时间条件 (encode 把时间转换为紧凑行情表的整数时间列)
+        def time_conditions(column, encode=None):
+            encode = encode or (lambda value: value)
+            if "hours" in request.time_range:
+                cutoff = datetime.now() - timedelta(hours=float(request.time_range["hours"]))
+                return [column < encode(cutoff)]
+            elif "start_date" in request.time_range and "end_date" in request.time_range:
+                start_date = datetime.fromisoformat(str(request.time_range["start_date"]))
+                end_date = datetime.fromisoformat(str(request.time_range["end_date"]))
+                return [column.between(encode(start_date), encode(end_date))]
+            return []
 
         # 清理信号记录
         if "signals" in request.data_types:
-            signal_conditions = [time_condition]
+            signal_conditions = time_conditions(SignalModel.created_at)
 
             # 信号状态过滤
             if request.signal_filters:
-                status_conditions = []
-                if request.signal_filters.get("executed"):
-                    status_conditions.append("status = 'executed'")
-                if request.signal_filters.get("failed"):
-                    status_conditions.append("status = 'failed'")
-                if request.signal_filters.get("pending"):
-                    status_conditions.append("status = 'pending'")
-
-                if status_conditions:
-                    signal_conditions.append(f"({' OR '.join(status_conditions)})")
-
-            signal_where = " AND ".join([c for c in signal_conditions if c])
-            if signal_where:
-                result = await db.execute(f"DELETE FROM signals WHERE {signal_where}")
+                statuses = [
+                    status for status in ("executed", "failed", "pending")
+                    if request.signal_filters.get(status)
+                ]
+                if statuses:
+                    signal_conditions.append(SignalModel.status.in_(statuses))
+
+            if signal_conditions:
+                if archive:
+                    archived["signals"] = await cold_archive.archive(db, "signals", signal_conditions)
+                result = await db.execute(delete(SignalModel).where(*signal_conditions))
                 signals_deleted = result.rowcount
 
         # 清理交易记录
         if "trades" in request.data_types:
-            trade_where = time_condition.replace("created_at", "created_at")
-            if trade_where:
-                result = await db.execute(f"DELETE FROM trades WHERE {trade_where}")
+            trade_conditions = time_conditions(TradeModel.created_at)
+            if trade_conditions:
+                if archive:
+                    archived["trades"] = await cold_archive.archive(db, "trades", trade_conditions)
+                result = await db.execute(delete(TradeModel).where(*trade_conditions))
                 trades_deleted = result.rowcount
 
-        # 清理价格数据
+        # 清理价格数据 (标准、紧凑、按分钟打包三种存储)
         if "price_cache" in request.data_types:
-            price_where = time_condition.replace("created_at", "timestamp")
-            if price_where:
-                result = await db.execute(f"DELETE FROM price_ticks WHERE {price_where}")
-                prices_deleted = result.rowcount
+            for model, column, encode in TICK_TABLES:
+                price_conditions = time_conditions(column, encode)
+                if not price_conditions:
+                    continue
+                if archive:
+                    archived["price_ticks"] = archived.get("price_ticks", 0) + await cold_archive.archive_rows(
+                        "price_ticks", iter_rows(db, model, price_conditions)
+                    )
+                prices_deleted += await delete_ticks(db, model, price_conditions)
+
+        # 清理K线汇总
+        bars_deleted = 0
+        if "price_bars" in request.data_types:
+            bar_conditions = time_conditions(PriceBarModel.bar_time)
+            if bar_conditions:
+                result = await db.execute(delete(PriceBarModel).where(*bar_conditions))
+                bars_deleted = result.rowcount
 
         # 预览模式
         preview_data = None
@@ -169,53 +336,63 @@ async def cleanup_data(
             preview_data = {
                 "signals_to_delete": signals_deleted,
                 "trades_to_delete": trades_deleted,
-                "prices_to_delete": prices_deleted
+                "prices_to_delete": prices_deleted,
+                "bars_to_delete": bars_deleted
             }
             # 回滚删除操作
             await db.rollback()
             signals_deleted = 0
             trades_deleted = 0
             prices_deleted = 0
+            bars_deleted = 0
 
         return CleanupResponse(
             signals_deleted=signals_deleted,
             trades_deleted=trades_deleted,
             prices_deleted=prices_deleted,
+            bars_deleted=bars_deleted,
             cache_cleared="price_cache" in request.data_types and not request.preview_only,
-            preview_data=preview_data
+            preview_data=preview_data,
+            archived=archived or None
         )
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"数据清理失败: {str(e)}")
 
 
+@router.get("/archive")
+async def get_archive_status():
+    """冷归档文件概况"""
+    return cold_archive.describe()
+
+
 @router.get("/system-status", response_model=SystemStatus)
-async def get_system_status(db: AsyncSession = Depends(get_db)):
+async def get_system_status(request: Request, db: AsyncSession = Depends(get_session)):
     """获取系统状态"""
     try:
         # 获取今日信号统计
-        result = await db.execute("""
+        result = await db.execute(text("""
             SELECT COUNT(*) as total_signals
             FROM signals
             WHERE DATE(created_at) = CURRENT_DATE
-        """)
+        """))
         total_signals_today = result.scalar() or 0
 
         # 获取今日执行交易统计
-        result = await db.execute("""
+        result = await db.execute(text("""
             SELECT COUNT(*) as executed_trades
             FROM trades
             WHERE DATE(created_at) = CURRENT_DATE
             AND order_status = 'filled'
-        """)
+        """))
         executed_trades_today = result.scalar() or 0
 
         # 获取待处理信号
-        result = await db.execute("""
+        result = await db.execute(text("""
             SELECT COUNT(*) as pending_signals
             FROM signals
             WHERE status = 'pending'
-        """)
+        """))
         pending_signals = result.scalar() or 0
 
         # 获取数据库使用率
@@ -223,7 +400,7 @@ async def get_system_status(db: AsyncSession = Depends(get_db)):
         used_mb = usage_data["database"]["size_bytes"] / (1024 * 1024)
         usage_percentage = (used_mb / 512) * 100  # Railway Hobby 512MB
 
-        return SystemStatus(
+        status = SystemStatus(
             monitoring_active=True,  # 暂时固定为活跃
             total_signals_today=total_signals_today,
             executed_trades_today=executed_trades_today,
@@ -231,5 +408,10 @@ async def get_system_status(db: AsyncSession = Depends(get_db)):
             database_usage_percent=round(usage_percentage, 2),
             last_update=datetime.now()
         )
+        # ETag 只取决于统计值，不含更新时间
+        etag = make_etag(
+            total_signals_today, executed_trades_today, pending_signals, status.database_usage_percent
+        )
+        return conditional_json(request, status.model_dump_json().encode(), etag)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取系统状态失败: {str(e)}")
@@ -0,0 +1,88 @@
+"""
+熔断器
+
+按接口统计连续失败次数，超过阈值后熔断(open)，在冷却期内直接拒绝请求，
+冷却结束后放行一个探测请求(half_open)，成功则恢复(closed)，失败则重新熔断。
+Tushare 故障期间请求不再逐个等待超时，调用方改为返回缓存中的旧数据。
+"""
+
+import time
+from typing import Dict, Optional
+
+from app.core.metrics import metrics
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """单个接口的熔断器"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    def allow(self) -> bool:
+        """是否放行本次请求"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN and not self._probing:
+            # 半开状态只放行一个探测请求
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self._probing = False
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            if self.state != OPEN:
+                metrics.inc(f"circuit_breaker_opened_total_{self.name}")
+            self._set_state(OPEN)
+
+    def release(self):
+        """探测请求被取消 (未得到结果，不计成功或失败)，让下一个请求重新探测"""
+        self._probing = False
+
+    def _set_state(self, state: str):
+        self.state = state
+        metrics.set_gauge(f"circuit_breaker_open_{self.name}", 0 if state == CLOSED else 1)
+
+    def describe(self) -> Dict:
+        retry_in = None
+        if self.state == OPEN:
+            retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 1)
+        return {'state': self.state, 'failures': self.failures, 'retry_in': retry_in}
+
+
+class CircuitBreakerRegistry:
+    """按接口名懒创建熔断器"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            breaker = self.breakers[name] = CircuitBreaker(name, self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    def describe(self) -> Dict[str, Dict]:
+        return {name: breaker.describe() for name, breaker in sorted(self.breakers.items())}
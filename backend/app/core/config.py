@@ -10,6 +10,13 @@ class Settings(BaseSettings):
     # Tushare API配置
     tushare_token: str = ""
 
+    # 数据源配置 (tushare / simulated)
+    data_source_type: str = "tushare"
+    simulation_seed: int = 42  # 仿真行情随机种子
+    simulation_bonds: int = 500  # 仿真可转债数量
+    simulation_stocks: int = 0  # 仿真正股数量 (不少于可转债数量)
+    simulation_tick_interval: float = 3.0  # 仿真每步推进的秒数
+
     # Redis配置 (可选)
     redis_url: Optional[str] = None
 
@@ -25,12 +32,86 @@ class Settings(BaseSettings):
     # 监控配置
     monitoring_interval: int = 60  # 价格监控间隔(秒)
     signal_check_interval: int = 30  # 信号检测间隔(秒)
+    snapshot_max_pairs: int = 1000  # 配对快照覆盖的最大可转债数量
+    market_bull_breadth: float = 0.6  # 正股上涨家数占比不低于该值 (且涨跌幅中位数为正) 时为强势
+    market_bear_breadth: float = 0.4  # 上涨家数占比不高于该值 (且涨跌幅中位数为负) 时为弱势
+    quote_cache_size: int = 5000  # 行情缓存最大条目数
+    trade_cal_cache_path: str = "data/trade_cal.json"  # 交易日历本地缓存
+    bond_sync_enabled: bool = True  # 可转债列表写入 bonds 表，Tushare 不可用时从表中加载
+
+    # 盘中实时行情轮询配置 (realtime_quote 批量接口)
+    quote_poller_enabled: bool = False
+    quote_poll_interval: float = 3.0  # 全市场轮询间隔(秒)
+    quote_batch_size: int = 50  # 每次请求的代码数 (sina 源上限50)
+    quote_poll_concurrency: int = 4  # 并发请求的分片数
+    quote_persist_ticks: bool = True  # 是否写入 price_ticks
+    tick_storage_mode: str = "standard"  # standard / compact (整数编码) / packed (每代码每分钟一行)
+    bar_rollups_enabled: bool = True  # 写入行情时增量维护 1/5 分钟K线 (图表接口使用)
+
+    # 信号检测配置
+    signal_engine_enabled: bool = False  # 随行情轮询检测信号并写入 signals 表
+    signal_workers: int = 2  # 检测工作进程数，0 表示在主进程中检测
+    signal_ring_capacity: int = 65536  # 每个工作进程的共享内存环形缓冲区容量(条)
+    big_rise_threshold: float = 5.0  # 大涨信号阈值(%)
+    volume_spike_ratio: float = 5.0  # 放量信号: 单笔成交量增量 / 近期平均增量
+
+    # 资金流向配置 (moneyflow 接口需要2000积分，按交易日整批获取)
+    moneyflow_enabled: bool = False
+    moneyflow_check_interval: float = 1800.0  # 检查盘后数据是否发布的间隔(秒)
+    volume_spike_min_large_flow: float = 0.0  # 放量信号要求正股上一交易日大单净流入占比(%)不低于该值，无数据时不限制
+
+    # 财务指标配置 (fina_indicator_vip 接口需要5000积分，按报告期整批获取)
+    fundamentals_enabled: bool = False
+    fundamentals_periods: int = 2  # 每次拉取的最近报告期数 (新报告期披露期间沿用上一期)
+    fundamentals_check_interval: float = 3600.0  # 检查是否需要当日更新的间隔(秒)
+
+    # 复权因子配置 (adj_factor 接口需要2000积分，按交易日整批获取)
+    adj_factor_enabled: bool = False
+    adj_factor_window_days: int = 300  # 保留的最近交易日数 (覆盖日线图表的最长区间)
+    adj_factor_batch_dates: int = 20  # 每个周期最多补齐的交易日数
+    adj_factor_check_interval: float = 600.0  # 检查新交易日因子的间隔(秒)
+
+    # 自适应刷新调度配置
+    adaptive_refresh_enabled: bool = True  # 按优先级分配各代码刷新频率
+    quote_call_budget: int = 200  # 行情轮询每分钟调用预算
+    favorite_codes: str = ""  # 自选代码，逗号分隔
+
+    # Tushare 故障保护配置
+    tushare_request_timeout: float = 10.0  # 单次请求超时(秒)
+    circuit_failure_threshold: int = 5  # 连续失败多少次后熔断
+    circuit_reset_timeout: float = 30.0  # 熔断后多久放行探测请求(秒)
+    stale_max_age: int = 86400  # 缓存过期后仍可作为旧数据返回的时长(秒)
+
+    # 事件循环看门狗配置
+    loop_watchdog_enabled: bool = True
+    loop_watchdog_interval: float = 0.5  # 心跳间隔(秒)
+    loop_slow_callback_threshold: float = 1.0  # 慢回调阈值(秒)
+
+    # 请求分析配置 (关闭时不挂载中间件)
+    profiling_enabled: bool = False
+    profiling_token: str = ""  # 非空时需在 X-Profile-Token 请求头中携带
+    profiling_interval: float = 0.005  # 采样间隔(秒)
+    profiling_output_dir: str = "logs/profiles"
 
     # 清理配置
     auto_cleanup_hours: int = 24  # 自动清理间隔(小时)
     price_retention_hours: int = 24  # 价格数据保留时间
     signal_retention_hours: int = 24  # 信号数据保留时间
     trade_retention_days: int = 7  # 交易数据保留时间
+    archive_enabled: bool = True  # 清理前把过期数据归档为压缩列式文件 (需要 pyarrow)
+    archive_dir: str = "data/archive"
+    archive_compression: str = "zstd"  # zstd / lz4，空字符串表示不压缩
+
+    # 主节点选举配置 (多工作进程 / 多副本时后台任务只在主节点运行)
+    leader_election_enabled: bool = False
+    leader_lock_path: str = ""  # 锁文件路径；为空时 SQLite 使用数据库旁的锁文件，PostgreSQL 使用 advisory lock
+    leader_lease_seconds: float = 10.0  # 超过该时长未续约的主节点主动退位
+    leader_renew_interval: float = 1.0  # 续约 / 从节点重试间隔(秒)
+
+    # 热状态检查点配置 (重启后恢复行情缓存、检测窗口和调度优先级)
+    warm_state_enabled: bool = True
+    warm_state_path: str = ""  # 本地文件路径，为空时保存在 system_snapshots 表
+    warm_state_interval: float = 60.0  # 定期保存间隔(秒)
 
     # 交易配置
     trading_enabled: bool = False
@@ -1,12 +1,17 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
-from sqlalchemy import text
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.exc import DBAPIError
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
+import hashlib
+import logging
 
 from app.core.config import settings
-from app.models.database import Base
+from app.models.database import Base, SchemaVersion
+
+logger = logging.getLogger(__name__)
 
 # 创建异步数据库引擎
 database_url = settings.database_url
@@ -44,12 +49,51 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+async def get_session() -> AsyncGenerator[AsyncSession, None]:
+    """FastAPI依赖: 获取数据库会话"""
+    async with get_db() as session:
+        yield session
+
+
 async def create_tables():
     """创建所有表"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
 
+def schema_fingerprint() -> str:
+    """当前模型的表结构指纹 (表、列、类型和索引)"""
+    parts = []
+    for table in sorted(Base.metadata.tables.values(), key=lambda t: t.name):
+        for column in table.columns:
+            parts.append(f"{table.name}.{column.name}:{column.type!r}:{column.primary_key}:{column.nullable}")
+        parts.extend(f"{table.name}#{index.name}" for index in sorted(table.indexes, key=lambda i: i.name))
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()[:16]
+
+
+async def ensure_schema() -> bool:
+    """检查表结构版本: 与当前模型一致时只需一次查询；否则建表并记录版本，返回是否执行了建表
+
+    create_all 只创建缺少的表和索引，已有表的列变更仍需迁移。
+    """
+    fingerprint = schema_fingerprint()
+    try:
+        async with engine.connect() as conn:
+            current = (await conn.execute(select(SchemaVersion.fingerprint).where(SchemaVersion.id == 1))).scalar()
+    except DBAPIError:
+        current = None  # 新数据库，版本表还不存在
+    if current == fingerprint:
+        return False
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(delete(SchemaVersion))
+        await conn.execute(insert(SchemaVersion).values(id=1, fingerprint=fingerprint))
+    if current is not None:
+        logger.warning(f"表结构版本已变化 ({current} -> {fingerprint})，已创建缺少的表，已有表的列变更需要迁移")
+    return True
+
+
 async def drop_tables():
     """删除所有表"""
     async with engine.begin() as conn:
@@ -109,16 +153,16 @@ async def get_db_size() -> dict:
                 }
         else:
             # PostgreSQL数据库大小查询
-            result = await session.execute("""
+            result = await session.execute(text("""
                 SELECT
                     current_database() as db_name,
                     pg_size_pretty(pg_database_size(current_database())) as db_size,
                     pg_database_size(current_database()) as db_size_bytes
-            """)
+            """))
             db_info = result.first()
 
             # 获取各表大小
-            result = await session.execute("""
+            result = await session.execute(text("""
                 SELECT
                     schemaname,
                     tablename,
@@ -127,22 +171,26 @@ async def get_db_size() -> dict:
                 FROM pg_tables
                 WHERE schemaname = 'public'
                 ORDER BY pg_total_relation_size(schemaname||'.'||tablename) DESC
-            """)
+            """))
             tables = result.fetchall()
 
             # 获取记录数统计
-            result = await session.execute("""
+            result = await session.execute(text("""
                 SELECT
                     'bonds' as table_name, COUNT(*) as count FROM bonds
                 UNION ALL
                 SELECT 'price_ticks' as table_name, COUNT(*) as count FROM price_ticks
                 UNION ALL
+                SELECT 'price_ticks_compact' as table_name, COUNT(*) as count FROM price_ticks_compact
+                UNION ALL
+                SELECT 'price_ticks_packed' as table_name, COUNT(*) as count FROM price_ticks_packed
+                UNION ALL
                 SELECT 'signals' as table_name, COUNT(*) as count FROM signals
                 UNION ALL
                 SELECT 'trades' as table_name, COUNT(*) as count FROM trades
                 UNION ALL
                 SELECT 'system_snapshots' as table_name, COUNT(*) as count FROM system_snapshots
-            """)
+            """))
             record_counts = result.fetchall()
 
             return {
@@ -0,0 +1,58 @@
+"""
+条件请求 (ETag / If-None-Match) 辅助函数
+
+轮询接口返回带 ETag 的 JSON；客户端携带匹配的 If-None-Match 时直接返回 304，不再传输响应体。
+"""
+
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+
+JSON_MEDIA_TYPE = "application/json"
+# 允许浏览器缓存，但每次使用前必须重新验证
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(*parts) -> str:
+    """由版本号等标识生成弱 ETag"""
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def body_etag(body: bytes) -> str:
+    """由响应体内容生成弱 ETag"""
+    return make_etag(hashlib.md5(body).hexdigest()[:16])
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """检查 If-None-Match 是否命中"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # 弱比较: 忽略 W/ 前缀
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def conditional_json(request: Request, body: bytes, etag: Optional[str] = None) -> Response:
+    """返回带 ETag 的 JSON 响应，命中 If-None-Match 时返回 304"""
+    etag = etag or body_etag(body)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return Response(
+        content=body,
+        media_type=JSON_MEDIA_TYPE,
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
@@ -0,0 +1,214 @@
+"""
+主节点选举
+
+多个 uvicorn 工作进程或多个副本同时运行时，行情轮询、信号检测、热状态检查点和配对快照构建
+只应由一个进程执行，否则 Tushare 调用和数据库写入会成倍增加。各进程竞争同一把锁，
+持有锁的进程为主节点 (leader)，其余为从节点 (follower)，只提供读取:
+- PostgreSQL: 会话级 advisory lock (pg_try_advisory_lock)，锁随持有连接存在，进程退出或连接断开时由服务器释放
+- SQLite / 单机: 锁文件上的 flock，进程退出时由操作系统释放
+主节点每隔 renew_interval 续约 (检查锁连接仍然可用)，续约失败或距上次成功续约超过 lease_seconds
+(如事件循环被长时间阻塞) 时主动退位并释放锁；从节点每隔 renew_interval 尝试获取锁，
+主节点退出后在一个续约间隔内接管。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import zlib
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows 只支持 advisory lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class FileLock:
+    """锁文件上的排他 flock (同一台机器上的多个进程)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    async def acquire(self) -> bool:
+        if fcntl is None:
+            raise RuntimeError("当前平台不支持文件锁，请使用 PostgreSQL")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        f = open(self.path, 'a+')
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return await self.renew()
+
+    async def renew(self) -> bool:
+        # flock 不会过期，这里只写入持有者信息供排查
+        try:
+            self._file.seek(0)
+            self._file.truncate()
+            self._file.write(json.dumps({'pid': os.getpid(), 'host': socket.gethostname(), 'renewed_at': time.time()}))
+            self._file.flush()
+            return True
+        except OSError as e:
+            logger.warning(f"续约锁文件失败: {e}")
+            return False
+
+    async def release(self):
+        if self._file is not None:
+            try:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            finally:
+                self._file.close()
+                self._file = None
+
+
+class AdvisoryLock:
+    """PostgreSQL 会话级 advisory lock (跨节点)"""
+
+    def __init__(self, engine, name: str):
+        self.engine = engine
+        self.key = zlib.crc32(name.encode())
+        self._conn = None
+
+    async def acquire(self) -> bool:
+        conn = await self.engine.connect()
+        try:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            acquired = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {'key': self.key})).scalar()
+        except Exception:
+            await conn.close()
+            raise
+        if not acquired:
+            await conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    async def renew(self) -> bool:
+        try:
+            await asyncio.wait_for(self._conn.execute(text("SELECT 1")), timeout=settings.leader_renew_interval)
+            return True
+        except Exception as e:
+            logger.warning(f"advisory lock 连接不可用: {e}")
+            return False
+
+    async def release(self):
+        if self._conn is not None:
+            try:
+                await self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': self.key})
+            except Exception:
+                pass  # 连接已断开时锁已由服务器释放
+            finally:
+                await self._conn.close()
+                self._conn = None
+
+
+def default_lock(name: str):
+    """按数据库类型选择锁: 配置了锁文件路径或使用 SQLite 时用文件锁，否则用 advisory lock"""
+    from app.core.database import database_url, engine
+
+    if settings.leader_lock_path:
+        return FileLock(settings.leader_lock_path)
+    if 'sqlite' in database_url:
+        db_path = database_url.split(':///', 1)[-1]
+        return FileLock(f"{db_path}.{name}.lock")
+    return AdvisoryLock(engine, name)
+
+
+class LeaderElection:
+    """竞争锁并在成为主节点 / 退位时回调"""
+
+    def __init__(self, lock=None, name: str = "bond-monitoring",
+                 on_elected: Optional[Callable[[], Awaitable]] = None,
+                 on_demoted: Optional[Callable[[], Awaitable]] = None,
+                 lease_seconds: Optional[float] = None, renew_interval: Optional[float] = None):
+        self.lock = lock if lock is not None else default_lock(name)
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.lease_seconds = lease_seconds or settings.leader_lease_seconds
+        self.renew_interval = renew_interval or settings.leader_renew_interval
+        self.is_leader = False
+        self.elected_at: Optional[float] = None
+        self._renewed_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """先同步尝试一次 (单进程部署立即成为主节点)，再在后台续约或重试"""
+        await self._step()
+        self._task = asyncio.create_task(self.run(), name="leader-election")
+
+    async def stop(self):
+        """停止选举；是主节点时先执行退位回调再释放锁，让其他进程立即接管"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._demote("进程退出")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.renew_interval)
+            try:
+                await self._step()
+            except Exception as e:
+                logger.error(f"主节点选举失败: {e}")
+
+    async def _step(self):
+        if self.is_leader:
+            overdue = time.monotonic() - self._renewed_at > self.lease_seconds
+            if overdue or not await self.lock.renew():
+                await self._demote("租约超时" if overdue else "续约失败")
+                return
+            self._renewed_at = time.monotonic()
+            return
+
+        if not await self.lock.acquire():
+            return
+        self.is_leader = True
+        self.elected_at = time.time()
+        self._renewed_at = time.monotonic()
+        metrics.set_gauge("leader", 1)
+        metrics.inc("leader_elections_total")
+        logger.info(f"成为主节点 (pid {os.getpid()})")
+        if self.on_elected is not None:
+            try:
+                await self.on_elected()
+            except Exception as e:
+                logger.error(f"启动主节点任务失败: {e}")
+                await self._demote("启动任务失败")
+
+    async def _demote(self, reason: str):
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        self.elected_at = None
+        metrics.set_gauge("leader", 0)
+        logger.warning(f"退出主节点: {reason}")
+        try:
+            if self.on_demoted is not None:
+                await self.on_demoted()
+        finally:
+            await self.lock.release()
+
+    def describe(self) -> dict:
+        return {
+            'pid': os.getpid(),
+            'is_leader': self.is_leader,
+            'elected_at': self.elected_at,
+            'lock': type(self.lock).__name__,
+        }
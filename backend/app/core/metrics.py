@@ -0,0 +1,70 @@
+"""
+进程内指标注册表
+
+提供简单的计数器/仪表盘指标，供 /metrics 接口导出。
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class MetricsRegistry:
+    """线程安全的进程内指标注册表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._gauges: Dict[str, float] = {}
+        self._counters: Dict[str, float] = {}
+        self._updated_at: Dict[str, float] = {}
+
+    def set_gauge(self, name: str, value: float):
+        """设置仪表盘指标"""
+        with self._lock:
+            self._gauges[name] = value
+            self._updated_at[name] = time.time()
+
+    def max_gauge(self, name: str, value: float):
+        """仅在新值更大时更新仪表盘指标(用于记录峰值)"""
+        with self._lock:
+            if value > self._gauges.get(name, float("-inf")):
+                self._gauges[name] = value
+                self._updated_at[name] = time.time()
+
+    def inc(self, name: str, value: float = 1):
+        """累加计数器指标"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+            self._updated_at[name] = time.time()
+
+    def get(self, name: str) -> Optional[float]:
+        """读取指标当前值"""
+        with self._lock:
+            if name in self._gauges:
+                return self._gauges[name]
+            return self._counters.get(name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """导出全部指标"""
+        with self._lock:
+            return {
+                "gauges": dict(self._gauges),
+                "counters": dict(self._counters),
+                "updated_at": dict(self._updated_at),
+            }
+
+    def to_prometheus(self) -> str:
+        """导出为 Prometheus 文本格式"""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self._gauges.items()):
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+            for name, value in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标实例
+metrics = MetricsRegistry()
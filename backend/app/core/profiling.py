@@ -0,0 +1,165 @@
+"""
+按请求开启的采样分析中间件
+
+仅当 settings.profiling_enabled 为真时才挂载到应用上，关闭时没有任何额外开销。
+请求携带 `X-Profile: 1` 请求头或 `?profile=1` 查询参数时，
+后台线程按固定间隔采样调用栈，按 Tushare / 数据库 / 纯Python 分类统计耗时，
+通过 `Server-Timing` 响应头返回汇总，并把折叠栈文件写入输出目录(可直接用于 flamegraph.pl)。
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Optional
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+# 按调用栈中的模块路径归类耗时
+_TUSHARE_MARKERS = ("tushare", "requests", "urllib3", "http/client")
+_DB_MARKERS = ("sqlalchemy", "asyncpg", "aiosqlite", "sqlite3")
+# 事件循环空闲等待 I/O 时的栈顶函数
+_IDLE_FUNCTIONS = {"select", "poll", "epoll", "_run_once"}
+
+
+def _classify(frames) -> str:
+    """根据调用栈归类: tushare / db / idle / python"""
+    for frame in frames:
+        filename = frame.f_code.co_filename
+        if any(marker in filename for marker in _TUSHARE_MARKERS):
+            return "tushare"
+        if any(marker in filename for marker in _DB_MARKERS):
+            return "db"
+    if frames and frames[0].f_code.co_name in _IDLE_FUNCTIONS:
+        return "idle"
+    return "python"
+
+
+class StackSampler:
+    """在独立线程中周期性采样指定线程的调用栈"""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.categories: Counter = Counter()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.started_at = 0.0
+        self.duration = 0.0
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(frame)
+                    frame = frame.f_back
+                category = _classify(frames)
+                # 其他线程(如线程池中的同步SDK调用)只统计 Tushare 和数据库时间
+                if thread_id != self.thread_id and category not in ("tushare", "db"):
+                    continue
+                self.categories[category] += 1
+                stack = ";".join(
+                    f"{f.f_code.co_name} ({os.path.basename(f.f_code.co_filename)}:{f.f_lineno})"
+                    for f in reversed(frames)
+                )
+                self.stacks[stack] += 1
+
+    def summary(self) -> Dict[str, float]:
+        """各分类耗时估算(毫秒)"""
+        total = sum(self.categories.values()) or 1
+        duration_ms = self.duration * 1000
+        return {
+            category: round(duration_ms * count / total, 2)
+            for category, count in self.categories.items()
+        }
+
+    def write_collapsed(self, path: str):
+        """写出折叠栈文件"""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    """按请求开启的采样分析 ASGI 中间件"""
+
+    def __init__(self, app, output_dir: str = "logs/profiles", interval: float = 0.005,
+                 token: str = "", path_prefix: str = "/api/monitoring"):
+        self.app = app
+        self.output_dir = output_dir
+        self.interval = interval
+        self.token = token
+        self.path_prefix = path_prefix
+
+    def _should_profile(self, scope) -> bool:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            return False
+
+        headers = dict(scope.get("headers") or [])
+        query = parse_qs(scope.get("query_string", b"").decode())
+        requested = headers.get(b"x-profile") == b"1" or query.get("profile", [""])[0] == "1"
+        if not requested:
+            return False
+
+        # 配置了令牌时需要校验
+        if self.token and headers.get(b"x-profile-token", b"").decode() != self.token:
+            return False
+        return True
+
+    async def __call__(self, scope, receive, send):
+        if not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:12]
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        stopped = False
+
+        def finish():
+            nonlocal stopped
+            if not stopped:
+                sampler.stop()
+                stopped = True
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                finish()
+                timing = ", ".join(f"{name};dur={ms}" for name, ms in sampler.summary().items())
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.encode()))
+                headers.append((b"x-profile-id", profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+            try:
+                os.makedirs(self.output_dir, exist_ok=True)
+                path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{profile_id}.collapsed")
+                sampler.write_collapsed(path)
+                logger.info(f"请求分析完成 {scope['path']} [{profile_id}]: {sampler.summary()} -> {path}")
+            except OSError as e:
+                logger.error(f"写入分析文件失败: {e}")
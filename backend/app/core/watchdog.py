@@ -0,0 +1,93 @@
+"""
+事件循环看门狗
+
+- 协程心跳: 按固定间隔 sleep，测量实际唤醒时间与预期时间之差，即事件循环调度延迟
+- 监视线程: 若心跳超过阈值未更新，说明有回调阻塞了事件循环，
+  立即抓取事件循环线程的调用栈并记录日志，定位是哪个调用(如同步的 Tushare 请求)卡住了循环
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LoopWatchdog:
+    """事件循环延迟与慢回调看门狗"""
+
+    def __init__(self, interval: float = 0.5, slow_threshold: float = 1.0):
+        self.interval = interval  # 心跳间隔(秒)
+        self.slow_threshold = slow_threshold  # 慢回调阈值(秒)
+
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._stall_reported = False
+
+    async def start(self):
+        """启动心跳协程和监视线程"""
+        if self._task is not None:
+            return
+
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name="loop-watchdog")
+        self._thread = threading.Thread(target=self._monitor, name="loop-watchdog-monitor", daemon=True)
+        self._thread.start()
+        logger.info(f"事件循环看门狗已启动 (间隔 {self.interval}s, 阈值 {self.slow_threshold}s)")
+
+    async def stop(self):
+        """停止看门狗"""
+        self._stop_event.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
+    async def _heartbeat(self):
+        """周期性测量事件循环调度延迟"""
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._last_beat = now
+
+            metrics.set_gauge("event_loop_lag_seconds", round(lag, 6))
+            metrics.max_gauge("event_loop_lag_max_seconds", round(lag, 6))
+
+            if lag >= self.slow_threshold:
+                metrics.inc("event_loop_slow_callbacks_total")
+                logger.warning(f"事件循环阻塞 {lag:.3f}s (阈值 {self.slow_threshold}s)")
+            self._stall_reported = False
+
+    def _monitor(self):
+        """在独立线程中检测卡死，并抓取事件循环线程的调用栈"""
+        check_interval = min(self.interval, self.slow_threshold) / 2
+        while not self._stop_event.wait(check_interval):
+            stalled_for = time.monotonic() - self._last_beat - self.interval
+            if stalled_for < self.slow_threshold or self._stall_reported:
+                continue
+
+            self._stall_reported = True
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            logger.warning(f"事件循环已阻塞超过 {stalled_for:.3f}s，当前调用栈:\n{stack}")
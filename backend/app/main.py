@@ -1,12 +1,23 @@
+import time
+_import_started = time.perf_counter()  # 统计导入耗时 (须在其他导入之前)
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 import asyncio
 import logging
 
 from app.core.config import settings
-from app.core.database import create_tables
-from app.api.monitoring import router as monitoring_router
+from app.core.database import ensure_schema
+from app.core.compression import CompressionMiddleware
+from app.core.metrics import metrics
+from app.core.profiling import ProfilingMiddleware
+from app.core.watchdog import LoopWatchdog
+from app.api.monitoring import router as monitoring_router, get_data_source
+from app.core.leader import LeaderElection
+from app.services.background_jobs import BackgroundJobs
+from app.services.pair_snapshot import pair_snapshot_store
 
 # 配置日志
 logging.basicConfig(
@@ -15,22 +26,58 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     logger.info("启动可转债监控平台...")
+    boot_started = time.perf_counter()
 
-    # 启动时创建数据库表
+    # 检查表结构版本 (与模型一致时不执行建表)
     try:
-        await create_tables()
-        logger.info("数据库表创建完成")
+        if await ensure_schema():
+            logger.info("数据库表创建完成")
     except Exception as e:
         logger.error(f"数据库表创建失败: {e}")
 
+    # 启动事件循环看门狗
+    watchdog = None
+    if settings.loop_watchdog_enabled:
+        watchdog = LoopWatchdog(
+            interval=settings.loop_watchdog_interval,
+            slow_threshold=settings.loop_slow_callback_threshold
+        )
+        await watchdog.start()
+
+    # 后台任务: 开启主节点选举时只在主节点上运行
+    jobs = BackgroundJobs(get_data_source, publish_snapshots=settings.leader_election_enabled)
+    election = None
+    if settings.leader_election_enabled:
+        pair_snapshot_store.shared = True
+        get_data_source().follower = True  # 成为主节点前只读取主节点写入的数据
+        election = LeaderElection(on_elected=jobs.start, on_demoted=jobs.stop)
+        await election.start()
+        app.state.leader_election = election
+    else:
+        await jobs.start()
+
+    boot_seconds = time.perf_counter() - boot_started
+    metrics.set_gauge("startup_import_seconds", IMPORT_SECONDS)
+    metrics.set_gauge("startup_boot_seconds", boot_seconds)
+    logger.info(f"启动完成: 导入 {IMPORT_SECONDS:.3f}s, 初始化 {boot_seconds:.3f}s")
+
     yield
 
     logger.info("关闭可转债监控平台...")
+    if election:
+        # 停止主节点任务后释放锁，其他进程立即接管
+        await election.stop()
+    else:
+        await jobs.stop()
+    if watchdog:
+        await watchdog.stop()
 
 
 # 创建FastAPI应用
@@ -50,6 +97,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 响应压缩 (brotli/gzip)
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+# 按请求采样分析 (仅在配置开启时挂载)
+if settings.profiling_enabled:
+    app.add_middleware(
+        ProfilingMiddleware,
+        output_dir=settings.profiling_output_dir,
+        interval=settings.profiling_interval,
+        token=settings.profiling_token
+    )
+
 # 注册路由
 app.include_router(
     monitoring_router,
@@ -79,6 +138,23 @@ async def health_check():
     }
 
 
+@app.get("/leader")
+async def get_leader():
+    """当前进程的主节点选举状态"""
+    election = getattr(app.state, "leader_election", None)
+    if election is None:
+        return {"enabled": False, "is_leader": True}
+    return {"enabled": True, **election.describe()}
+
+
+@app.get("/metrics")
+async def get_metrics(format: str = "json"):
+    """运行指标 (format=prometheus 时输出文本格式)"""
+    if format == "prometheus":
+        return PlainTextResponse(metrics.to_prometheus())
+    return metrics.snapshot()
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, DECIMAL, TIMESTAMP, BIGINT, ForeignKey, Index
+from sqlalchemy import (
+    Column, Integer, SmallInteger, String, DECIMAL, TIMESTAMP, BIGINT, LargeBinary, ForeignKey, Index
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 
@@ -35,6 +37,116 @@ class PriceTick(Base):
     data_source = Column(String(20), default="tushare", comment="数据源")
 
 
+class Symbol(Base):
+    """代码字典表 (紧凑行情存储中代码以编号保存)"""
+    __tablename__ = "symbols"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    code = Column(String(20), unique=True, nullable=False, comment="股票/可转债代码")
+
+
+class CompactPriceTick(Base):
+    """紧凑行情表 (TICK_STORAGE_MODE=compact)
+
+    价格、成交额以分为单位的整数保存，代码为 symbols 编号，数据源为枚举值，
+    主键 (ts, symbol_id) 按时间聚簇 (与按时间范围回放、清理的读取方式一致)，
+    不再需要自增 id 和额外索引。
+    列按 8/4/2 字节宽度排列，PostgreSQL 中没有对齐填充。
+    """
+    __tablename__ = "price_ticks_compact"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    ts = Column(BIGINT, primary_key=True, comment="时间戳(毫秒)")
+    volume = Column(BIGINT, comment="成交量")
+    amount = Column(BIGINT, comment="成交额(分)")
+    price = Column(Integer, nullable=False, comment="价格(分)")
+    symbol_id = Column(SmallInteger, primary_key=True, comment="代码编号")
+    source = Column(SmallInteger, nullable=False, default=0, comment="数据源枚举")
+
+
+class PackedPriceTicks(Base):
+    """按分钟打包的行情表 (TICK_STORAGE_MODE=packed)
+
+    每个代码每分钟一行，该分钟内的逐笔行情打包保存在 payload 中
+    (格式见 app/services/tick_store.py 的 pack_ticks)。
+    """
+    __tablename__ = "price_ticks_packed"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    minute = Column(Integer, primary_key=True, comment="分钟时间戳")
+    symbol_id = Column(SmallInteger, primary_key=True, comment="代码编号")
+    source = Column(SmallInteger, nullable=False, default=0, comment="数据源枚举")
+    count = Column(SmallInteger, nullable=False, comment="行情条数")
+    payload = Column(LargeBinary, nullable=False, comment="打包的逐笔行情")
+
+
+class PriceBar(Base):
+    """分钟K线汇总表 (1分钟/5分钟，行情写入时增量维护，见 app/services/rollups.py)
+
+    成交量、成交额保存 K 线结束时的当日累计值，单根 K 线的量在读取时与前一根相减得到，
+    因此同一根 K 线可以分多次写入、合并结果与一次写入相同。
+    """
+    __tablename__ = "price_bars"
+
+    stock_code = Column(String(20), primary_key=True, comment="股票/可转债代码")
+    period = Column(SmallInteger, primary_key=True, comment="周期(分钟)")
+    bar_time = Column(TIMESTAMP, primary_key=True, comment="K线开始时间")
+    open = Column(DECIMAL(10, 2), nullable=False)
+    high = Column(DECIMAL(10, 2), nullable=False)
+    low = Column(DECIMAL(10, 2), nullable=False)
+    close = Column(DECIMAL(10, 2), nullable=False)
+    cum_volume = Column(BIGINT, comment="K线结束时的当日累计成交量")
+    cum_amount = Column(DECIMAL(15, 2), comment="K线结束时的当日累计成交额")
+    ticks = Column(Integer, nullable=False, default=0, comment="行情条数")
+    first_at = Column(TIMESTAMP, nullable=False, comment="第一条行情时间")
+    last_at = Column(TIMESTAMP, nullable=False, comment="最后一条行情时间")
+
+
+class MoneyflowDaily(Base):
+    """个股资金流向日表 (moneyflow 接口按交易日整批获取，见 app/services/moneyflow.py)
+
+    只保存信号检测和配对快照用到的派生值，金额以百元 (万元 × 100) 为单位的整数保存，
+    代码为 symbols 编号，主键 (trade_date, symbol_id) 按交易日聚簇。
+    """
+    __tablename__ = "moneyflow_daily"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    trade_date = Column(Integer, primary_key=True, comment="交易日 YYYYMMDD")
+    symbol_id = Column(SmallInteger, primary_key=True, comment="代码编号")
+    net_large = Column(BIGINT, nullable=False, comment="大单+特大单净流入(百元)")
+    net_total = Column(BIGINT, nullable=False, comment="净流入额(百元)")
+    turnover = Column(BIGINT, nullable=False, comment="主动买卖成交额合计(百元)")
+
+
+class FinaIndicator(Base):
+    """正股财务指标表 (fina_indicator_vip 按报告期整批获取，见 app/services/fundamentals.py)
+
+    指标为百分数 × 100 的整数，代码为 symbols 编号，主键 (period, symbol_id) 按报告期聚簇。
+    """
+    __tablename__ = "fina_indicators"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    period = Column(Integer, primary_key=True, comment="报告期 YYYYMMDD")
+    symbol_id = Column(SmallInteger, primary_key=True, comment="代码编号")
+    roe = Column(Integer, comment="净资产收益率(%×100)")
+    debt_ratio = Column(Integer, comment="资产负债率(%×100)")
+    revenue_yoy = Column(Integer, comment="营业收入同比增长率(%×100)")
+
+
+class AdjFactor(Base):
+    """复权因子表 (adj_factor 按交易日整批获取全市场，见 app/services/adj_factors.py)
+
+    因子 × 1e6 保存为整数，代码为 symbols 编号，主键 (trade_date, symbol_id) 按交易日聚簇，
+    按代码加载时走 symbol_id 索引。
+    """
+    __tablename__ = "adj_factors"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    trade_date = Column(Integer, primary_key=True, comment="交易日 YYYYMMDD")
+    symbol_id = Column(SmallInteger, primary_key=True, comment="代码编号")
+    factor = Column(BIGINT, nullable=False, comment="复权因子(×1e6)")
+
+
 class Signal(Base):
     """信号记录表"""
     __tablename__ = "signals"
@@ -80,9 +192,19 @@ class SystemSnapshot(Base):
     created_at = Column(TIMESTAMP, server_default=func.now())
 
 
+class SchemaVersion(Base):
+    """表结构版本 (启动时比较模型指纹，一致时跳过建表)"""
+    __tablename__ = "schema_version"
+
+    id = Column(Integer, primary_key=True)
+    fingerprint = Column(String(64), nullable=False, comment="表结构指纹")
+    updated_at = Column(TIMESTAMP, server_default=func.now())
+
+
 # 创建索引
 Index('idx_price_ticks_stock_time', PriceTick.stock_code, PriceTick.timestamp.desc())
 Index('idx_signals_status_created', Signal.status, Signal.created_at.desc())
 Index('idx_signals_stock_created', Signal.stock_code, Signal.created_at.desc())
 Index('idx_trades_signal', Trade.signal_id)
 Index('idx_trades_status', Trade.order_status)
+Index('idx_adj_factors_symbol', AdjFactor.symbol_id)
@@ -102,9 +102,15 @@ class MonitoringPair(BaseModel):
     remaining_years: Decimal
     double_low: Decimal  # 双低值
     rating: str
+    stock_net_large_inflow: Optional[Decimal] = None  # 正股上一交易日大单+特大单净流入(万元)
+    stock_large_flow_ratio: Optional[Decimal] = None  # 大单净流入占成交额(%)
+    stock_roe: Optional[Decimal] = None  # 正股最新报告期净资产收益率(%)
+    stock_debt_ratio: Optional[Decimal] = None  # 资产负债率(%)
+    stock_revenue_yoy: Optional[Decimal] = None  # 营业收入同比增长率(%)
 
     signal_type: Optional[str] = None  # 信号类型
     is_favorite: bool = False
+    is_stale: bool = False  # 数据源故障时返回的旧行情
 
     class Config:
         from_attributes = True
@@ -113,14 +119,16 @@ class MonitoringPair(BaseModel):
 class MonitoringResponse(BaseModel):
     """监控数据响应"""
     data: List[MonitoringPair]
-    total: int
+    total: int  # 过滤后的总数
     page: int = 1
     page_size: int = 20
+    next_cursor: Optional[str] = None  # 下一页游标，为空表示已到末页
+    snapshot_version: Optional[int] = None  # 数据快照版本
 
 
 class CleanupRequest(BaseModel):
     """数据清理请求"""
-    data_types: List[str] = Field(..., description="要清理的数据类型")  # signals, trades, price_cache
+    data_types: List[str] = Field(..., description="要清理的数据类型")  # signals, trades, price_cache, price_bars
     time_range: Dict[str, Any] = Field(..., description="时间范围")
     signal_filters: Optional[Dict[str, bool]] = Field(default=None, description="信号过滤")
     preview_only: bool = Field(True, description="是否仅预览")
@@ -131,8 +139,10 @@ class CleanupResponse(BaseModel):
     signals_deleted: int = 0
     trades_deleted: int = 0
     prices_deleted: int = 0
+    bars_deleted: int = 0
     cache_cleared: bool = False
     preview_data: Optional[Dict[str, Any]] = None
+    archived: Optional[Dict[str, int]] = None  # 各表归档行数
 
 
 class DatabaseUsage(BaseModel):
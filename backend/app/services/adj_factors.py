@@ -0,0 +1,259 @@
+"""
+复权因子
+
+adj_factor 按 trade_date 一次返回全市场当日的复权因子 (盘前 9:15~9:20 入库)，
+每个交易日只需一次调用: 新交易日增量获取，首次启用时从新到旧补齐最近 ADJ_FACTOR_WINDOW_DAYS 个交易日
+(每个周期最多 ADJ_FACTOR_BATCH_DATES 个，不挤占行情轮询的调用额度)。
+全市场的因子都写入 adj_factors 表 (代码为 symbols 编号、因子为 × 1e6 的整数，约 5 千行/交易日)，
+之后才上市的可转债的正股同样有完整窗口的因子，不需要重新调用接口补齐。
+
+进程内只保存需要的代码 (可转债正股及图表请求过的代码): 新出现的代码第一次用到时从表中加载窗口内的全部因子，
+之后新交易日的因子增量加入。每个代码保存按日期升序的因子数组，并预先计算:
+- 前复权 (qfq) 乘数: 因子 / 最新因子，最新一天的价格不变
+- 后复权 (hfq) 乘数: 因子本身 (与 Tushare pro_bar 的 hfq 一致)
+复权时对一组日期二分查找当日生效的乘数再逐点相乘，日线历史和分时 K 线的复权不需要额外的接口调用，
+均线在复权后的价格上计算，除权日前后不再出现跳空。可转债没有复权因子，按原始价格返回。
+"""
+
+import asyncio
+import logging
+from datetime import datetime, time
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import delete, distinct, insert, select
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.models.database import AdjFactor as AdjFactorModel
+from app.services.tick_store import symbol_registry
+from app.services.trading_calendar import trading_calendar
+
+logger = logging.getLogger(__name__)
+
+ADJUST_MODES = ('none', 'qfq', 'hfq')
+FACTOR_SCALE = 1_000_000  # 入库时因子乘以该值保存为整数
+FACTORS_PUBLISHED = time(9, 30)  # 当日复权因子可用的时间 (接口 9:20 前完成入库)
+INSERT_CHUNK = 2000
+LOAD_CHUNK = 500  # 按代码加载时每次查询的编号数 (SQLite 参数个数限制)
+
+
+class FactorSeries:
+    """单个代码按日期升序的复权因子及预计算的复权乘数"""
+
+    __slots__ = ('dates', 'factors', 'qfq', 'hfq')
+
+    def __init__(self, dates: np.ndarray, factors: np.ndarray):
+        self.dates = dates
+        self.factors = factors
+        self.qfq = factors / factors[-1]
+        self.hfq = factors
+
+    def multipliers(self, dates: Sequence[int], adjust: str) -> np.ndarray:
+        """各日期生效的复权乘数 (早于第一条因子的日期使用第一条)"""
+        positions = np.searchsorted(self.dates, np.asarray(dates, dtype=np.int64), side='right') - 1
+        return getattr(self, adjust)[np.clip(positions, 0, len(self.dates) - 1)]
+
+
+class AdjFactorStore:
+    """复权因子 (已加载代码的因子序列，version 在因子变化后递增)"""
+
+    def __init__(self):
+        self.series: Dict[str, FactorSeries] = {}
+        self.loaded_dates: set = set()  # 已获取 (或已入库) 的交易日
+        self.tracked: set = set()  # 进程内保存因子的代码
+        self.version = 0
+        self.loaded_on: Optional[str] = None  # 最近一次更新或加载的自然日
+        self._factors: Dict[str, Dict[int, float]] = {}  # 代码 -> {交易日: 因子}
+
+    def describe(self) -> dict:
+        dates = sorted(self.loaded_dates)
+        return {'codes': len(self.series), 'tracked': len(self.tracked), 'dates': len(dates),
+                'first_date': dates[0] if dates else None, 'last_date': dates[-1] if dates else None,
+                'loaded_on': self.loaded_on, 'version': self.version}
+
+    def _rebuild(self, codes: Iterable[str]):
+        for code in codes:
+            factors = self._factors.get(code)
+            if not factors:
+                self.series.pop(code, None)
+                continue
+            dates = np.fromiter(sorted(factors), dtype=np.int64, count=len(factors))
+            self.series[code] = FactorSeries(dates, np.array([factors[d] for d in dates.tolist()], dtype=np.float64))
+        self.version += 1
+
+    def add(self, trade_date: int, factors: Dict[str, float]) -> List[str]:
+        """加入某个交易日已加载代码的因子 (调用 _rebuild 后生效)，返回加入的代码"""
+        added = [code for code in factors if code in self.tracked]
+        for code in added:
+            self._factors.setdefault(code, {})[trade_date] = factors[code]
+        self.loaded_dates.add(trade_date)
+        return added
+
+    def prune(self, first_date: int):
+        """丢弃窗口之前的因子"""
+        for code, factors in self._factors.items():
+            for trade_date in [d for d in factors if d < first_date]:
+                del factors[trade_date]
+        self.loaded_dates = {d for d in self.loaded_dates if d >= first_date}
+        self._rebuild(list(self._factors))
+
+    # ------------------------------------------------------------------
+    # 复权
+    # ------------------------------------------------------------------
+    def multipliers(self, code: str, dates: Sequence[int], adjust: str) -> Optional[np.ndarray]:
+        """各日期的复权乘数；不复权或没有该代码的因子时返回 None"""
+        if adjust == 'none':
+            return None
+        series = self.series.get(code)
+        if series is None:
+            return None
+        return series.multipliers(dates, adjust)
+
+    def adjust_history(self, code: str, history: List[Dict], adjust: str) -> List[Dict]:
+        """复权日线历史 (get_price_history 的格式)，价格保留两位小数"""
+        multipliers = self.multipliers(code, [int(item['time']) for item in history], adjust)
+        if multipliers is None:
+            return history
+        adjusted = []
+        for item, multiplier in zip(history, multipliers.tolist()):
+            item = dict(item)
+            for field in ('price', 'open', 'high', 'low'):
+                if item.get(field) is not None:
+                    item[field] = _scale(item[field], multiplier)
+            adjusted.append(item)
+        return adjusted
+
+    def adjust_prices(self, code: str, dates: Sequence[int], prices: List[Decimal], adjust: str) -> List[Decimal]:
+        """按日期复权一组价格 (分时 K 线的收盘价)"""
+        multipliers = self.multipliers(code, dates, adjust)
+        if multipliers is None:
+            return prices
+        return [_scale(price, multiplier) for price, multiplier in zip(prices, multipliers.tolist())]
+
+    # ------------------------------------------------------------------
+    # 入库 / 加载
+    # ------------------------------------------------------------------
+    async def save(self, trade_date: int, factors: Dict[str, float]):
+        async with get_db() as session:
+            ids = await symbol_registry.resolve(session, factors)
+            await session.execute(delete(AdjFactorModel).where(AdjFactorModel.trade_date == trade_date))
+            rows = [{'trade_date': trade_date, 'symbol_id': ids[code], 'factor': round(factor * FACTOR_SCALE)}
+                    for code, factor in factors.items()]
+            for offset in range(0, len(rows), INSERT_CHUNK):
+                await session.execute(insert(AdjFactorModel), rows[offset:offset + INSERT_CHUNK])
+
+    async def load(self, first_date: int, codes: Iterable[str] = ()):
+        """加载窗口内已入库的交易日和指定代码的因子，并删除窗口之前的旧数据"""
+        codes = [code for code in set(codes) if code not in self.tracked]
+        async with get_db() as session:
+            await session.execute(delete(AdjFactorModel).where(AdjFactorModel.trade_date < first_date))
+            dates = (await session.execute(select(distinct(AdjFactorModel.trade_date)))).scalars().all()
+            await symbol_registry.lookup(session, codes)
+            ids = {symbol_registry.ids[code]: code for code in codes if code in symbol_registry.ids}
+            rows = []
+            chunks = list(ids)
+            for offset in range(0, len(chunks), LOAD_CHUNK):
+                rows.extend((await session.execute(
+                    select(AdjFactorModel.trade_date, AdjFactorModel.symbol_id, AdjFactorModel.factor)
+                    .where(AdjFactorModel.symbol_id.in_(chunks[offset:offset + LOAD_CHUNK]))
+                )).all())
+        self.loaded_dates.update(dates)
+        self.tracked.update(codes)
+        for trade_date, symbol_id, factor in rows:
+            self._factors.setdefault(ids[symbol_id], {})[trade_date] = factor / FACTOR_SCALE
+        if codes:
+            self._rebuild(codes)
+
+    async def ensure_loaded(self, codes: Iterable[str]):
+        """复权前确保代码的因子已在进程内 (不在的从表中加载)
+
+        不运行 run 的进程 (主节点选举中的从节点) 每个自然日清空一次，之后重新加载主节点写入的因子。
+        """
+        today = trading_calendar.today()
+        if self.loaded_on != today:
+            self.loaded_on = today
+            self._factors = {}
+            self.series = {}
+            self.tracked = set()
+            self.loaded_dates = set()
+        codes = [code for code in codes if code not in self.tracked]
+        if codes:
+            await self.load(self.window_dates(settings.adj_factor_window_days)[-1], codes)
+
+    async def ingest(self, data_source, trade_date: int) -> Optional[List[str]]:
+        """获取某个交易日全市场的因子并全部入库，返回进程内加入了因子的代码 (获取或入库失败时返回 None)"""
+        df = await data_source.get_adj_factors(str(trade_date))
+        if df is None or df.empty:
+            return None
+        factors = {
+            code: factor for code, factor in zip(df['ts_code'].astype(str), df['adj_factor'].astype(float).tolist())
+            if factor > 0
+        }
+        try:
+            await self.save(trade_date, factors)
+        except Exception as e:
+            # 未入库的交易日不标记为已获取，下个周期重试 (否则表中缺这一天，从节点加载后复权错误)
+            logger.error(f"复权因子入库失败 ({trade_date}): {e}")
+            return None
+        return self.add(trade_date, factors)
+
+    @staticmethod
+    def window_dates(days: int, now: Optional[datetime] = None) -> List[int]:
+        """最近 days 个已发布复权因子的交易日，从新到旧"""
+        now = now or trading_calendar.now()
+        today = now.strftime('%Y%m%d')
+        latest = today if trading_calendar.is_trade_date(today) and now.time() >= FACTORS_PUBLISHED \
+            else trading_calendar.previous_trade_date(today)
+        dates = [latest]
+        while len(dates) < days:
+            dates.append(trading_calendar.previous_trade_date(dates[-1]))
+        return [int(d) for d in dates]
+
+    async def refresh(self, data_source, days: Optional[int] = None, batch: Optional[int] = None) -> int:
+        """补齐窗口内缺少的交易日 (从新到旧，每次最多 batch 个)，返回获取的交易日数"""
+        days = days or settings.adj_factor_window_days
+        batch = batch or settings.adj_factor_batch_dates
+        dates = self.window_dates(days)
+        # 新上市可转债的正股从表中加载已入库的全部因子
+        bonds = await data_source.get_bonds()
+        underlyings = {bond['stock_code'] for bond in bonds if bond.get('stock_code')}
+        if not self.loaded_dates or underlyings - self.tracked:
+            await self.load(dates[-1], underlyings)
+        self.loaded_on = trading_calendar.today()
+        missing = [d for d in dates if d not in self.loaded_dates][:batch]
+        if not missing:
+            return 0
+        fetched = 0
+        touched = set()
+        for trade_date in missing:
+            added = await self.ingest(data_source, trade_date)
+            if added is None:
+                break  # 接口失败、当日尚未发布或入库失败，下个周期重试
+            touched.update(added)
+            fetched += 1
+        if dates[-1] > min(self.loaded_dates, default=dates[-1]):
+            await self.load(dates[-1])  # 删除表中窗口之前的因子
+            self.prune(dates[-1])
+        elif touched:
+            self._rebuild(touched)
+        logger.info(f"复权因子已更新: {fetched} 个交易日，覆盖 {len(self.loaded_dates)}/{days} 个交易日")
+        return fetched
+
+    async def run(self, data_source, interval: Optional[float] = None):
+        interval = interval or settings.adj_factor_check_interval
+        while True:
+            try:
+                await self.refresh(data_source)
+            except Exception as e:
+                logger.error(f"更新复权因子失败: {e}")
+            await asyncio.sleep(interval)
+
+
+def _scale(price, multiplier: float) -> Decimal:
+    return Decimal(str(round(float(price) * multiplier, 2)))
+
+
+# 全局复权因子实例
+adj_factor_store = AdjFactorStore()
@@ -0,0 +1,147 @@
+"""
+后台任务
+
+行情轮询、信号检测、资金流向、财务指标、复权因子、热状态检查点和配对快照构建。单进程部署时随应用启动；
+开启主节点选举时只在主节点上运行 (见 app/core/leader.py)，退位时停止，
+从节点只提供读取，配对快照从数据库加载主节点发布的版本，可转债列表和搜索用的股票列表
+也只读取主节点写入的数据 (数据源的 follower 标记)。
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+from app.core.config import settings
+from app.services.adj_factors import adj_factor_store
+from app.services.fundamentals import fundamentals_store
+from app.services.moneyflow import moneyflow_store
+from app.services.pair_snapshot import pair_snapshot_store
+from app.services.quote_poller import IntradayQuotePoller
+from app.services.refresh_scheduler import refresh_scheduler
+from app.services.signal_engine import ShardedSignalEngine
+from app.services.warm_state import WarmRestart, WarmStateStore
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundJobs:
+    """可启停的一组后台任务 (主节点变更时重新启动)"""
+
+    def __init__(self, data_source_factory, publish_snapshots: bool = False):
+        self.data_source_factory = data_source_factory
+        self.publish_snapshots = publish_snapshots  # 主节点构建并发布配对快照
+        self.signal_engine: Optional[ShardedSignalEngine] = None
+        self.warm_restart: Optional[WarmRestart] = None
+        self.quote_poller: Optional[IntradayQuotePoller] = None
+        self._snapshot_task: Optional[asyncio.Task] = None
+        self._moneyflow_task: Optional[asyncio.Task] = None
+        self._fundamentals_task: Optional[asyncio.Task] = None
+        self._adj_factor_task: Optional[asyncio.Task] = None
+        self._search_index_task: Optional[asyncio.Task] = None
+        self.running = False
+
+    def _set_follower(self, follower: bool):
+        """切换数据源的从节点标记 (只在主节点选举模式下)"""
+        if self.publish_snapshots:
+            self.data_source_factory().follower = follower
+
+    async def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._set_follower(False)
+        data_source = self.data_source_factory()
+        scheduler = refresh_scheduler if settings.adaptive_refresh_enabled else None
+
+        # 信号检测引擎 (行情来自盘中轮询)
+        if settings.quote_poller_enabled and settings.signal_engine_enabled:
+            self.signal_engine = ShardedSignalEngine(
+                workers=settings.signal_workers,
+                ring_capacity=settings.signal_ring_capacity,
+                big_rise_threshold=settings.big_rise_threshold,
+                volume_spike_ratio=settings.volume_spike_ratio,
+                min_large_flow=settings.volume_spike_min_large_flow if settings.moneyflow_enabled else None,
+                moneyflow=moneyflow_store
+            )
+
+        # 恢复热状态检查点 (在检测引擎和行情轮询启动之前)
+        if settings.warm_state_enabled:
+            self.warm_restart = WarmRestart(
+                WarmStateStore(),
+                data_source=data_source,
+                scheduler=scheduler,
+                signal_engine=self.signal_engine
+            )
+            await self.warm_restart.restore()
+            self.warm_restart.start()
+
+        # 盘后资金流向 (每个交易日整批获取一次，放量信号和配对快照使用)
+        if settings.moneyflow_enabled and hasattr(data_source, 'get_moneyflow'):
+            self._moneyflow_task = asyncio.create_task(moneyflow_store.run(data_source), name="moneyflow")
+        # 正股财务指标 (每天按报告期整批获取一次，配对快照使用)
+        if settings.fundamentals_enabled and hasattr(data_source, 'get_fina_indicators'):
+            self._fundamentals_task = asyncio.create_task(fundamentals_store.run(data_source), name="fundamentals")
+        # 正股复权因子 (每个交易日整批获取一次，复权图表使用)
+        if settings.adj_factor_enabled and hasattr(data_source, 'get_adj_factors'):
+            self._adj_factor_task = asyncio.create_task(adj_factor_store.run(data_source), name="adj-factors")
+
+        if self.signal_engine:
+            self.signal_engine.start()
+
+        # 盘中实时行情轮询
+        if settings.quote_poller_enabled:
+            self.quote_poller = IntradayQuotePoller(
+                data_source,
+                scheduler=scheduler,
+                signal_engine=self.signal_engine
+            )
+            self.quote_poller.start()
+
+        if self.publish_snapshots:
+            pair_snapshot_store.publishing = True
+            self._snapshot_task = asyncio.create_task(pair_snapshot_store.run(data_source), name="pair-snapshot")
+            # 每天更新并写入搜索用的股票列表，从节点不调用 stock_basic
+            if hasattr(data_source, 'ensure_search_index'):
+                self._search_index_task = asyncio.create_task(self._refresh_search_index(data_source),
+                                                              name="search-index")
+
+    async def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        if self._snapshot_task is not None:
+            pair_snapshot_store.publishing = False
+            self._snapshot_task.cancel()
+            try:
+                await self._snapshot_task
+            except asyncio.CancelledError:
+                pass
+            self._snapshot_task = None
+        for task in (self._moneyflow_task, self._fundamentals_task, self._adj_factor_task, self._search_index_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._moneyflow_task = self._fundamentals_task = self._adj_factor_task = self._search_index_task = None
+        if self.quote_poller:
+            await self.quote_poller.stop()
+            self.quote_poller = None
+        if self.warm_restart:
+            # 行情轮询停止后保存最后的检查点，再停止检测引擎
+            await self.warm_restart.stop()
+            self.warm_restart = None
+        if self.signal_engine:
+            await self.signal_engine.stop()
+            self.signal_engine = None
+        self._set_follower(True)
+
+    @staticmethod
+    async def _refresh_search_index(data_source, interval: float = 3600.0):
+        while True:
+            try:
+                await data_source.ensure_search_index()
+            except Exception as e:
+                logger.error(f"更新搜索索引失败: {e}")
+            await asyncio.sleep(interval)
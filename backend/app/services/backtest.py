@@ -0,0 +1,268 @@
+"""
+信号规则回放 / 回测
+
+把已保存的行情 (price_ticks 及紧凑存储) 按交易日回放，经过与线上相同的 SignalDetector 检测信号，
+并按 Trade 的语义模拟可转债成交:
+- 信号触发后延迟 latency 秒，以对应可转债的下一笔行情价格(加滑点)买入 order_volume 张
+- 当日最后一笔行情价格卖出 (可转债 T+0)，扣除双边手续费
+按交易日拆分任务，用进程池并行回放，输出命中率、不同延迟下的盈亏和回放吞吐(ticks/s)。
+昨收价取前一交易日最后一笔行情，也可以用日线收盘价覆盖。
+已清理出数据库的行情从冷归档文件中读取，与库中数据合并。
+"""
+
+import asyncio
+import bisect
+import logging
+import multiprocessing as mp
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.database import get_db
+from app.services.cold_archive import cold_archive
+from app.services.refresh_scheduler import limit_up_pct
+from app.services.signal_detector import SignalDetector
+from app.services.tick_store import iter_ticks
+from app.services.trading_calendar import trading_calendar
+
+logger = logging.getLogger(__name__)
+
+
+class DayTicks:
+    """单个交易日的行情 (按时间排序的列式数据，便于传给工作进程)"""
+
+    __slots__ = ('trade_date', 'codes', 'timestamps', 'prices', 'volumes')
+
+    def __init__(self, trade_date: str):
+        self.trade_date = trade_date
+        self.codes: List[str] = []
+        self.timestamps: List[float] = []
+        self.prices: List[float] = []
+        self.volumes: List[float] = []
+
+    def append(self, code: str, timestamp: float, price: float, volume: float):
+        self.codes.append(code)
+        self.timestamps.append(timestamp)
+        self.prices.append(price)
+        self.volumes.append(volume)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def closes(self) -> Dict[str, float]:
+        """每个代码当日最后一笔价格"""
+        return dict(zip(self.codes, self.prices))
+
+
+def replay_day(day: DayTicks, pre_close: Dict[str, float], bond_by_stock: Dict[str, str],
+               params: Dict) -> Dict:
+    """回放一个交易日 (在工作进程中执行，只依赖传入的数据)"""
+    detector = SignalDetector(params['big_rise_threshold'], params['volume_spike_ratio'])
+    bond_codes = set(bond_by_stock.values())
+    trade_date = int(day.trade_date)
+
+    # 可转债行情按代码分组，用于模拟成交
+    bond_ticks: Dict[str, Tuple[List[float], List[float]]] = defaultdict(lambda: ([], []))
+    signals = []
+    limits: Dict[str, float] = {}
+    for code, timestamp, price, volume in zip(day.codes, day.timestamps, day.prices, day.volumes):
+        if code in bond_codes:
+            times, prices = bond_ticks[code]
+            times.append(timestamp)
+            prices.append(price)
+            continue
+        base = pre_close.get(code)
+        if not base:
+            continue
+        limit = limits.get(code)
+        if limit is None:
+            limit = limits[code] = limit_up_pct(code)
+        for signal in detector.process(code, trade_date, price, base, volume, limit, timestamp):
+            signals.append(signal)
+
+    trades = []
+    for signal in signals:
+        bond_code = bond_by_stock.get(signal['code'])
+        if not bond_code or bond_code not in bond_ticks:
+            continue
+        times, prices = bond_ticks[bond_code]
+        exit_price = prices[-1]
+        for latency in params['latencies']:
+            index = bisect.bisect_left(times, signal['timestamp'] + latency)
+            if index >= len(times):
+                continue  # 当日已无可成交的行情
+            entry_price = prices[index] * (1 + params['slippage'])
+            quantity = params['order_volume']
+            fees = (entry_price + exit_price) * quantity * params['fee_rate']
+            trades.append({
+                'signal_type': signal['signal_type'],
+                'stock_code': signal['code'],
+                'bond_code': bond_code,
+                'latency': latency,
+                'entry_price': entry_price,
+                'exit_price': exit_price,
+                'pnl': (exit_price - entry_price) * quantity - fees,
+                'return_pct': (exit_price / entry_price - 1) * 100,
+            })
+
+    return {
+        'trade_date': day.trade_date,
+        'ticks': len(day),
+        'signals': [{'signal_type': s['signal_type'], 'code': s['code']} for s in signals],
+        'trades': trades,
+    }
+
+
+async def load_day_ticks(trade_date: str, codes: Optional[Iterable[str]] = None) -> DayTicks:
+    """读取一个交易日的行情 (数据库中各种存储的行情和冷归档合并)"""
+    start = datetime.strptime(trade_date, '%Y%m%d')
+    end = start + timedelta(days=1)
+    codes = list(codes) if codes is not None else None
+
+    # 同一代码同一时间的行情只保留一条 (归档写入后清理被回滚时两边都有)
+    rows = {}
+    if cold_archive.available and os.path.exists(cold_archive.path('price_ticks', trade_date)):
+        archived = await asyncio.to_thread(
+            cold_archive.read, 'price_ticks', start, end, codes, ['stock_code', 'timestamp', 'price', 'volume']
+        )
+        for code, timestamp, price, volume in zip(*(archived[name].to_pylist() for name in archived.column_names)):
+            rows[code, timestamp] = (timestamp, code, float(price), float(volume or 0))
+    async with get_db() as session:
+        async for batch in iter_ticks(session, start, end, codes, decimals=False):
+            for code, timestamp, price, volume, _, _ in batch:
+                rows[code, timestamp] = (timestamp, code, price, float(volume or 0))
+
+    day = DayTicks(trade_date)
+    for timestamp, code, price, volume in sorted(rows.values()):
+        day.append(code, timestamp.timestamp(), price, volume)
+    return day
+
+
+def trade_dates_between(start_date: str, end_date: str) -> List[str]:
+    """[start_date, end_date] 之间的交易日"""
+    dates = []
+    current = datetime.strptime(start_date, '%Y%m%d')
+    end = datetime.strptime(end_date, '%Y%m%d')
+    while current <= end:
+        date_str = current.strftime('%Y%m%d')
+        if trading_calendar.is_trade_date(date_str):
+            dates.append(date_str)
+        current += timedelta(days=1)
+    return dates
+
+
+class BacktestEngine:
+    """按交易日并行的回放引擎"""
+
+    def __init__(self, bond_by_stock: Dict[str, str], workers: int = 2,
+                 latencies: Iterable[float] = (0.0, 3.0, 30.0), order_volume: int = 10,
+                 slippage: float = 0.001, fee_rate: float = 0.00005,
+                 big_rise_threshold: float = 5.0, volume_spike_ratio: float = 5.0):
+        self.bond_by_stock = dict(bond_by_stock)
+        self.workers = workers
+        self.params = {
+            'latencies': [float(latency) for latency in latencies],
+            'order_volume': order_volume,  # 每笔买入张数
+            'slippage': slippage,
+            'fee_rate': fee_rate,
+            'big_rise_threshold': big_rise_threshold,
+            'volume_spike_ratio': volume_spike_ratio,
+        }
+
+    async def run(self, start_date: str, end_date: str, codes: Optional[Iterable[str]] = None,
+                  daily_closes: Optional[Dict[Tuple[str, str], float]] = None) -> Dict:
+        """回放数据库中 [start_date, end_date] 的行情
+
+        daily_closes 为 {(代码, 交易日): 收盘价}，提供时优先作为次日昨收价。
+        """
+        dates = trade_dates_between(start_date, end_date)
+        if not dates:
+            return self.report([], 0.0)
+        # 首日的昨收价取前一交易日最后一笔行情
+        previous = await load_day_ticks(trading_calendar.previous_trade_date(dates[0]), codes)
+        closes = previous.closes()
+
+        async def days():
+            nonlocal closes
+            prev_date = previous.trade_date
+            for trade_date in dates:
+                day = await load_day_ticks(trade_date, codes)
+                pre_close = dict(closes)
+                if daily_closes:
+                    for code in set(day.codes):
+                        close = daily_closes.get((code, prev_date))
+                        if close:
+                            pre_close[code] = close
+                closes.update(day.closes())
+                prev_date = trade_date
+                yield day, pre_close
+
+        return await self.run_days(days())
+
+    async def run_days(self, days) -> Dict:
+        """回放 (DayTicks, 昨收价) 序列，可以是列表或异步生成器"""
+        start = time.perf_counter()
+        results = []
+        if self.workers <= 0:
+            async for day, pre_close in _aiter(days):
+                results.append(replay_day(day, pre_close, self.bond_by_stock, self.params))
+        else:
+            loop = asyncio.get_running_loop()
+            with ProcessPoolExecutor(self.workers, mp_context=mp.get_context('spawn')) as pool:
+                # 读取下一天的同时回放已读取的交易日
+                futures = []
+                async for day, pre_close in _aiter(days):
+                    futures.append(loop.run_in_executor(pool, replay_day, day, pre_close,
+                                                        self.bond_by_stock, self.params))
+                results = await asyncio.gather(*futures)
+        return self.report(results, time.perf_counter() - start)
+
+    def report(self, results: List[Dict], elapsed: float) -> Dict:
+        ticks = sum(result['ticks'] for result in results)
+        signals = defaultdict(int)
+        for result in results:
+            for signal in result['signals']:
+                signals[signal['signal_type']] += 1
+
+        by_latency = {}
+        for latency in self.params['latencies']:
+            trades = [t for result in results for t in result['trades'] if t['latency'] == latency]
+            by_type = {}
+            for signal_type in sorted({t['signal_type'] for t in trades}):
+                subset = [t for t in trades if t['signal_type'] == signal_type]
+                by_type[signal_type] = _summarize(subset)
+            by_latency[str(latency)] = {**_summarize(trades), 'by_signal_type': by_type}
+
+        return {
+            'days': len(results),
+            'ticks': ticks,
+            'elapsed_s': round(elapsed, 4),
+            'ticks_per_s': round(ticks / elapsed, 2) if elapsed else 0.0,
+            'signals': dict(signals),
+            'params': self.params,
+            'latency': by_latency,
+        }
+
+
+def _summarize(trades: List[Dict]) -> Dict:
+    if not trades:
+        return {'trades': 0, 'hit_rate': None, 'pnl': 0.0, 'avg_return_pct': None}
+    wins = sum(1 for t in trades if t['pnl'] > 0)
+    return {
+        'trades': len(trades),
+        'hit_rate': round(wins / len(trades), 4),
+        'pnl': round(sum(t['pnl'] for t in trades), 2),
+        'avg_return_pct': round(sum(t['return_pct'] for t in trades) / len(trades), 4),
+    }
+
+
+async def _aiter(items):
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
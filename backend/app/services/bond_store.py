@@ -0,0 +1,132 @@
+"""
+可转债列表入库
+
+get_bonds 从 cb_basic 获取的可转债列表整批写入 bonds 表:
+INSERT ... ON CONFLICT (ts_code) DO UPDATE ... WHERE <任一字段变化>，
+字段都没有变化的行不会被更新 (不改写 updated_at、不产生写入)，一千只可转债只需一条语句。
+RETURNING 返回实际写入的代码，结合写入前已存在的代码统计新增/更新/未变化的数量。
+Tushare 不可用且没有当日缓存时，从 bonds 表加载上一次同步的列表。
+开启主节点选举时，从节点的可转债列表只从 bonds 表加载 (不调用 cb_basic，也不写入)；
+搜索索引使用的股票列表由主节点压缩后写入 system_snapshots (snapshot_type='stock_list')，从节点读取。
+"""
+
+import base64
+import json
+import logging
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.dialects import sqlite
+
+from app.core.database import get_db
+from app.models.database import Bond as BondModel
+from app.models.database import SystemSnapshot as SystemSnapshotModel
+
+logger = logging.getLogger(__name__)
+
+BOND_FIELDS = ('bond_name', 'stock_code', 'stock_name', 'conversion_price', 'conversion_ratio',
+               'maturity_date', 'bond_rating')
+# 每条语句的最大行数 (9 个参数/行，低于 SQLite 和 asyncpg 的参数上限)
+UPSERT_CHUNK = 2000
+STOCK_LIST_SNAPSHOT_TYPE = 'stock_list'
+
+
+def _to_row(bond: Dict[str, Any]) -> Dict[str, Any]:
+    """get_bonds 的格式 -> bonds 表的行 (到期日 YYYYMMDD -> 时间)"""
+    row = {'ts_code': bond['ts_code']}
+    for field in BOND_FIELDS:
+        row[field] = bond.get(field)
+    maturity = row['maturity_date']
+    if maturity is not None and not isinstance(maturity, datetime):
+        try:
+            row['maturity_date'] = datetime.strptime(str(maturity), '%Y%m%d')
+        except ValueError:
+            row['maturity_date'] = None
+    return row
+
+
+def _from_row(row) -> Dict[str, Any]:
+    """bonds 表的行 -> get_bonds 的格式"""
+    bond = {'ts_code': row.ts_code}
+    for field in BOND_FIELDS:
+        bond[field] = getattr(row, field)
+    if bond['maturity_date'] is not None:
+        bond['maturity_date'] = bond['maturity_date'].strftime('%Y%m%d')
+    bond['bond_name'] = bond['bond_name'] or ''
+    bond['stock_code'] = bond['stock_code'] or ''
+    bond['stock_name'] = bond['stock_name'] or ''
+    bond['bond_rating'] = bond['bond_rating'] or ''
+    return bond
+
+
+def _upsert_statement(session, rows: List[Dict[str, Any]]):
+    table = BondModel.__table__
+    if session.bind.dialect.name == 'postgresql':
+        from sqlalchemy.dialects import postgresql as dialect  # 只在使用 PostgreSQL 时导入
+    else:
+        dialect = sqlite
+    stmt = dialect.insert(table).values(rows)
+    new, old = stmt.excluded, table.c
+    return stmt.on_conflict_do_update(
+        index_elements=[old.ts_code],
+        set_={**{field: new[field] for field in BOND_FIELDS}, 'updated_at': func.now()},
+        # 只更新有字段变化的行
+        where=or_(*(old[field].is_distinct_from(new[field]) for field in BOND_FIELDS)),
+    ).returning(old.ts_code)
+
+
+async def sync_bonds(bonds: List[Dict[str, Any]]) -> Dict[str, int]:
+    """把可转债列表整批写入 bonds 表，返回新增/更新/未变化的数量"""
+    rows = list({bond['ts_code']: _to_row(bond) for bond in bonds if bond.get('ts_code')}.values())
+    inserted = updated = 0
+    async with get_db() as session:
+        for offset in range(0, len(rows), UPSERT_CHUNK):
+            chunk = rows[offset:offset + UPSERT_CHUNK]
+            codes = [row['ts_code'] for row in chunk]
+            existing = set((await session.execute(
+                select(BondModel.ts_code).where(BondModel.ts_code.in_(codes))
+            )).scalars())
+            written = (await session.execute(_upsert_statement(session, chunk))).scalars().all()
+            updated += sum(1 for code in written if code in existing)
+            inserted += sum(1 for code in written if code not in existing)
+    result = {'inserted': inserted, 'updated': updated, 'unchanged': len(rows) - inserted - updated}
+    logger.info(f"可转债列表已同步: {result}")
+    return result
+
+
+async def load_bonds() -> List[Dict[str, Any]]:
+    """从 bonds 表加载可转债列表 (get_bonds 的格式)"""
+    async with get_db() as session:
+        rows = (await session.execute(
+            select(BondModel.ts_code, *(getattr(BondModel, field) for field in BOND_FIELDS))
+            .order_by(BondModel.ts_code)
+        )).all()
+    return [_from_row(row) for row in rows]
+
+
+async def save_stock_list(stocks: List[Dict[str, Any]]):
+    """主节点: 把 stock_basic 的股票列表写入 system_snapshots (原地更新同一行)"""
+    data = base64.b64encode(zlib.compress(json.dumps(stocks, ensure_ascii=False).encode())).decode()
+    async with get_db() as session:
+        result = await session.execute(
+            update(SystemSnapshotModel)
+            .where(SystemSnapshotModel.snapshot_type == STOCK_LIST_SNAPSHOT_TYPE)
+            .values(snapshot_data=data, created_at=datetime.now())
+        )
+        if not result.rowcount:
+            session.add(SystemSnapshotModel(snapshot_type=STOCK_LIST_SNAPSHOT_TYPE, snapshot_data=data,
+                                            created_at=datetime.now()))
+
+
+async def load_stock_list() -> Optional[List[Dict[str, Any]]]:
+    """从节点: 读取主节点写入的股票列表，尚未写入时返回 None"""
+    async with get_db() as session:
+        data = (await session.execute(
+            select(SystemSnapshotModel.snapshot_data)
+            .where(SystemSnapshotModel.snapshot_type == STOCK_LIST_SNAPSHOT_TYPE)
+        )).scalar()
+    if data is None:
+        return None
+    return json.loads(zlib.decompress(base64.b64decode(data)))
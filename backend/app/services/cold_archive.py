@@ -0,0 +1,262 @@
+"""
+过期数据冷归档
+
+数据清理删除 price_ticks / signals / trades 之前，先把要删除的行按天导出为
+压缩的 Arrow IPC 文件 (<归档目录>/<表名>/<年>/<月>/<表名>-<日期>.arrow)。
+文件内按 (代码, 时间) 排序并切分为固定行数的记录批，每批的代码和时间范围写入
+schema 元数据；读取时用内存映射打开文件，只解压与过滤条件有交集的记录批，
+不必把整个文件读入内存。
+紧凑行情存储 (price_ticks_compact / price_ticks_packed) 解码后按 price_ticks 的格式归档 (id 为空)。
+需要安装 pyarrow；未安装时跳过归档 (清理照常进行)。
+"""
+
+import asyncio
+import bisect
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import BIGINT, DECIMAL, TIMESTAMP, Integer, String, select
+
+from app.core.config import settings
+from app.models.database import PriceTick as PriceTickModel
+from app.models.database import Signal as SignalModel
+from app.models.database import Trade as TradeModel
+
+# pyarrow 为可选依赖，首次使用时导入 (见 _load_pyarrow)
+pa = pc = ipc = None
+_pyarrow_checked = False
+
+logger = logging.getLogger(__name__)
+
+# 表名 -> (模型, 时间列, 代码列)
+ARCHIVE_TABLES = {
+    'price_ticks': (PriceTickModel, 'timestamp', 'stock_code'),
+    'signals': (SignalModel, 'created_at', 'stock_code'),
+    'trades': (TradeModel, 'created_at', 'bond_code'),
+}
+INDEX_KEY = b'archive_index'
+
+
+def _load_pyarrow() -> bool:
+    global pa, pc, ipc, _pyarrow_checked
+    if not _pyarrow_checked:
+        _pyarrow_checked = True
+        try:
+            import pyarrow
+            import pyarrow.compute
+            import pyarrow.ipc
+            pa, pc, ipc = pyarrow, pyarrow.compute, pyarrow.ipc
+        except ImportError:
+            pass
+    return pa is not None
+
+
+def _arrow_type(column):
+    column_type = column.type
+    if isinstance(column_type, (Integer, BIGINT)):
+        return pa.int64()
+    if isinstance(column_type, DECIMAL):
+        return pa.decimal128(column_type.precision, column_type.scale)
+    if isinstance(column_type, TIMESTAMP):
+        return pa.timestamp('us')
+    if isinstance(column_type, String):
+        return pa.string()
+    raise TypeError(f"不支持归档的列类型: {column.name} {column_type}")
+
+
+class ColdArchive:
+    """按天分区的 Arrow IPC 归档"""
+
+    def __init__(self, root: Optional[str] = None, compression: Optional[str] = None, batch_rows: int = 65536):
+        self.root = root if root is not None else settings.archive_dir
+        self.compression = compression if compression is not None else settings.archive_compression
+        self.batch_rows = batch_rows
+
+    @property
+    def available(self) -> bool:
+        return _load_pyarrow()
+
+    def schema(self, table: str):
+        model = ARCHIVE_TABLES[table][0]
+        return pa.schema([(column.name, _arrow_type(column)) for column in model.__table__.columns])
+
+    def path(self, table: str, trade_date: str) -> str:
+        return os.path.join(self.root, table, trade_date[:4], trade_date[4:6], f"{table}-{trade_date}.arrow")
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    async def archive(self, session, table: str, conditions: List) -> int:
+        """把满足条件的行按天写入归档，返回归档行数 (需在删除之前、同一事务中调用)"""
+        model, time_column, _ = ARCHIVE_TABLES[table]
+        query = (
+            select(*model.__table__.columns).where(*conditions)
+            .order_by(getattr(model, time_column))
+            .execution_options(yield_per=50000)
+        )
+
+        async def partitions():
+            result = await session.stream(query)
+            # 按批取行，避免逐行切换协程
+            async for partition in result.partitions():
+                yield partition
+
+        return await self.archive_rows(table, partitions())
+
+    async def archive_rows(self, table: str, batches) -> int:
+        """把逐批产出的行 (按表的列顺序，时间不递减) 按天写入归档，返回归档行数"""
+        if not self.available:
+            logger.warning("未安装 pyarrow，跳过冷归档")
+            return 0
+        model, time_column, _ = ARCHIVE_TABLES[table]
+        columns = [column.name for column in model.__table__.columns]
+        time_index = columns.index(time_column)
+
+        archived = 0
+        current_date = None
+        rows: Dict[str, list] = defaultdict(list)
+        async for batch in batches:
+            for row in batch:
+                row_date = row[time_index].date()
+                if row_date != current_date:
+                    if rows:
+                        archived += await asyncio.to_thread(
+                            self.write_day, table, current_date.strftime('%Y%m%d'), rows
+                        )
+                        rows = defaultdict(list)
+                    current_date = row_date
+                for name, value in zip(columns, row):
+                    rows[name].append(value)
+        if rows:
+            archived += await asyncio.to_thread(self.write_day, table, current_date.strftime('%Y%m%d'), rows)
+        return archived
+
+    def write_day(self, table: str, trade_date: str, rows: Dict[str, list]) -> int:
+        """写入一天的数据；文件已存在时与原有数据合并 (按 代码+时间+id 去重，紧凑存储的行没有 id)"""
+        schema = self.schema(table)
+        _, time_column, code_column = ARCHIVE_TABLES[table]
+        data = pa.Table.from_pydict({name: rows[name] for name in schema.names}, schema=schema)
+        count = data.num_rows
+
+        path = self.path(table, trade_date)
+        if os.path.exists(path):
+            existing = self._read_file(path, None, None, None, None)
+            data = pa.concat_tables([existing, data])
+            seen, keep = set(), []
+            keys = zip(data[code_column].to_pylist(), data[time_column].to_pylist(), data['id'].to_pylist())
+            for position, key in enumerate(keys):
+                if key not in seen:
+                    seen.add(key)
+                    keep.append(position)
+            data = data.take(pa.array(keep, pa.int64()))
+
+        data = data.sort_by([(code_column, 'ascending'), (time_column, 'ascending'), ('id', 'ascending')])
+        index = []
+        for offset in range(0, data.num_rows, self.batch_rows):
+            batch = data.slice(offset, self.batch_rows)
+            codes = batch[code_column].drop_null()
+            times = batch[time_column]
+            index.append({
+                'code_min': pc.min(codes).as_py() if len(codes) else None,
+                'code_max': pc.max(codes).as_py() if len(codes) else None,
+                'time_min': pc.min(times).as_py().isoformat(),
+                'time_max': pc.max(times).as_py().isoformat(),
+            })
+        data = data.replace_schema_metadata({INDEX_KEY: json.dumps(index).encode()})
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        options = ipc.IpcWriteOptions(compression=self.compression or None)
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with ipc.new_file(sink, data.schema, options=options) as writer:
+                writer.write_table(data, max_chunksize=self.batch_rows)
+        os.replace(tmp_path, path)
+        return count
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+    def read(self, table: str, start: datetime, end: datetime, codes: Optional[Iterable[str]] = None,
+             columns: Optional[List[str]] = None):
+        """读取 [start, end) 内的归档数据，可按代码过滤，返回 pyarrow.Table"""
+        if not self.available:
+            raise RuntimeError("读取冷归档需要安装 pyarrow")
+        codes = sorted(set(codes)) if codes is not None else None
+        tables = []
+        day = datetime(start.year, start.month, start.day)
+        while day < end:
+            path = self.path(table, day.strftime('%Y%m%d'))
+            if os.path.exists(path):
+                tables.append(self._read_file(path, start, end, codes, columns))
+            day += timedelta(days=1)
+        if not tables:
+            schema = self.schema(table)
+            return schema.empty_table() if columns is None else pa.schema([schema.field(c) for c in columns]).empty_table()
+        return pa.concat_tables(tables)
+
+    def _read_file(self, path: str, start: Optional[datetime], end: Optional[datetime],
+                   codes: Optional[List[str]], columns: Optional[List[str]]):
+        table = os.path.basename(path).split('-')[0]
+        _, time_column, code_column = ARCHIVE_TABLES[table]
+        with pa.memory_map(path, 'r') as source:
+            reader = ipc.open_file(source)
+            metadata = reader.schema.metadata or {}
+            index = json.loads(metadata[INDEX_KEY]) if INDEX_KEY in metadata else [None] * reader.num_record_batches
+            batches = []
+            for i, stats in enumerate(index):
+                if stats is not None and not self._overlaps(stats, start, end, codes):
+                    continue  # 跳过不相关的记录批，不解压
+                batches.append(reader.get_batch(i))
+            data = pa.Table.from_batches(batches, schema=reader.schema)
+
+        mask = None
+        if start is not None:
+            mask = pc.and_(pc.greater_equal(data[time_column], pa.scalar(start, pa.timestamp('us'))),
+                           pc.less(data[time_column], pa.scalar(end, pa.timestamp('us'))))
+        if codes is not None:
+            code_mask = pc.is_in(data[code_column], value_set=pa.array(codes, pa.string()))
+            mask = code_mask if mask is None else pc.and_(mask, code_mask)
+        if mask is not None:
+            data = data.filter(mask)
+        data = data.replace_schema_metadata(None)
+        return data.select(columns) if columns is not None else data
+
+    @staticmethod
+    def _overlaps(stats: Dict, start, end, codes) -> bool:
+        if start is not None:
+            if stats['time_max'] < start.isoformat() or stats['time_min'] >= end.isoformat():
+                return False
+        if codes is not None and stats['code_min'] is not None:
+            # codes 已排序，检查是否有代码落在本批的范围内
+            position = bisect.bisect_left(codes, stats['code_min'])
+            if position >= len(codes) or codes[position] > stats['code_max']:
+                return False
+        return True
+
+    def describe(self) -> Dict:
+        """各表归档文件数量和占用空间"""
+        summary = {}
+        for table in ARCHIVE_TABLES:
+            files, size, days = 0, 0, []
+            table_dir = os.path.join(self.root, table)
+            for directory, _, names in os.walk(table_dir):
+                for name in names:
+                    if name.endswith('.arrow'):
+                        files += 1
+                        size += os.path.getsize(os.path.join(directory, name))
+                        days.append(name.rsplit('-', 1)[-1][:8])
+            summary[table] = {
+                'files': files,
+                'size_mb': round(size / 1024 / 1024, 2),
+                'first_day': min(days) if days else None,
+                'last_day': max(days) if days else None,
+            }
+        return {'root': self.root, 'available': self.available, 'tables': summary}
+
+
+# 全局归档实例
+cold_archive = ColdArchive()
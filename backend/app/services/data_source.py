@@ -1,12 +1,85 @@
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
+from collections import OrderedDict
+from functools import partial
 import asyncio
 from decimal import Decimal
-import pandas as pd
+
+from app.core.circuit_breaker import CircuitBreakerRegistry
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.adj_factors import adj_factor_store
+from app.services.fundamentals import FINA_FIELDS, fundamentals_store
+from app.services.moneyflow import MONEYFLOW_FIELDS, moneyflow_store
+from app.services.search_index import StockSearchIndex
+from app.services.trading_calendar import trading_calendar
 
 from app.models.schemas import Bond, PriceTick, MonitoringPair
 
+MONEYFLOW_PAGE_SIZE = 6000  # moneyflow 单次最多返回的行数
+ADJ_FACTOR_PAGE_SIZE = 6000  # adj_factor 单次最多返回的行数
+
+
+def build_monitoring_pair(bond: Dict[str, Any], stock_price: Dict[str, Any], bond_price: Dict[str, Any],
+                          now: Optional[datetime] = None, moneyflow: Optional[Dict[str, Any]] = None,
+                          fundamentals: Optional[Dict[str, Any]] = None) -> MonitoringPair:
+    """由可转债基本信息和正股/可转债行情构建监控配对
+    (moneyflow 为正股上一交易日的资金流向，fundamentals 为正股最新报告期的财务指标)"""
+    # 计算溢价率
+    premium = Decimal('0')
+    if bond.get('conversion_price') and bond['conversion_price'] > 0:
+        premium = ((bond_price['price'] - bond['conversion_price']) / bond['conversion_price']) * 100
+
+    # 计算剩余年限
+    remaining_years = Decimal('0')
+    if bond.get('maturity_date'):
+        try:
+            maturity = datetime.strptime(str(bond['maturity_date']), '%Y%m%d')
+            remaining_years = Decimal(str((maturity - (now or datetime.now())).days / 365))
+        except:
+            pass
+
+    # 计算双低值 (价格 + 溢价率)
+    double_low = bond_price['price'] + premium
+
+    # 大单净流入 (万元) 及其占成交额的比例 (%)
+    net_large_inflow = large_flow_ratio = None
+    if moneyflow:
+        net_large_inflow = Decimal(str(round(moneyflow['net_large'], 2)))
+        if moneyflow.get('large_ratio') is not None:
+            large_flow_ratio = Decimal(str(round(moneyflow['large_ratio'], 2)))
+
+    # 财务指标 (%)
+    indicators = {}
+    for name in ('roe', 'debt_ratio', 'revenue_yoy'):
+        value = fundamentals.get(name) if fundamentals else None
+        indicators[f'stock_{name}'] = Decimal(str(round(value, 2))) if value is not None else None
+
+    return MonitoringPair(
+        stock_code=bond['stock_code'],
+        stock_name=bond.get('stock_name') or '',
+        stock_price=stock_price['price'],
+        stock_change=stock_price['change'],
+        stock_volume=stock_price['volume'],
+        stock_turnover=Decimal('0'),  # 暂时设为0
+
+        bond_code=bond['ts_code'],
+        bond_name=bond.get('bond_name') or '',
+        bond_price=bond_price['price'],
+        bond_change=bond_price['change'],
+        conversion_price=bond.get('conversion_price') or Decimal('0'),
+        premium=premium,
+        maturity_date=str(bond.get('maturity_date') or ''),
+        remaining_years=remaining_years,
+        double_low=double_low,
+        rating=bond.get('bond_rating') or 'N/A',
+        stock_net_large_inflow=net_large_inflow,
+        stock_large_flow_ratio=large_flow_ratio,
+        **indicators,
+        is_stale=bool(stock_price.get('is_stale') or bond_price.get('is_stale'))
+    )
+
 
 class DataSource(ABC):
     """数据源抽象基类"""
@@ -27,8 +100,8 @@ class DataSource(ABC):
         pass
 
     @abstractmethod
-    async def get_price_history(self, code: str, days: int = 30) -> List[Dict[str, Any]]:
-        """获取价格历史数据"""
+    async def get_price_history(self, code: str, days: int = 30, adjust: str = 'none') -> List[Dict[str, Any]]:
+        """获取价格历史数据 (adjust: none / qfq / hfq)"""
         pass
 
     @abstractmethod
@@ -37,7 +110,7 @@ class DataSource(ABC):
         pass
 
     @abstractmethod
-    async def search_stocks(self, keyword: str) -> List[Dict[str, Any]]:
+    async def search_stocks(self, keyword: str, limit: int = 20) -> List[Dict[str, Any]]:
         """搜索股票"""
         pass
 
@@ -50,9 +123,14 @@ class DataSource(ABC):
 class TushareDataSource(DataSource):
     """Tushare数据源实现"""
 
-    def __init__(self, token: str):
+    def __init__(self, token: str, pro=None):
         self.token = token
-        self._init_client()
+        # 客户端在首次请求时创建 (导入 tushare/pandas 较慢，不拖慢启动)
+        self._pro = pro
+        self._realtime_quote_api = None
+        if pro is not None:
+            # 注入的客户端 (如基准测试中的模拟 pro_api)
+            self._realtime_quote_api = getattr(pro, 'realtime_quote', None)
 
         # API限流控制 (Tushare积分限制)
         # 根据文档：基础积分每分钟内可调取500次，每次6000条数据
@@ -60,26 +138,91 @@ class TushareDataSource(DataSource):
         self.last_reset_time = datetime.now()
         self.minute_limit = 500  # 每分钟最多500次调用
         self.request_delay = 0.1  # 请求间隔(秒)
+        self.request_timeout = settings.tushare_request_timeout
 
-        # 缓存机制
-        self.price_cache = {}
+        # 按接口熔断，故障期间直接返回缓存中的旧数据
+        self.breakers = CircuitBreakerRegistry(settings.circuit_failure_threshold,
+                                               settings.circuit_reset_timeout)
+
+        # 缓存机制 (按写入顺序淘汰)
+        self.price_cache = OrderedDict()
         self.cache_timeout = 300  # 缓存5分钟
+        self.cache_size = settings.quote_cache_size
+        self.stale_max_age = settings.stale_max_age  # 过期后仍可作为旧数据返回的时长(秒)
+        self._revalidating: Dict[str, asyncio.Task] = {}
+        self._revalidate_semaphore = asyncio.Semaphore(4)
+
+        # 交易日历 (决定缓存有效期和回看窗口)
+        self.calendar = trading_calendar
+        self.price_lookback_days = 5  # 最新价格的回看交易日数 (覆盖短暂停牌)
+        self._calendar_attempted_at: Optional[datetime] = None
+        self._bonds_cache = None  # (日期, 可转债列表)
+        self.last_bond_sync: Optional[Dict[str, Any]] = None  # 最近一次入库的新增/更新/未变化数量
+        # 主节点选举中的从节点: 可转债列表和股票列表只读取主节点写入的数据，不调用 Tushare、不写入
+        self.follower = False
+
+        # 本地搜索索引
+        self.search_index = StockSearchIndex()
+        self._search_refresh_task: Optional[asyncio.Task] = None
 
     def _init_client(self):
         """初始化Tushare客户端"""
         try:
             import tushare as ts
             ts.set_token(self.token)
-            self.pro = ts.pro_api()
+            self._pro = ts.pro_api()
+            # 爬虫版实时行情接口 (sina 源一次最多50个代码)
+            self._realtime_quote_api = ts.realtime_quote
         except ImportError:
             raise ImportError("tushare not installed. Run: pip install tushare")
 
+    @property
+    def pro(self):
+        if self._pro is None:
+            self._init_client()
+        return self._pro
+
+    @property
+    def realtime_quote_api(self):
+        if self._pro is None:
+            self._init_client()
+        return self._realtime_quote_api
+
+    async def ensure_calendar(self):
+        """确保交易日历覆盖今天 (失败后10分钟内不重试)"""
+        if self.calendar.covers():
+            return
+        now = datetime.now()
+        if self._calendar_attempted_at and (now - self._calendar_attempted_at).total_seconds() < 600:
+            return
+        self._calendar_attempted_at = now
+
+        start_date, end_date = self.calendar.fetch_range()
+        df = await self._make_request(self.pro.trade_cal, exchange='SSE', start_date=start_date,
+                                      end_date=end_date, fields='cal_date,is_open')
+        if df is None or df.empty:
+            print("获取交易日历失败，按工作日判断交易日")
+            return
+        open_dates = df.loc[df['is_open'].astype(str) == '1', 'cal_date'].astype(str)
+        self.calendar.update(start_date, end_date, open_dates)
+
     async def get_bonds(self) -> List[Dict[str, Any]]:
-        """获取可转债信息"""
+        """获取可转债信息 (同一自然日内复用)"""
+        today = self.calendar.today()
+        if self._bonds_cache and self._bonds_cache[0] == today:
+            return self._bonds_cache[1]
+        if self.follower and settings.bond_sync_enabled:
+            return await self._load_follower_bonds(today)
+
         try:
             # 获取可转债基本信息 (只请求实际存在的字段)
-            df = self.pro.cb_basic(fields='ts_code,bond_full_name,stk_code,stk_short_name,'
-                                       'conv_price,maturity_date')
+            df = await self._make_request(self.pro.cb_basic, fields='ts_code,bond_full_name,stk_code,stk_short_name,'
+                                                                  'conv_price,maturity_date')
+            if df is None:
+                # 接口不可用时沿用上一次成功获取的列表，没有时从 bonds 表加载
+                return self._bonds_cache[1] if self._bonds_cache else await self._load_stored_bonds()
+
+            import pandas as pd
 
             bonds = []
             for _, row in df.iterrows():
@@ -100,23 +243,68 @@ class TushareDataSource(DataSource):
                     continue
 
             print(f"成功获取 {len(bonds)} 个可转债基本信息")
+            if bonds:
+                self._bonds_cache = (today, bonds)
+                await self._store_bonds(bonds)
             return bonds
         except Exception as e:
             print(f"获取可转债信息失败: {e}")
+            return await self._load_stored_bonds()
+
+    async def _store_bonds(self, bonds: List[Dict[str, Any]]):
+        """把可转债列表同步到 bonds 表 (失败不影响返回)"""
+        if not settings.bond_sync_enabled:
+            return
+        from app.services.bond_store import sync_bonds
+        try:
+            self.last_bond_sync = {**await sync_bonds(bonds), 'synced_at': datetime.now().isoformat()}
+        except Exception as e:
+            print(f"可转债列表入库失败: {e}")
+
+    async def _load_follower_bonds(self, today: str) -> List[Dict[str, Any]]:
+        """从节点: 从 bonds 表加载主节点同步的可转债列表 (表为空时不缓存，下次重试)"""
+        from app.services.bond_store import load_bonds
+        try:
+            bonds = await load_bonds()
+        except Exception as e:
+            print(f"从数据库加载可转债列表失败: {e}")
+            return self._bonds_cache[1] if self._bonds_cache else []
+        if bonds:
+            self._bonds_cache = (today, bonds)
+        return bonds
+
+    async def _load_stored_bonds(self) -> List[Dict[str, Any]]:
+        """从 bonds 表加载上一次同步的可转债列表 (当日仍会重试 Tushare)"""
+        if not settings.bond_sync_enabled:
             return []
+        from app.services.bond_store import load_bonds
+        try:
+            bonds = await load_bonds()
+        except Exception as e:
+            print(f"从数据库加载可转债列表失败: {e}")
+            return []
+        if bonds:
+            print(f"Tushare 不可用，从数据库加载了 {len(bonds)} 个可转债")
+            self._bonds_cache = ('', bonds)
+        return bonds
 
     async def get_stock_price(self, stock_code: str) -> Optional[Dict[str, Any]]:
         """获取股票实时价格"""
-        # 检查缓存
         cache_key = self._get_cache_key(stock_code, 'stock')
-        cached_data = self._get_cached_price(cache_key)
-        if cached_data:
-            return cached_data
+        return await self._get_with_revalidate(cache_key, partial(self._fetch_daily_price, stock_code, cache_key))
 
+    async def get_bond_price(self, bond_code: str) -> Optional[Dict[str, Any]]:
+        """获取可转债实时价格"""
+        cache_key = self._get_cache_key(bond_code, 'bond')
+        return await self._get_with_revalidate(cache_key, partial(self._fetch_daily_price, bond_code, cache_key))
+
+    async def _fetch_daily_price(self, code: str, cache_key: str) -> Optional[Dict[str, Any]]:
+        """从日线接口获取最新收盘价并写入缓存 (可转债也通过A股市场交易，同样使用 daily)"""
         try:
-            # 获取最近60天的交易日数据，确保有足够的历史数据
-            start_date = (datetime.now() - timedelta(days=60)).strftime('%Y%m%d')
-            df = await self._make_request(self.pro.daily, ts_code=stock_code, start_date=start_date)
+            # 只请求最近几个交易日的数据
+            await self.ensure_calendar()
+            start_date = self.calendar.trade_days_back(self.price_lookback_days)
+            df = await self._make_request(self.pro.daily, ts_code=code, start_date=start_date)
 
             if df is None or df.empty:
                 return None
@@ -124,11 +312,11 @@ class TushareDataSource(DataSource):
             # 获取最新一条数据（最近的交易日）
             latest = df.iloc[0]
             price_data = {
-                'code': stock_code,
+                'code': code,
                 'price': Decimal(str(latest['close'])),
                 'change': Decimal(str(latest['pct_chg'])),
-                'volume': int(latest['vol']),
-                'amount': Decimal(str(latest['amount'])),
+                'volume': int(latest['vol']) if latest['vol'] else 0,
+                'amount': Decimal(str(latest['amount'])) if latest['amount'] else Decimal('0'),
                 'timestamp': datetime.now(),
                 'trade_date': latest['trade_date']
             }
@@ -137,73 +325,23 @@ class TushareDataSource(DataSource):
             self._set_cached_price(cache_key, price_data)
             return price_data
         except Exception as e:
-            print(f"获取股票价格失败 {stock_code}: {e}")
+            print(f"获取价格失败 {code}: {e}")
             return None
 
-    async def get_bond_price(self, bond_code: str) -> Optional[Dict[str, Any]]:
-        """获取可转债实时价格"""
-        # 检查缓存
-        cache_key = self._get_cache_key(bond_code, 'bond')
-        cached_data = self._get_cached_price(cache_key)
-        if cached_data:
-            return cached_data
-
-        # TODO: 暂时使用模拟数据，待Tushare可转债价格接口可用后替换
-        # 尝试真实数据获取
-        try:
-            # 使用通用的daily接口获取可转债价格（可转债也通过A股市场交易）
-            start_date = (datetime.now() - timedelta(days=60)).strftime('%Y%m%d')
-            df = await self._make_request(self.pro.daily, ts_code=bond_code, start_date=start_date)
-
-            if df is not None and not df.empty:
-                # 获取最新一条数据（最近的交易日）
-                latest = df.iloc[0]
-                price_data = {
-                    'code': bond_code,
-                    'price': Decimal(str(latest['close'])),
-                    'change': Decimal(str(latest['pct_chg'])),
-                    'volume': int(latest['vol']) if latest['vol'] else 0,
-                    'amount': Decimal(str(latest['amount'])) if latest['amount'] else Decimal('0'),
-                    'timestamp': datetime.now(),
-                    'trade_date': latest['trade_date']
-                }
-                # 设置缓存
-                self._set_cached_price(cache_key, price_data)
-                return price_data
-        except Exception as e:
-            print(f"获取可转债真实价格失败 {bond_code}: {e}")
-
-        # 如果真实数据获取失败，使用模拟数据
-        print(f"使用模拟数据获取可转债价格 {bond_code}")
-        import random
-        price_data = {
-            'code': bond_code,
-            'price': Decimal(str(round(random.uniform(100, 130), 2))),
-            'change': Decimal(str(round(random.uniform(-3, 3), 2))),
-            'volume': random.randint(1000, 10000),
-            'amount': Decimal(str(round(random.uniform(10000, 50000), 2))),
-            'timestamp': datetime.now(),
-            'trade_date': (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')  # 模拟昨天的交易日
-        }
-
-        # 设置缓存
-        self._set_cached_price(cache_key, price_data)
-        return price_data
-
-    async def get_price_history(self, code: str, days: int = 30) -> List[Dict[str, Any]]:
-        """获取价格历史数据"""
+    async def get_price_history(self, code: str, days: int = 30, adjust: str = 'none') -> List[Dict[str, Any]]:
+        """获取价格历史数据 (adjust: none 不复权 / qfq 前复权 / hfq 后复权，使用本地复权因子)"""
         try:
             start_date = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
 
             # 判断是股票还是可转债
             if code.startswith('11') or code.startswith('12') or code.startswith('13'):
                 # 可转债
-                df = self.pro.cb_daily(ts_code=code, start_date=start_date)
+                df = await self._make_request(self.pro.cb_daily, ts_code=code, start_date=start_date)
             else:
                 # 股票
-                df = self.pro.daily(ts_code=code, start_date=start_date)
+                df = await self._make_request(self.pro.daily, ts_code=code, start_date=start_date)
 
-            if df.empty:
+            if df is None or df.empty:
                 return []
 
             history = []
@@ -217,7 +355,8 @@ class TushareDataSource(DataSource):
                     'low': Decimal(str(row['low']))
                 })
 
-            return history[::-1]  # 反转时间顺序
+            # 反转时间顺序; 可转债没有复权因子，adjust_history 原样返回
+            return adj_factor_store.adjust_history(code, history[::-1], adjust)
         except Exception as e:
             print(f"获取价格历史失败 {code}: {e}")
             return []
@@ -250,44 +389,9 @@ class TushareDataSource(DataSource):
                         print(f"跳过 {bond['ts_code']}: 无法获取可转债价格")
                         continue
 
-                    # 计算溢价率
-                    premium = Decimal('0')
-                    if bond.get('conversion_price') and bond['conversion_price'] > 0:
-                        premium = ((bond_price['price'] - bond['conversion_price']) / bond['conversion_price']) * 100
-
-                    # 计算剩余年限
-                    remaining_years = Decimal('0')
-                    if bond.get('maturity_date'):
-                        try:
-                            maturity = datetime.strptime(str(bond['maturity_date']), '%Y%m%d')
-                            remaining_years = Decimal(str((maturity - datetime.now()).days / 365))
-                        except:
-                            pass
-
-                    # 计算双低值 (价格 + 溢价率)
-                    double_low = bond_price['price'] + premium
-
-                    pair = MonitoringPair(
-                        stock_code=bond['stock_code'],
-                        stock_name=bond.get('stock_name') or '',
-                        stock_price=stock_price['price'],
-                        stock_change=stock_price['change'],
-                        stock_volume=stock_price['volume'],
-                        stock_turnover=Decimal('0'),  # 暂时设为0
-
-                        bond_code=bond['ts_code'],
-                        bond_name=bond.get('bond_name') or '',
-                        bond_price=bond_price['price'],
-                        bond_change=bond_price['change'],
-                        conversion_price=bond.get('conversion_price') or Decimal('0'),
-                        premium=premium,
-                        maturity_date=str(bond.get('maturity_date') or ''),
-                        remaining_years=remaining_years,
-                        double_low=double_low,
-                        rating=bond.get('bond_rating') or 'N/A'
-                    )
-
-                    pairs.append(pair)
+                    pairs.append(build_monitoring_pair(bond, stock_price, bond_price,
+                                                       moneyflow=moneyflow_store.get(bond['stock_code']),
+                                                       fundamentals=fundamentals_store.get(bond['stock_code'])))
                     processed_count += 1
 
                     # 每处理10个可转债打印一次进度
@@ -308,34 +412,166 @@ class TushareDataSource(DataSource):
             print(f"获取监控配对数据失败: {e}")
             return []
 
-    async def search_stocks(self, keyword: str) -> List[Dict[str, Any]]:
-        """搜索股票"""
+    async def search_stocks(self, keyword: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """搜索股票 (本地索引，支持代码前缀、名称子串和拼音首字母)"""
         try:
-            df = self.pro.stock_basic(name=keyword, fields='ts_code,symbol,name,area,industry')
-
-            results = []
-            for _, row in df.iterrows():
-                results.append({
-                    'code': row['ts_code'],
-                    'symbol': row['symbol'],
-                    'name': row['name'],
-                    'area': row['area'],
-                    'industry': row['industry']
-                })
-
-            return results
+            await self.ensure_search_index()
+            return self.search_index.search(keyword, limit=limit)
         except Exception as e:
             print(f"搜索股票失败: {e}")
             return []
 
+    async def ensure_search_index(self):
+        """首次使用时同步构建搜索索引，之后每天在后台刷新一次"""
+        today = self.calendar.today()
+        if self.search_index.loaded_date == today:
+            return
+        if not len(self.search_index):
+            await self._refresh_search_index(today)
+        elif self._search_refresh_task is None or self._search_refresh_task.done():
+            self._search_refresh_task = asyncio.create_task(self._refresh_search_index(today))
+
+    async def _refresh_search_index(self, today: str):
+        from app.services.bond_store import load_stock_list, save_stock_list
+
+        if self.follower:
+            stocks = await load_stock_list()
+            if not stocks:
+                print("主节点尚未写入股票列表，搜索索引未更新")
+                return
+        else:
+            df = await self._make_request(self.pro.stock_basic, list_status='L',
+                                          fields='ts_code,symbol,name,area,industry')
+            if df is None or df.empty:
+                print("获取股票列表失败，搜索索引未更新")
+                return
+            stocks = df.fillna('').to_dict('records')
+            if settings.leader_election_enabled:
+                try:
+                    await save_stock_list(stocks)
+                except Exception as e:
+                    print(f"股票列表写入数据库失败: {e}")
+        bonds = await self.get_bonds()
+        await asyncio.to_thread(self.search_index.build, stocks, bonds, today)
+
+    async def get_moneyflow(self, trade_date: str):
+        """获取某个交易日全市场的个股资金流向 (单次最多6000行，按 offset 分页)"""
+        frames = []
+        offset = 0
+        while True:
+            df = await self._make_request(self.pro.moneyflow, trade_date=trade_date, fields=MONEYFLOW_FIELDS,
+                                          limit=MONEYFLOW_PAGE_SIZE, offset=offset)
+            if df is None:
+                return None
+            frames.append(df)
+            if len(df) < MONEYFLOW_PAGE_SIZE:
+                break
+            offset += MONEYFLOW_PAGE_SIZE
+
+        import pandas as pd
+
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    async def get_fina_indicators(self, period: str):
+        """获取某个报告期全部上市公司的财务指标 (fina_indicator_vip，按 offset 分页直到返回空)"""
+        frames = []
+        offset = 0
+        while True:
+            df = await self._make_request(self.pro.fina_indicator_vip, period=period, fields=FINA_FIELDS,
+                                          offset=offset)
+            if df is None:
+                return None
+            if df.empty:
+                break
+            frames.append(df)
+            offset += len(df)
+
+        import pandas as pd
+
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=FINA_FIELDS.split(','))
+
+    async def get_adj_factors(self, trade_date: str):
+        """获取某个交易日全市场的复权因子 (单次最多6000行，按 offset 分页)"""
+        frames = []
+        offset = 0
+        while True:
+            df = await self._make_request(self.pro.adj_factor, trade_date=trade_date,
+                                          fields='ts_code,trade_date,adj_factor',
+                                          limit=ADJ_FACTOR_PAGE_SIZE, offset=offset)
+            if df is None:
+                return None
+            frames.append(df)
+            if len(df) < ADJ_FACTOR_PAGE_SIZE:
+                break
+            offset += ADJ_FACTOR_PAGE_SIZE
+
+        import pandas as pd
+
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    async def get_realtime_quotes(self, codes: List[str]) -> List[Dict[str, Any]]:
+        """批量获取实时行情 (单次最多50个代码)"""
+        if not codes:
+            return []
+        if len(codes) > 50:
+            raise ValueError("realtime_quote 单次最多支持50个代码")
+        if self.realtime_quote_api is None:
+            return []
+
+        df = await self._make_request(self.realtime_quote_api, ts_code=','.join(codes), src='sina')
+        if df is None or df.empty:
+            return []
+
+        df.columns = [str(c).lower() for c in df.columns]
+        quotes = []
+        for row in df.itertuples(index=False):
+            try:
+                price = Decimal(str(row.price))
+                pre_close = Decimal(str(row.pre_close))
+                if price <= 0:
+                    continue  # 停牌或未开盘
+                change = (price - pre_close) / pre_close * 100 if pre_close > 0 else Decimal('0')
+                quotes.append({
+                    'code': row.ts_code,
+                    'price': price,
+                    'change': change.quantize(Decimal('0.0001')),
+                    'volume': int(row.volume),
+                    'amount': Decimal(str(row.amount)),
+                    'open': Decimal(str(row.open)),
+                    'high': Decimal(str(row.high)),
+                    'low': Decimal(str(row.low)),
+                    'pre_close': pre_close,
+                    'timestamp': datetime.strptime(f"{row.date} {row.time}", '%Y%m%d %H:%M:%S'),
+                    'trade_date': str(row.date)
+                })
+            except Exception as e:
+                print(f"处理实时行情失败 {getattr(row, 'ts_code', '')}: {e}")
+                continue
+        return quotes
+
+    def cache_quote(self, code: str, data_type: str, price_data: Dict[str, Any]):
+        """写入行情缓存 (data_type: stock / bond)"""
+        self._set_cached_price(self._get_cache_key(code, data_type), price_data)
+
     async def get_market_status(self) -> Dict[str, Any]:
         """获取市场状态"""
+        cache_key = self._get_cache_key('000001.SH', 'market')
+        cached_data = await self._get_with_revalidate(cache_key, self._fetch_market_status)
+        if not cached_data:
+            return {'status': 'unknown', 'message': '无法获取市场数据'}
+        if cached_data.get('is_stale'):
+            return {**cached_data['status'], 'is_stale': True}
+        return cached_data['status']
+
+    async def _fetch_market_status(self) -> Optional[Dict[str, Any]]:
         try:
-            # 获取上证指数
-            df = self.pro.index_daily(ts_code='000001.SH', start_date=self._get_today_str())
+            # 获取上证指数 (最近几个交易日，周末和节假日也能取到最近收盘)
+            await self.ensure_calendar()
+            start_date = self.calendar.trade_days_back(3)
+            df = await self._make_request(self.pro.index_daily, ts_code='000001.SH', start_date=start_date)
 
-            if df.empty:
-                return {'status': 'unknown', 'message': '无法获取市场数据'}
+            if df is None or df.empty:
+                return None
 
             latest = df.iloc[0]
             change = Decimal(str(latest['pct_chg']))
@@ -347,14 +583,17 @@ class TushareDataSource(DataSource):
             else:
                 status = 'neutral'  # 平稳
 
-            return {
+            market_status = {
                 'status': status,
                 'index_change': change,
                 'message': f'上证指数涨跌幅: {change}%'
             }
+            cached_data = {'status': market_status, 'trade_date': latest['trade_date']}
+            self._set_cached_price(self._get_cache_key('000001.SH', 'market'), cached_data)
+            return cached_data
         except Exception as e:
             print(f"获取市场状态失败: {e}")
-            return {'status': 'unknown', 'message': '获取失败'}
+            return None
 
     async def _check_rate_limit(self) -> bool:
         """检查API限流"""
@@ -373,46 +612,123 @@ class TushareDataSource(DataSource):
         return True
 
     async def _make_request(self, func, *args, **kwargs):
-        """带限流的API请求"""
+        """带限流、超时和熔断的API请求"""
+        breaker = self.breakers.get(self._api_name(func))
         if not await self._check_rate_limit():
             return None
-
-        # 请求间隔控制
-        await asyncio.sleep(self.request_delay)
+        if not breaker.allow():
+            # 熔断期间立即返回，不再等待故障接口
+            metrics.inc("tushare_requests_rejected_total")
+            return None
 
         try:
-            result = func(*args, **kwargs)
+            # 请求间隔控制
+            await asyncio.sleep(self.request_delay)
+            # 先计数再发起请求，保证并发请求也受限流约束
             self.request_count += 1
-            return result
+            # SDK 是同步阻塞调用，放到线程池中执行，避免阻塞事件循环
+            result = await asyncio.wait_for(asyncio.to_thread(func, *args, **kwargs), self.request_timeout)
+        except asyncio.CancelledError:
+            # 关闭时取消后台任务或客户端断开: CancelledError 不是 Exception，需要单独释放半开探测，
+            # 否则该接口在进程重启前一直被拒绝
+            breaker.release()
+            raise
         except Exception as e:
-            print(f"API请求失败: {e}")
+            breaker.record_failure()
+            metrics.inc("tushare_requests_failed_total")
+            print(f"API请求失败 ({breaker.name}): {type(e).__name__} {e}")
             return None
+        breaker.record_success()
+        return result
+
+    @staticmethod
+    def _api_name(func) -> str:
+        """接口名 (pro_api 的接口是 partial(query, 接口名))"""
+        if isinstance(func, partial) and func.args:
+            return str(func.args[0])
+        return getattr(func, '__name__', 'unknown')
+
+    async def _get_with_revalidate(self, cache_key: str, fetch) -> Optional[Dict[str, Any]]:
+        """stale-while-revalidate: 缓存过期时先返回旧数据(带 is_stale 标记)，后台刷新"""
+        cached_data = self._get_cached_price(cache_key)
+        if cached_data:
+            return cached_data
+
+        stale_data = self._get_stale_price(cache_key)
+        if stale_data is None:
+            return await fetch()
+
+        if cache_key not in self._revalidating:
+            task = asyncio.create_task(self._revalidate(fetch))
+            self._revalidating[cache_key] = task
+            task.add_done_callback(lambda _: self._revalidating.pop(cache_key, None))
+        metrics.inc("stale_cache_served_total")
+        return {**stale_data, 'is_stale': True}
+
+    async def _revalidate(self, fetch):
+        # 限制后台刷新并发，故障时熔断器能在少量失败后生效
+        async with self._revalidate_semaphore:
+            return await fetch()
 
     def _get_cache_key(self, code: str, data_type: str) -> str:
         """生成缓存键"""
         return f"{data_type}_{code}"
 
     def _get_cached_price(self, cache_key: str) -> Optional[Dict[str, Any]]:
-        """获取缓存的价格数据"""
+        """获取缓存的价格数据 (仅未过期的)"""
         if cache_key in self.price_cache:
             cached_data, timestamp = self.price_cache[cache_key]
-            if (datetime.now() - timestamp).seconds < self.cache_timeout:
+            if (datetime.now() - timestamp).total_seconds() < self.cache_timeout:
+                return cached_data
+            # 非交易时段，已是最近收盘交易日的数据无限期有效
+            if self.calendar.can_serve_cached(cached_data.get('trade_date')):
                 return cached_data
-            else:
-                # 缓存过期，删除
-                del self.price_cache[cache_key]
+        return None
+
+    def _get_stale_price(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """获取已过期但仍可作为旧数据返回的缓存"""
+        if cache_key in self.price_cache:
+            cached_data, timestamp = self.price_cache[cache_key]
+            if (datetime.now() - timestamp).total_seconds() < self.stale_max_age:
+                return cached_data
+            # 过旧的数据不再返回，删除
+            del self.price_cache[cache_key]
         return None
 
     def _set_cached_price(self, cache_key: str, data: Dict[str, Any]):
         """设置缓存的价格数据"""
         self.price_cache[cache_key] = (data, datetime.now())
+        self.price_cache.move_to_end(cache_key)
+
+        # 限制缓存大小，防止内存泄漏 (删除最早写入的缓存)
+        while len(self.price_cache) > self.cache_size:
+            self.price_cache.popitem(last=False)
 
-        # 限制缓存大小，防止内存泄漏
-        if len(self.price_cache) > 1000:
-            # 删除最旧的缓存
-            oldest_key = min(self.price_cache.keys(),
-                           key=lambda k: self.price_cache[k][1])
-            del self.price_cache[oldest_key]
+    def export_state(self) -> Dict[str, Any]:
+        """导出行情缓存和可转债列表 (按写入顺序，保留原写入时间)，用于重启后恢复"""
+        return {
+            'price_cache': [[key, data, timestamp] for key, (data, timestamp) in self.price_cache.items()],
+            'bonds': list(self._bonds_cache) if self._bonds_cache else None,
+        }
+
+    def restore_state(self, state: Dict[str, Any]) -> int:
+        """恢复 export_state 导出的缓存，返回恢复的行情缓存条数 (已超过旧数据时限的丢弃)"""
+        now = datetime.now()
+        restored = 0
+        for key, data, timestamp in state.get('price_cache', []):
+            if key in self.price_cache:
+                continue  # 已有更新的行情 (如从节点接任主节点时)
+            if (now - timestamp).total_seconds() >= self.stale_max_age \
+                    and not self.calendar.can_serve_cached(data.get('trade_date')):
+                continue
+            self.price_cache[key] = (data, timestamp)
+            self.price_cache.move_to_end(key)
+            restored += 1
+        while len(self.price_cache) > self.cache_size:
+            self.price_cache.popitem(last=False)
+        if state.get('bonds'):
+            self._bonds_cache = tuple(state['bonds'])
+        return restored
 
     def _get_today_str(self) -> str:
         """获取今天的日期字符串"""
@@ -425,6 +741,14 @@ class DataSourceFactory:
     def create_data_source(source_type: str, **kwargs) -> DataSource:
         if source_type == 'tushare':
             token = kwargs.get('token', '')
-            return TushareDataSource(token)
+            return TushareDataSource(token, pro=kwargs.get('pro'))
+        elif source_type == 'simulated':
+            from app.services.simulated_source import SimulatedDataSource
+            return SimulatedDataSource(
+                seed=kwargs.get('seed', settings.simulation_seed),
+                n_bonds=kwargs.get('n_bonds', settings.simulation_bonds),
+                n_stocks=kwargs.get('n_stocks', settings.simulation_stocks),
+                tick_interval=kwargs.get('tick_interval', settings.simulation_tick_interval),
+            )
         else:
             raise ValueError(f"不支持的数据源类型: {source_type}")
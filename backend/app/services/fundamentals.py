@@ -0,0 +1,213 @@
+"""
+正股财务指标
+
+fina_indicator_vip 按报告期 (period) 一次返回全部上市公司 (按 offset 分页直到返回空)，
+每天只对最近两个报告期各整批拉取一次，不按股票逐只请求。只保留可转债正股的三个指标:
+- roe: 净资产收益率 (%)
+- debt_ratio: 资产负债率 (debt_to_assets，%)
+- revenue_yoy: 营业收入同比增长率 (or_yoy，%)
+每个代码取已披露的最新报告期 (季报陆续披露期间，新报告期未披露的沿用上一期)。
+按报告期写入 fina_indicators 表 (代码为 symbols 编号、指标为百分数 × 100 的整数)，
+进程内按列保存为 numpy 数组，构建配对快照时按代码 O(1) 读取，排序和区间过滤使用快照的预排序索引。
+"""
+
+import asyncio
+import logging
+import math
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.models.database import FinaIndicator as FinaIndicatorModel
+from app.services.tick_store import symbol_registry
+from app.services.trading_calendar import trading_calendar
+
+logger = logging.getLogger(__name__)
+
+# fina_indicator 字段 -> 保存的指标
+INDICATORS = {'roe': 'roe', 'debt_to_assets': 'debt_ratio', 'or_yoy': 'revenue_yoy'}
+FINA_FIELDS = ','.join(('ts_code', 'ann_date', 'end_date', 'update_flag', *INDICATORS))
+INSERT_CHUNK = 2000
+QUARTER_ENDS = ((3, 31), (6, 30), (9, 30), (12, 31))
+
+
+def recent_periods(today: str, count: int) -> List[str]:
+    """不晚于 today 的最近 count 个报告期 (季度末)，从新到旧"""
+    current = datetime.strptime(today, '%Y%m%d').date()
+    periods = []
+    year = current.year
+    while len(periods) < count:
+        for month, day in reversed(QUARTER_ENDS):
+            end = date(year, month, day)
+            if end <= current and len(periods) < count:
+                periods.append(end.strftime('%Y%m%d'))
+        year -= 1
+    return periods
+
+
+class FundamentalsTable:
+    """各正股最新报告期的财务指标 (按列保存，没有数据为 nan)"""
+
+    def __init__(self, codes: Iterable[str] = (), periods: Iterable[str] = (), roe=(), debt_ratio=(),
+                 revenue_yoy=()):
+        self.codes = list(codes)
+        self.index = {code: row for row, code in enumerate(self.codes)}
+        self.periods = list(periods)
+        self.roe = np.asarray(roe, dtype=np.float64)
+        self.debt_ratio = np.asarray(debt_ratio, dtype=np.float64)
+        self.revenue_yoy = np.asarray(revenue_yoy, dtype=np.float64)
+
+    @classmethod
+    def merge(cls, frames: Dict[str, Dict[str, Dict[str, float]]]) -> "FundamentalsTable":
+        """合并多个报告期 ({报告期: {代码: 指标}})，同一代码取最新的报告期"""
+        latest: Dict[str, tuple] = {}
+        for period in sorted(frames):
+            for code, values in frames[period].items():
+                latest[code] = (period, values)
+        codes = sorted(latest)
+        columns = {name: [latest[code][1][name] for code in codes] for name in INDICATORS.values()}
+        return cls(codes, [latest[code][0] for code in codes], **columns)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def get(self, code: str) -> Optional[Dict[str, Any]]:
+        row = self.index.get(code)
+        if row is None:
+            return None
+        result: Dict[str, Any] = {'period': self.periods[row]}
+        for name in INDICATORS.values():
+            value = getattr(self, name)[row]
+            result[name] = None if math.isnan(value) else float(value)
+        return result
+
+
+def frame_to_indicators(df, codes: Optional[set] = None) -> Dict[str, Dict[str, float]]:
+    """fina_indicator_vip 返回的 DataFrame -> {代码: 指标} (同一代码多条时取最后公告/更新的一条)"""
+    if codes:
+        df = df[df['ts_code'].isin(codes)]
+    sort_by = [column for column in ('ann_date', 'update_flag') if column in df.columns]
+    if sort_by:
+        df = df.sort_values(sort_by, kind='stable')
+    df = df.drop_duplicates('ts_code', keep='last')
+    values = df[list(INDICATORS)].astype(np.float64).round(2).to_numpy()  # 与入库精度一致
+    names = list(INDICATORS.values())
+    return {
+        code: dict(zip(names, row))
+        for code, row in zip(df['ts_code'].astype(str), values.tolist())
+    }
+
+
+def _encode(value: float) -> Optional[int]:
+    return None if math.isnan(value) else round(value * 100)
+
+
+def _decode(value: Optional[int]) -> float:
+    return math.nan if value is None else value / 100
+
+
+class FundamentalsStore:
+    """当前使用的财务指标 (整表替换)"""
+
+    def __init__(self):
+        self.current = FundamentalsTable()
+        self.version = 0
+        self.loaded_on: Optional[str] = None  # 最近一次更新的自然日
+
+    def set(self, table: FundamentalsTable):
+        self.current = table
+        self.version += 1
+
+    def get(self, code: str) -> Optional[Dict[str, Any]]:
+        return self.current.get(code)
+
+    def describe(self) -> Dict[str, Any]:
+        periods = sorted(set(self.current.periods), reverse=True)
+        return {'codes': len(self.current), 'periods': periods, 'loaded_on': self.loaded_on,
+                'version': self.version}
+
+    # ------------------------------------------------------------------
+    # 入库 / 加载
+    # ------------------------------------------------------------------
+    async def save(self, period: str, indicators: Dict[str, Dict[str, float]]):
+        """整期写入 fina_indicators (同一报告期的旧数据先删除)"""
+        async with get_db() as session:
+            ids = await symbol_registry.resolve(session, indicators)
+            await session.execute(delete(FinaIndicatorModel).where(FinaIndicatorModel.period == int(period)))
+            rows = [
+                {'period': int(period), 'symbol_id': ids[code],
+                 **{name: _encode(value) for name, value in values.items()}}
+                for code, values in indicators.items()
+            ]
+            for offset in range(0, len(rows), INSERT_CHUNK):
+                await session.execute(insert(FinaIndicatorModel), rows[offset:offset + INSERT_CHUNK])
+
+    async def load(self, count: int) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """加载最近 count 个已入库的报告期"""
+        names = list(INDICATORS.values())
+        async with get_db() as session:
+            periods = (await session.execute(
+                select(FinaIndicatorModel.period).distinct()
+                .order_by(FinaIndicatorModel.period.desc()).limit(count)
+            )).scalars().all()
+            if not periods:
+                return {}
+            rows = (await session.execute(
+                select(FinaIndicatorModel.period, FinaIndicatorModel.symbol_id,
+                       *(getattr(FinaIndicatorModel, name) for name in names))
+                .where(FinaIndicatorModel.period.in_(periods))
+            )).all()
+            codes = await symbol_registry.decode(session, {row[1] for row in rows})
+        frames: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for period, symbol_id, *values in rows:
+            frames.setdefault(str(period), {})[codes[symbol_id]] = dict(zip(names, map(_decode, values)))
+        return frames
+
+    async def refresh(self, data_source, count: Optional[int] = None) -> bool:
+        """整批拉取最近 count 个报告期并入库; 拉取失败的报告期使用表中已保存的数据"""
+        count = count or settings.fundamentals_periods
+        today = trading_calendar.today()
+        bonds = await data_source.get_bonds()
+        underlyings = {bond['stock_code'] for bond in bonds if bond.get('stock_code')}
+
+        frames = {}
+        for period in recent_periods(today, count):
+            df = await data_source.get_fina_indicators(period)
+            if df is None:
+                continue  # 接口失败，使用已入库的数据
+            indicators = await asyncio.to_thread(frame_to_indicators, df, underlyings) if not df.empty else {}
+            if not indicators:
+                continue  # 报告期尚未开始披露
+            frames[period] = indicators
+            try:
+                await self.save(period, indicators)
+            except Exception as e:
+                logger.error(f"财务指标入库失败 ({period}): {e}")
+
+        for period, indicators in (await self.load(count)).items():
+            frames.setdefault(period, indicators)
+        if not frames:
+            return False
+        self.set(FundamentalsTable.merge(frames))
+        self.loaded_on = today
+        logger.info(f"财务指标已更新: {len(self.current)} 只正股，报告期 {sorted(frames, reverse=True)}")
+        return True
+
+    async def run(self, data_source, interval: Optional[float] = None):
+        """每天更新一次 (失败时下个周期重试)"""
+        interval = interval or settings.fundamentals_check_interval
+        while True:
+            if self.loaded_on != trading_calendar.today():
+                try:
+                    await self.refresh(data_source)
+                except Exception as e:
+                    logger.error(f"更新财务指标失败: {e}")
+            await asyncio.sleep(interval)
+
+
+# 全局财务指标实例
+fundamentals_store = FundamentalsStore()
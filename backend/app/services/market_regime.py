@@ -0,0 +1,78 @@
+"""
+市场状态 (强势 / 弱势 / 平稳)
+
+由配对快照中全部可转债及其正股的行情一次向量化计算，不调用指数接口:
+- 正股上涨 / 下跌 / 平盘家数 (同一正股对应多只可转债时只计一次) 及上涨家数占比
+- 涨停 / 跌停家数 (按涨跌幅倒推昨收，与信号检测相同的涨停价取整规则)
+- 正股涨跌幅中位数、可转债涨跌幅中位数、转股溢价率中位数
+上涨家数占比不低于 MARKET_BULL_BREADTH 且涨跌幅中位数为正时为强势，
+不高于 MARKET_BEAR_BREADTH 且中位数为负时为弱势，其余为平稳。
+快照构建时计算一次 (主节点重建、从节点加载都会重新计算)，接口和交易流程直接读取快照上的结果。
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.schemas import MonitoringPair
+from app.services.refresh_scheduler import limit_up_pct
+
+STATUS_MESSAGES = {'bull': '强势', 'bear': '弱势', 'neutral': '平稳'}
+
+
+def _median(values: np.ndarray) -> float:
+    return round(float(np.median(values)), 2) if len(values) else 0.0
+
+
+def compute_regime(pairs: List[MonitoringPair]) -> Dict[str, Any]:
+    """由一组配对计算市场宽度和市场状态"""
+    if not pairs:
+        return {'status': 'unknown', 'message': '暂无行情数据', 'stocks': 0, 'bonds': 0}
+
+    # 同一正股只取第一次出现的行情
+    stocks = {}
+    for pair in pairs:
+        stocks.setdefault(pair.stock_code, pair)
+    stock_price = np.array([float(p.stock_price) for p in stocks.values()], dtype=np.float64)
+    stock_change = np.array([float(p.stock_change) for p in stocks.values()], dtype=np.float64)
+    limit_pct = np.array([limit_up_pct(code) for code in stocks], dtype=np.float64)
+    bond_change = np.array([float(p.bond_change) for p in pairs], dtype=np.float64)
+    premium = np.array([float(p.premium) for p in pairs], dtype=np.float64)
+
+    advancers = int(np.count_nonzero(stock_change > 0))
+    decliners = int(np.count_nonzero(stock_change < 0))
+    moved = advancers + decliners
+    advance_ratio = advancers / moved if moved else 0.5
+
+    traded = stock_price > 0
+    pre_close = np.where(traded, stock_price / (1 + stock_change / 100), 0.0)
+    limit_up_price = np.round(pre_close * (1 + limit_pct / 100) + 1e-9, 2)
+    limit_down_price = np.round(pre_close * (1 - limit_pct / 100) + 1e-9, 2)
+    limit_up = int(np.count_nonzero(traded & (stock_change > 0) & (stock_price >= limit_up_price)))
+    limit_down = int(np.count_nonzero(traded & (stock_change < 0) & (stock_price <= limit_down_price)))
+
+    median_change = _median(stock_change)
+    if advance_ratio >= settings.market_bull_breadth and median_change > 0:
+        status = 'bull'
+    elif advance_ratio <= settings.market_bear_breadth and median_change < 0:
+        status = 'bear'
+    else:
+        status = 'neutral'
+
+    return {
+        'status': status,
+        'message': (f"{STATUS_MESSAGES[status]}: 上涨 {advancers} 家 / 下跌 {decliners} 家，"
+                    f"涨停 {limit_up} 家，涨跌幅中位数 {median_change}%"),
+        'stocks': len(stocks),
+        'bonds': len(pairs),
+        'advancers': advancers,
+        'decliners': decliners,
+        'unchanged': len(stocks) - moved,
+        'advance_ratio': round(advance_ratio, 4),
+        'limit_up': limit_up,
+        'limit_down': limit_down,
+        'median_change': median_change,
+        'median_bond_change': _median(bond_change),
+        'median_premium': _median(premium),
+    }
@@ -0,0 +1,182 @@
+"""
+个股资金流向 (大单净流入)
+
+moneyflow 接口按 trade_date 一次返回全市场 (单次最多 6000 行，超出时按 offset 分页)，
+每个交易日只需一两次调用，不逐只请求。只保留可转债正股的三个派生值:
+- net_large: 大单 + 特大单净流入 (万元)
+- net_total: 全部净流入 (net_mf_amount，万元)
+- large_ratio: net_large / 主动买卖成交额合计 (%)
+写入 moneyflow_daily 表 (代码为 symbols 编号、金额为整数)，进程内按列保存为 numpy 数组，
+代码 -> 行号一次字典查找后按下标读取，信号检测和配对快照的查询都是 O(1)。
+资金流向是盘后数据，盘中使用最近一个已收盘交易日的值; 数据尚未发布时沿用更早的交易日。
+"""
+
+import asyncio
+import logging
+import math
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.models.database import MoneyflowDaily as MoneyflowDailyModel
+from app.services.tick_store import symbol_registry
+from app.services.trading_calendar import trading_calendar
+
+logger = logging.getLogger(__name__)
+
+# moneyflow 中参与计算的金额列 (万元)
+LARGE_BUY = ('buy_lg_amount', 'buy_elg_amount')
+LARGE_SELL = ('sell_lg_amount', 'sell_elg_amount')
+ALL_AMOUNTS = ('buy_sm_amount', 'sell_sm_amount', 'buy_md_amount', 'sell_md_amount',
+               'buy_lg_amount', 'sell_lg_amount', 'buy_elg_amount', 'sell_elg_amount')
+MONEYFLOW_FIELDS = ','.join(('ts_code', *ALL_AMOUNTS, 'net_mf_amount'))
+INSERT_CHUNK = 2000
+
+
+class MoneyflowTable:
+    """单个交易日的资金流向 (按列保存，金额单位万元)"""
+
+    def __init__(self, trade_date: str = '', codes: Iterable[str] = (), net_large=(), net_total=(), turnover=()):
+        self.trade_date = trade_date
+        self.codes = list(codes)
+        self.index = {code: row for row, code in enumerate(self.codes)}
+        self.net_large = np.asarray(net_large, dtype=np.float64)
+        self.net_total = np.asarray(net_total, dtype=np.float64)
+        self.turnover = np.asarray(turnover, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.large_ratio = np.where(self.turnover > 0, self.net_large / self.turnover * 100, np.nan)
+
+    @classmethod
+    def from_frame(cls, trade_date: str, df, codes: Optional[set] = None) -> "MoneyflowTable":
+        """由 moneyflow 返回的 DataFrame 计算派生列 (codes 不为空时只保留这些代码)"""
+        if codes:
+            df = df[df['ts_code'].isin(codes)]
+        df = df.drop_duplicates('ts_code')
+        amounts = df[list(ALL_AMOUNTS)].fillna(0).to_numpy(dtype=np.float64)
+        columns = {name: amounts[:, i] for i, name in enumerate(ALL_AMOUNTS)}
+        net_large = sum(columns[name] for name in LARGE_BUY) - sum(columns[name] for name in LARGE_SELL)
+        return cls(trade_date, df['ts_code'].astype(str), net_large,
+                   df['net_mf_amount'].fillna(0).to_numpy(dtype=np.float64), amounts.sum(axis=1))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def get(self, code: str) -> Optional[Dict[str, Any]]:
+        row = self.index.get(code)
+        if row is None:
+            return None
+        ratio = self.large_ratio[row]
+        return {
+            'trade_date': self.trade_date,
+            'net_large': float(self.net_large[row]),
+            'net_total': float(self.net_total[row]),
+            'large_ratio': None if math.isnan(ratio) else float(ratio),
+        }
+
+
+class MoneyflowStore:
+    """当前使用的资金流向 (整表替换，version 递增供调用方判断是否需要重新读取)"""
+
+    def __init__(self):
+        self.current = MoneyflowTable()
+        self.version = 0
+
+    def set(self, table: MoneyflowTable):
+        self.current = table
+        self.version += 1
+
+    def get(self, code: str) -> Optional[Dict[str, Any]]:
+        return self.current.get(code)
+
+    def large_ratio(self, code: str) -> float:
+        """大单净流入占比(%)，没有数据时为 nan"""
+        row = self.current.index.get(code)
+        return float(self.current.large_ratio[row]) if row is not None else math.nan
+
+    def describe(self) -> Dict[str, Any]:
+        return {'trade_date': self.current.trade_date or None, 'codes': len(self.current), 'version': self.version}
+
+    # ------------------------------------------------------------------
+    # 入库 / 加载
+    # ------------------------------------------------------------------
+    async def save(self, table: MoneyflowTable):
+        """整表写入 moneyflow_daily (同一交易日的旧数据先删除)"""
+        trade_date = int(table.trade_date)
+        async with get_db() as session:
+            ids = await symbol_registry.resolve(session, table.codes)
+            await session.execute(delete(MoneyflowDailyModel).where(MoneyflowDailyModel.trade_date == trade_date))
+            rows = [
+                {'trade_date': trade_date, 'symbol_id': ids[code], 'net_large': round(net_large * 100),
+                 'net_total': round(net_total * 100), 'turnover': round(turnover * 100)}
+                for code, net_large, net_total, turnover in zip(
+                    table.codes, table.net_large.tolist(), table.net_total.tolist(), table.turnover.tolist())
+            ]
+            for offset in range(0, len(rows), INSERT_CHUNK):
+                await session.execute(insert(MoneyflowDailyModel), rows[offset:offset + INSERT_CHUNK])
+
+    async def load(self, trade_date: str) -> Optional[MoneyflowTable]:
+        """加载不晚于 trade_date 的最近一个已入库交易日"""
+        async with get_db() as session:
+            stored = (await session.execute(
+                select(func.max(MoneyflowDailyModel.trade_date))
+                .where(MoneyflowDailyModel.trade_date <= int(trade_date))
+            )).scalar()
+            if stored is None:
+                return None
+            rows = (await session.execute(
+                select(MoneyflowDailyModel.symbol_id, MoneyflowDailyModel.net_large,
+                       MoneyflowDailyModel.net_total, MoneyflowDailyModel.turnover)
+                .where(MoneyflowDailyModel.trade_date == stored)
+            )).all()
+            names = await symbol_registry.decode(session, {row[0] for row in rows})
+        if not rows:
+            return None
+        values = np.array([row[1:] for row in rows], dtype=np.float64) / 100
+        return MoneyflowTable(str(stored), [names[row[0]] for row in rows],
+                              values[:, 0], values[:, 1], values[:, 2])
+
+    async def ingest(self, data_source, trade_date: str) -> Optional[MoneyflowTable]:
+        """从数据源获取某个交易日的全市场资金流向，只保留正股并入库"""
+        df = await data_source.get_moneyflow(trade_date)
+        if df is None or df.empty:
+            return None
+        bonds = await data_source.get_bonds()
+        underlyings = {bond['stock_code'] for bond in bonds if bond.get('stock_code')}
+        table = await asyncio.to_thread(MoneyflowTable.from_frame, trade_date, df, underlyings)
+        try:
+            await self.save(table)
+        except Exception as e:
+            logger.error(f"资金流向入库失败 ({trade_date}): {e}")
+        logger.info(f"资金流向已更新: {trade_date} {len(table)} 只正股 (全市场 {len(df)} 行)")
+        return table
+
+    async def refresh(self, data_source) -> bool:
+        """更新到最近一个已收盘交易日: 先查表，没有时从数据源获取，都没有时沿用最近已入库的交易日"""
+        target = trading_calendar.last_closed_trade_date()
+        if self.current.trade_date == target:
+            return False
+        table = await self.load(target)
+        if table is None or table.trade_date != target:
+            fetched = await self.ingest(data_source, target)
+            table = fetched if fetched is not None else table
+        if table is None or table.trade_date == self.current.trade_date:
+            return False
+        self.set(table)
+        return True
+
+    async def run(self, data_source, interval: Optional[float] = None):
+        """后台定期检查 (盘后数据发布前获取为空，下个周期重试)"""
+        interval = interval or settings.moneyflow_check_interval
+        while True:
+            try:
+                await self.refresh(data_source)
+            except Exception as e:
+                logger.error(f"更新资金流向失败: {e}")
+            await asyncio.sleep(interval)
+
+
+# 全局资金流向实例
+moneyflow_store = MoneyflowStore()
@@ -0,0 +1,353 @@
+"""
+监控配对快照
+
+把一次完整构建的配对列表固定为带版本号的只读快照，并在构建时为可排序字段预先建立有序索引:
+- 单字段排序直接按预排序索引顺序遍历，不再 list.sort
+- 区间过滤在预排序值上二分查找
+- 多字段排序使用预计算的名次(整数)比较
+同一快照上相同查询的结果顺序会被缓存，翻页只做切片。
+构建时同时计算市场宽度和市场状态 (见 app/services/market_regime.py)，随快照一起更新。
+分页游标记录快照版本: 快照重建后旧版本保留 RETAIN_SECONDS 秒 (最多 RETAIN_SNAPSHOTS 个)，
+翻页期间继续使用游标所在的快照，不会因重建而重复或遗漏配对; 旧版本已释放时接口返回 410，客户端从第一页重新开始。
+开启主节点选举时，主节点构建快照后发布到 system_snapshots (snapshot_type='pair_snapshot')，
+从节点不访问数据源，定期检查并加载已发布的快照。
+"""
+
+import asyncio
+import base64
+import bisect
+import hashlib
+import json
+import logging
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.models.database import SystemSnapshot as SystemSnapshotModel
+from app.models.schemas import MonitoringPair
+from app.services.market_regime import compute_regime
+from app.services.trading_calendar import CHINA_TZ, trading_calendar
+
+logger = logging.getLogger(__name__)
+
+# 可排序字段
+SORT_FIELDS = (
+    'stock_change', 'bond_change', 'premium', 'double_low',
+    'stock_price', 'bond_price', 'remaining_years', 'stock_large_flow_ratio',
+    'stock_roe', 'stock_debt_ratio', 'stock_revenue_yoy',
+)
+
+# 区间过滤参数名 -> 配对字段
+RANGE_FIELDS = {
+    'premium': 'premium',
+    'double_low': 'double_low',
+    'price': 'bond_price',
+    'remaining_years': 'remaining_years',
+    'large_flow': 'stock_large_flow_ratio',
+    'roe': 'stock_roe',
+    'debt_ratio': 'stock_debt_ratio',
+    'revenue_yoy': 'stock_revenue_yoy',
+}
+
+SHARED_SNAPSHOT_TYPE = 'pair_snapshot'
+SHARED_POLL_INTERVAL = 2.0  # 从节点检查已发布快照的间隔(秒)
+RETAIN_SECONDS = 120.0  # 被替换的快照继续为游标翻页保留的时长(秒)
+RETAIN_SNAPSHOTS = 8
+
+SortKey = Tuple[str, bool]  # (字段, 是否降序)
+Range = Tuple[Optional[float], Optional[float]]
+
+
+class PairSnapshot:
+    """带预排序索引的只读配对快照"""
+
+    query_cache_size = 64
+
+    def __init__(self, pairs: List[MonitoringPair], version: Optional[int] = None):
+        self.pairs = pairs
+        self.version = version if version is not None else int(time.time() * 1000)
+        self.created_at = time.time()
+
+        self._asc: Dict[str, List[int]] = {}
+        self._desc: Dict[str, List[int]] = {}
+        self._sorted_values: Dict[str, List[Decimal]] = {}
+        self._rank: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._query_cache: "OrderedDict[tuple, List[int]]" = OrderedDict()
+        self._pair_json: List[Optional[str]] = [None] * len(pairs)
+
+        for field in SORT_FIELDS:
+            self._build_index(field)
+        self.regime = compute_regime(pairs)
+
+    def _build_index(self, field: str):
+        # 没有数据 (None) 的配对不进入预排序值，区间过滤不会匹配，升序、降序都排在最后
+        values = [getattr(pair, field) for pair in self.pairs]
+        present = [i for i, value in enumerate(values) if value is not None]
+        missing = [i for i, value in enumerate(values) if value is None]
+        asc = sorted(present, key=values.__getitem__)
+        self._asc[field] = asc + missing
+        # reverse=True 的稳定排序保证同值时保持原始顺序
+        self._desc[field] = sorted(present, key=values.__getitem__, reverse=True) + missing
+        self._sorted_values[field] = [values[i] for i in asc]
+
+        # 名次(同值同名次)，用于多字段排序; 升序、降序各一份比较键，没有数据的名次为 len(values)
+        rank_asc = [len(values)] * len(values)
+        rank_desc = [len(values)] * len(values)
+        current_rank = 0
+        for position, index in enumerate(asc):
+            if position and values[index] != values[asc[position - 1]]:
+                current_rank = position
+            rank_asc[index] = current_rank
+            rank_desc[index] = -current_rank
+        self._rank[field] = (rank_asc, rank_desc)
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+    def _range_candidates(self, field: str, low: Optional[float], high: Optional[float]) -> List[int]:
+        """在预排序值上二分查找区间内的配对下标"""
+        values = self._sorted_values[field]
+        start = bisect.bisect_left(values, Decimal(str(low))) if low is not None else 0
+        end = bisect.bisect_right(values, Decimal(str(high))) if high is not None else len(values)
+        return self._asc[field][start:end]
+
+    def query(self, sort_keys: Sequence[SortKey], ranges: Optional[Dict[str, Range]] = None,
+              signal_filter: Optional[str] = None) -> List[int]:
+        """返回满足过滤条件、按排序键排列的配对下标 (结果按查询缓存)"""
+        ranges = {k: v for k, v in (ranges or {}).items() if v != (None, None)}
+        cache_key = (tuple(sort_keys), tuple(sorted(ranges.items())), signal_filter)
+        cached = self._query_cache.get(cache_key)
+        if cached is not None:
+            self._query_cache.move_to_end(cache_key)
+            return cached
+
+        # 区间过滤: 从最小的候选集开始求交集
+        candidates = None
+        for field, (low, high) in sorted(
+            ranges.items(), key=lambda item: len(self._range_candidates(item[0], *item[1]))
+        ):
+            matched = self._range_candidates(field, low, high)
+            candidates = set(matched) if candidates is None else candidates.intersection(matched)
+
+        if signal_filter in ('with_signal', 'no_signal'):
+            want_signal = signal_filter == 'with_signal'
+            signal_matched = {i for i, p in enumerate(self.pairs) if bool(p.signal_type) == want_signal}
+            candidates = signal_matched if candidates is None else candidates & signal_matched
+
+        primary, primary_desc = sort_keys[0]
+        if len(sort_keys) == 1:
+            # 单字段: 直接按预排序索引遍历
+            order = self._desc[primary] if primary_desc else self._asc[primary]
+            result = order if candidates is None else [i for i in order if i in candidates]
+        else:
+            # 多字段: 按名次元组排序
+            ranks = [self._rank[field][1 if desc else 0] for field, desc in sort_keys]
+            pool = range(len(self.pairs)) if candidates is None else candidates
+            result = sorted(pool, key=lambda i: tuple(rank[i] for rank in ranks))
+
+        self._query_cache[cache_key] = result
+        if len(self._query_cache) > self.query_cache_size:
+            self._query_cache.popitem(last=False)
+        return result
+
+    def page(self, indices: List[int], offset: int, limit: int) -> List[MonitoringPair]:
+        return [self.pairs[i] for i in indices[offset:offset + limit]]
+
+    def pair_json(self, index: int) -> str:
+        """单个配对的 JSON (每个快照只序列化一次)"""
+        cached = self._pair_json[index]
+        if cached is None:
+            cached = self._pair_json[index] = self.pairs[index].model_dump_json()
+        return cached
+
+    def render_page(self, indices: List[int], offset: int, limit: int, **meta) -> bytes:
+        """拼接预序列化的配对 JSON，生成与 MonitoringResponse 一致的响应体"""
+        data = ",".join(self.pair_json(i) for i in indices[offset:offset + limit])
+        tail = json.dumps(meta, ensure_ascii=False, separators=(',', ':'))
+        return f'{{"data":[{data}],{tail[1:]}'.encode()
+
+
+def parse_sort(sort: Optional[str], sort_by: str = 'stock_change', sort_order: str = 'desc') -> List[SortKey]:
+    """解析多字段排序参数，如 `premium:asc,double_low:desc`"""
+    if not sort:
+        sort = f"{sort_by}:{sort_order}"
+
+    keys = []
+    for part in sort.split(','):
+        field, _, order = part.strip().partition(':')
+        if field not in SORT_FIELDS:
+            raise ValueError(f"不支持的排序字段: {field}")
+        if order not in ('', 'asc', 'desc'):
+            raise ValueError(f"不支持的排序顺序: {order}")
+        keys.append((field, order != 'asc'))
+    return keys
+
+
+def query_fingerprint(sort_keys: Sequence[SortKey], ranges: Dict[str, Range],
+                      signal_filter: Optional[str]) -> str:
+    """查询条件指纹，用于校验游标"""
+    raw = json.dumps([list(sort_keys), sorted(ranges.items()), signal_filter], default=str)
+    return hashlib.md5(raw.encode()).hexdigest()[:8]
+
+
+def encode_cursor(version: int, offset: int, fingerprint: str) -> str:
+    raw = json.dumps({'v': version, 'o': offset, 'q': fingerprint}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Dict:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return {'version': int(data['v']), 'offset': int(data['o']), 'fingerprint': str(data['q'])}
+    except Exception:
+        raise ValueError("无效的分页游标")
+
+
+class PairSnapshotStore:
+    """持有当前快照，过期后在后台重建(重建期间继续提供旧快照)"""
+
+    def __init__(self):
+        self.current: Optional[PairSnapshot] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.shared = False  # 多进程部署: 快照由主节点发布，从节点从数据库加载
+        self.publishing = False  # 当前进程是主节点
+        self._checked_at = 0.0
+        self._published_at: Optional[datetime] = None
+        self._retained: "OrderedDict[int, Tuple[float, PairSnapshot]]" = OrderedDict()  # 版本 -> (替换时间, 快照)
+
+    def _replace(self, snapshot: PairSnapshot):
+        """替换当前快照，旧快照保留一段时间供已发出的游标继续翻页"""
+        if self.current is not None:
+            self._retained[self.current.version] = (time.monotonic(), self.current)
+        self.current = snapshot
+        cutoff = time.monotonic() - RETAIN_SECONDS
+        while self._retained and (len(self._retained) > RETAIN_SNAPSHOTS
+                                  or next(iter(self._retained.values()))[0] < cutoff):
+            self._retained.popitem(last=False)
+
+    def get_version(self, version: int) -> Optional[PairSnapshot]:
+        """游标所在版本的快照 (当前快照或仍在保留期内的旧快照)"""
+        if self.current is not None and self.current.version == version:
+            return self.current
+        retained = self._retained.get(version)
+        if retained is None or retained[0] < time.monotonic() - RETAIN_SECONDS:
+            return None
+        return retained[1]
+
+    def is_stale(self) -> bool:
+        if self.current is None:
+            return True
+        if time.time() - self.current.created_at < settings.monitoring_interval:
+            return False
+        # 非交易时段，收盘后构建的快照一直有效
+        if not trading_calendar.is_trading_time():
+            built_at = datetime.fromtimestamp(self.current.created_at, CHINA_TZ).replace(tzinfo=None)
+            return built_at < trading_calendar.last_session_close()
+        return True
+
+    async def get(self, data_source) -> PairSnapshot:
+        """获取当前快照；首次调用时同步构建"""
+        if self.shared and not self.publishing:
+            await self.load_shared()
+            return self.current if self.current is not None else PairSnapshot([])
+        if self.current is None:
+            await self.refresh(data_source)
+        elif self.is_stale() and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self.refresh(data_source))
+        if self.current is None:
+            return PairSnapshot([])
+        return self.current
+
+    async def refresh(self, data_source):
+        """重建快照"""
+        async with self._lock:
+            if self.current is not None and not self.is_stale():
+                return
+            start = time.perf_counter()
+            pairs = await data_source.get_monitoring_pairs(limit=settings.snapshot_max_pairs)
+            if not pairs and self.current is not None:
+                logger.warning("配对快照重建结果为空，继续使用旧快照")
+                return
+            self._replace(PairSnapshot(pairs))
+            logger.info(f"配对快照已重建: {len(pairs)} 个配对, 耗时 {time.perf_counter() - start:.2f}s")
+            if self.publishing:
+                await self.publish(self.current)
+
+    async def run(self, data_source, interval: float = 1.0):
+        """主节点: 快照过期时主动重建并发布，从节点不必等待请求触发"""
+        while True:
+            if self.is_stale():
+                try:
+                    await self.refresh(data_source)
+                except Exception as e:
+                    logger.error(f"配对快照重建失败: {e}")
+            await asyncio.sleep(interval)
+
+    # ------------------------------------------------------------------
+    # 多进程共享
+    # ------------------------------------------------------------------
+    async def publish(self, snapshot: PairSnapshot):
+        """把快照写入 system_snapshots (原地更新同一行)"""
+        payload = {
+            'version': snapshot.version,
+            'created_at': snapshot.created_at,
+            'pairs': [pair.model_dump(mode='json') for pair in snapshot.pairs],
+        }
+        data = base64.b64encode(zlib.compress(json.dumps(payload, separators=(',', ':')).encode())).decode()
+        published_at = datetime.now()
+        try:
+            async with get_db() as session:
+                result = await session.execute(
+                    update(SystemSnapshotModel)
+                    .where(SystemSnapshotModel.snapshot_type == SHARED_SNAPSHOT_TYPE)
+                    .values(snapshot_data=data, created_at=published_at)
+                )
+                if not result.rowcount:
+                    session.add(SystemSnapshotModel(snapshot_type=SHARED_SNAPSHOT_TYPE, snapshot_data=data,
+                                                    created_at=published_at))
+            self._published_at = published_at
+        except Exception as e:
+            logger.error(f"发布配对快照失败: {e}")
+
+    async def load_shared(self):
+        """从节点: 已发布的快照有更新时加载 (每 SHARED_POLL_INTERVAL 秒最多检查一次)"""
+        if time.monotonic() - self._checked_at < SHARED_POLL_INTERVAL:
+            return
+        async with self._lock:
+            if time.monotonic() - self._checked_at < SHARED_POLL_INTERVAL:
+                return
+            self._checked_at = time.monotonic()
+            try:
+                async with get_db() as session:
+                    published_at = (await session.execute(
+                        select(SystemSnapshotModel.created_at)
+                        .where(SystemSnapshotModel.snapshot_type == SHARED_SNAPSHOT_TYPE)
+                    )).scalar()
+                    if published_at is None or published_at == self._published_at:
+                        return
+                    data = (await session.execute(
+                        select(SystemSnapshotModel.snapshot_data)
+                        .where(SystemSnapshotModel.snapshot_type == SHARED_SNAPSHOT_TYPE)
+                    )).scalar()
+            except Exception as e:
+                logger.warning(f"读取已发布的配对快照失败: {e}")
+                return
+            payload = json.loads(zlib.decompress(base64.b64decode(data)))
+            snapshot = PairSnapshot([MonitoringPair.model_validate(pair) for pair in payload['pairs']],
+                                    version=payload['version'])
+            snapshot.created_at = payload['created_at']
+            self._replace(snapshot)
+            self._published_at = published_at
+
+
+# 全局快照实例
+pair_snapshot_store = PairSnapshotStore()
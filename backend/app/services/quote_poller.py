@@ -0,0 +1,211 @@
+"""
+盘中实时行情轮询
+
+把全部可转债及其正股按50个代码一组切分，在限流预算内并发调用 realtime_quote，
+结果统一写入行情缓存和 price_ticks。约500只可转债的全市场刷新只需约20次调用。
+启用自适应调度时，每秒只刷新调度器判定到期的代码(见 refresh_scheduler)。
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.metrics import metrics
+from app.models.database import Signal as SignalModel
+from app.models.schemas import PriceTickBase
+from app.services.pair_snapshot import pair_snapshot_store
+from app.services.refresh_scheduler import RefreshScheduler, configured_favorites
+from app.services.signal_engine import ShardedSignalEngine
+from app.services.tick_store import TickWriter
+from app.services.trading_calendar import trading_calendar
+
+logger = logging.getLogger(__name__)
+
+
+def make_shards(codes: List[str], size: int) -> List[List[str]]:
+    """按固定大小切分代码列表"""
+    return [codes[i:i + size] for i in range(0, len(codes), size)]
+
+
+class IntradayQuotePoller:
+    """批量实时行情轮询器"""
+
+    universe_ttl = 3600  # 代码池刷新间隔(秒)
+    scheduler_tick = 1.0  # 自适应调度的检查间隔(秒)
+
+    def __init__(self, data_source, tick_writer: Optional[TickWriter] = None,
+                 scheduler: Optional[RefreshScheduler] = None,
+                 signal_engine: Optional[ShardedSignalEngine] = None):
+        self.data_source = data_source
+        self.tick_writer = tick_writer if tick_writer is not None else (
+            TickWriter() if settings.quote_persist_ticks else None
+        )
+        self.batch_size = min(settings.quote_batch_size, 50)
+        self.concurrency = settings.quote_poll_concurrency
+        self.interval = settings.quote_poll_interval
+        self.scheduler = scheduler
+        self.signal_engine = signal_engine
+        self._priorities_loaded_at = 0.0
+
+        # 代码 -> 类型 (stock / bond)
+        self.code_types: Dict[str, str] = {}
+        self._universe_loaded_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def load_universe(self, force: bool = False) -> Dict[str, str]:
+        """加载可转债及正股代码池"""
+        if not force and self.code_types and time.time() - self._universe_loaded_at < self.universe_ttl:
+            return self.code_types
+
+        bonds = await self.data_source.get_bonds()
+        code_types = {}
+        bond_by_stock = {}
+        for bond in bonds:
+            if bond.get('stock_code'):
+                code_types[bond['stock_code']] = 'stock'
+                bond_by_stock.setdefault(bond['stock_code'], bond['ts_code'])
+            code_types[bond['ts_code']] = 'bond'
+        if code_types:
+            self.code_types = code_types
+            self._universe_loaded_at = time.time()
+            if self.scheduler is not None:
+                self.scheduler.set_universe(code_types)
+            if self.signal_engine is not None:
+                self.signal_engine.set_bond_mapping(bond_by_stock)
+        return self.code_types
+
+    async def refresh_priorities(self):
+        """刷新自选和未完成信号，供调度器计算优先级"""
+        open_codes = set()
+        try:
+            async with get_db() as session:
+                result = await session.execute(
+                    select(SignalModel.stock_code, SignalModel.bond_code)
+                    .where(SignalModel.status.in_(('pending', 'processing')))
+                    .distinct()
+                )
+                for stock_code, bond_code in result.all():
+                    open_codes.update(code for code in (stock_code, bond_code) if code)
+        except Exception as e:
+            logger.error(f"加载未完成信号失败: {e}")
+        self.scheduler.set_open_signals(open_codes)
+
+        # 每次重新生成，从配置中移除的代码不再保留自选优先级
+        favorites = configured_favorites()
+        snapshot = pair_snapshot_store.current
+        if snapshot is not None:
+            for pair in snapshot.pairs:
+                if pair.is_favorite:
+                    favorites.update((pair.stock_code, pair.bond_code))
+        self.scheduler.set_favorites(favorites)
+        self._priorities_loaded_at = time.time()
+
+    def shards(self, codes: Optional[List[str]] = None) -> List[List[str]]:
+        codes = sorted(self.code_types) if codes is None else codes
+        return make_shards(codes, self.batch_size)
+
+    async def _fetch_shard(self, semaphore: asyncio.Semaphore, shard: List[str]) -> List[Dict]:
+        async with semaphore:
+            try:
+                return await self.data_source.get_realtime_quotes(shard)
+            except Exception as e:
+                logger.error(f"实时行情分片请求失败 ({shard[0]}...): {e}")
+                return []
+
+    async def poll_once(self, codes: Optional[List[str]] = None) -> Tuple[int, int]:
+        """轮询一次，返回 (请求次数, 获得的行情数)"""
+        if codes is None:
+            await self.load_universe()
+        shards = self.shards(codes)
+        if not shards:
+            return 0, 0
+
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._fetch_shard(semaphore, shard) for shard in shards))
+
+        received = 0
+        stock_quotes = []
+        for quotes in results:
+            for quote in quotes:
+                data_type = self.code_types.get(quote['code'], 'stock')
+                if data_type == 'stock':
+                    stock_quotes.append(quote)
+                self.data_source.cache_quote(quote['code'], data_type, quote)
+                if self.scheduler is not None:
+                    self.scheduler.update_quote(quote['code'], float(quote['price']), float(quote['change']))
+                if self.tick_writer is not None:
+                    self.tick_writer.add(PriceTickBase(
+                        stock_code=quote['code'],
+                        price=quote['price'],
+                        volume=quote['volume'],
+                        amount=quote['amount'],
+                        data_source='realtime_quote'
+                    ), timestamp=quote['timestamp'])
+                received += 1
+
+        if self.signal_engine is not None:
+            self.signal_engine.submit(stock_quotes)
+        if self.tick_writer is not None:
+            await self.tick_writer.flush()
+
+        elapsed = time.perf_counter() - start
+        metrics.set_gauge("quote_poll_duration_seconds", round(elapsed, 4))
+        metrics.set_gauge("quote_poll_codes", received)
+        metrics.inc("quote_poll_calls_total", len(shards))
+        return len(shards), received
+
+    async def poll_scheduled(self) -> Tuple[int, int]:
+        """只刷新调度器判定到期的代码"""
+        await self.load_universe()
+        if time.time() - self._priorities_loaded_at >= settings.signal_check_interval:
+            await self.refresh_priorities()
+
+        codes = self.scheduler.due_codes()
+        if not codes:
+            return 0, 0
+        result = await self.poll_once(codes)
+        self.scheduler.rebalance()
+        self.scheduler.mark_refreshed(codes)
+        return result
+
+    async def run(self):
+        """持续轮询 (自适应调度时按秒检查到期代码，否则按固定间隔全量刷新)"""
+        interval = self.scheduler_tick if self.scheduler is not None else self.interval
+        logger.info(f"盘中行情轮询已启动 (间隔 {interval}s, 每批 {self.batch_size} 个代码)")
+        while True:
+            started = time.monotonic()
+            try:
+                await self.data_source.ensure_calendar()
+                if not trading_calendar.is_trading_time():
+                    # 非交易时段不请求行情
+                    await asyncio.sleep(self.interval)
+                    continue
+                if self.scheduler is not None:
+                    calls, received = await self.poll_scheduled()
+                else:
+                    calls, received = await self.poll_once()
+                logger.debug(f"行情轮询完成: {calls} 次请求, {received} 条行情")
+            except Exception as e:
+                logger.error(f"行情轮询失败: {e}")
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(), name="quote-poller")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.tick_writer is not None:
+            await self.tick_writer.flush()
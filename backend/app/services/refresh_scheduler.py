@@ -0,0 +1,230 @@
+"""
+自适应行情刷新调度
+
+按代码计算刷新优先级，高优先级(波动大、接近涨停、自选、有未完成信号)的代码刷新更频繁，
+平淡的代码降频。所有代码的刷新频率换算成批量请求次数后不超过每分钟调用预算。
+自选代码来自 FAVORITE_CODES 配置 (前端页面的收藏只保存在浏览器本地，不参与调度)。
+"""
+
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from app.core.config import settings
+
+# 优先级权重
+VOLATILITY_WEIGHT = 1.0
+LIMIT_UP_WEIGHT = 1.0
+FAVORITE_WEIGHT = 0.5
+SIGNAL_WEIGHT = 1.0
+
+VOLATILITY_REFERENCE = 0.005  # 两次轮询间 0.5% 的平均波动视为高波动
+LIMIT_UP_NEAR = 1.0  # 距涨停 1 个百分点以内为最高分
+LIMIT_UP_FAR = 5.0  # 距涨停 5 个百分点以上不加分
+EWMA_ALPHA = 0.3
+
+
+def limit_up_pct(code: str, data_type: str = 'stock') -> float:
+    """涨停幅度(%)：主板10%，创业板/科创板/可转债20%，北交所30%"""
+    if data_type == 'bond':
+        return 20.0
+    symbol = code.split('.')[0]
+    if code.endswith('.BJ') or symbol.startswith(('4', '8', '92')):
+        return 30.0
+    if symbol.startswith(('300', '301', '688', '689')):
+        return 20.0
+    return 10.0
+
+
+class CodeState:
+    """单个代码的调度状态"""
+
+    __slots__ = ('code', 'data_type', 'last_price', 'volatility', 'change',
+                 'priority', 'interval', 'next_due', 'last_refreshed')
+
+    def __init__(self, code: str, data_type: str):
+        self.code = code
+        self.data_type = data_type
+        self.last_price: Optional[float] = None
+        self.volatility = 0.0
+        self.change = 0.0
+        self.priority = 0.0
+        self.interval = 0.0
+        self.next_due = 0.0
+        self.last_refreshed: Optional[float] = None
+
+
+def configured_favorites() -> Set[str]:
+    """FAVORITE_CODES 配置的自选代码"""
+    return {code.strip() for code in settings.favorite_codes.split(',') if code.strip()}
+
+
+class RefreshScheduler:
+    """按优先级分配刷新频率的调度器"""
+
+    def __init__(self, min_interval: Optional[float] = None, max_interval: Optional[float] = None,
+                 calls_per_minute: Optional[int] = None, batch_size: Optional[int] = None):
+        self.min_interval = min_interval or settings.quote_poll_interval
+        self.max_interval = max_interval or float(settings.monitoring_interval)
+        self.calls_per_minute = calls_per_minute or settings.quote_call_budget
+        self.batch_size = batch_size or min(settings.quote_batch_size, 50)
+
+        self.states: Dict[str, CodeState] = {}
+        self.favorites: Set[str] = configured_favorites()
+        self.open_signals: Set[str] = set()
+        self.scale = 1.0  # 为满足预算对所有间隔施加的放大系数
+
+    # ------------------------------------------------------------------
+    # 输入
+    # ------------------------------------------------------------------
+    def set_universe(self, code_types: Dict[str, str]):
+        """设置调度的代码池 (代码 -> stock/bond)"""
+        now = time.monotonic()
+        for code, data_type in code_types.items():
+            if code not in self.states:
+                state = CodeState(code, data_type)
+                state.next_due = now
+                self.states[code] = state
+        for code in list(self.states):
+            if code not in code_types:
+                del self.states[code]
+        self.rebalance()
+
+    def set_favorites(self, codes: Iterable[str]):
+        self.favorites = set(codes)
+        self.rebalance()
+
+    def set_open_signals(self, codes: Iterable[str]):
+        self.open_signals = set(codes)
+        self.rebalance()
+
+    def update_quote(self, code: str, price: float, change: float):
+        """根据最新行情更新波动率和涨幅"""
+        state = self.states.get(code)
+        if state is None:
+            return
+        if state.last_price:
+            move = abs(price / state.last_price - 1)
+            state.volatility = EWMA_ALPHA * move + (1 - EWMA_ALPHA) * state.volatility
+        state.last_price = price
+        state.change = change
+
+    # ------------------------------------------------------------------
+    # 优先级和间隔
+    # ------------------------------------------------------------------
+    def _priority(self, state: CodeState) -> float:
+        score = VOLATILITY_WEIGHT * min(1.0, state.volatility / VOLATILITY_REFERENCE)
+
+        distance = limit_up_pct(state.code, state.data_type) - state.change
+        if distance <= LIMIT_UP_NEAR:
+            score += LIMIT_UP_WEIGHT
+        elif distance < LIMIT_UP_FAR:
+            score += LIMIT_UP_WEIGHT * (LIMIT_UP_FAR - distance) / (LIMIT_UP_FAR - LIMIT_UP_NEAR)
+
+        if state.code in self.favorites:
+            score += FAVORITE_WEIGHT
+        if state.code in self.open_signals:
+            score += SIGNAL_WEIGHT
+        return score
+
+    def _base_interval(self, priority: float) -> float:
+        """优先级 0 -> 最长间隔，优先级 >= 1 -> 最短间隔 (几何插值)"""
+        ratio = self.min_interval / self.max_interval
+        return self.max_interval * ratio ** min(1.0, priority)
+
+    def rebalance(self):
+        """重新计算所有代码的优先级和刷新间隔，并按预算缩放"""
+        if not self.states:
+            return
+        for state in self.states.values():
+            state.priority = self._priority(state)
+            state.interval = self._base_interval(state.priority)
+
+        # 每分钟需要的批量请求数
+        demand = sum(60.0 / state.interval for state in self.states.values()) / self.batch_size
+        self.scale = max(1.0, demand / self.calls_per_minute)
+        if self.scale > 1.0:
+            for state in self.states.values():
+                state.interval *= self.scale
+
+    # ------------------------------------------------------------------
+    # 调度
+    # ------------------------------------------------------------------
+    def due_codes(self, now: Optional[float] = None) -> List[str]:
+        """返回到期需要刷新的代码；最后一批不足时提前补入即将到期的代码"""
+        now = time.monotonic() if now is None else now
+        ordered = sorted(self.states.values(), key=lambda s: s.next_due)
+        due = [s.code for s in ordered if s.next_due <= now]
+        if not due:
+            return []
+
+        remainder = len(due) % self.batch_size
+        if remainder:
+            fill = self.batch_size - remainder
+            due += [s.code for s in ordered[len(due):len(due) + fill]]
+        return due
+
+    def mark_refreshed(self, codes: Iterable[str], now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        for code in codes:
+            state = self.states.get(code)
+            if state is not None:
+                state.last_refreshed = now
+                state.next_due = now + state.interval
+
+    # ------------------------------------------------------------------
+    # 状态导出 / 恢复
+    # ------------------------------------------------------------------
+    def export_state(self) -> Dict:
+        """导出各代码的波动率和最新价，用于重启后不必重新学习优先级"""
+        return {
+            'codes': [[s.code, s.data_type, s.last_price, s.volatility, s.change] for s in self.states.values()],
+            'favorites': sorted(self.favorites),
+            'open_signals': sorted(self.open_signals),
+        }
+
+    def restore_state(self, state: Dict) -> int:
+        """恢复 export_state 导出的状态 (所有代码立即到期)，返回恢复的代码数"""
+        now = time.monotonic()
+        for code, data_type, last_price, volatility, change in state.get('codes', []):
+            code_state = CodeState(code, data_type)
+            code_state.last_price = last_price
+            code_state.volatility = volatility
+            code_state.change = change
+            code_state.next_due = now
+            self.states[code] = code_state
+        self.favorites = set(state.get('favorites', []))
+        self.open_signals = set(state.get('open_signals', []))
+        self.rebalance()
+        return len(state.get('codes', []))
+
+    def describe(self, limit: int = 100) -> Dict:
+        """当前调度状态，供接口查看"""
+        now = time.monotonic()
+        states = sorted(self.states.values(), key=lambda s: s.priority, reverse=True)
+        calls = sum(60.0 / s.interval for s in self.states.values()) / self.batch_size if self.states else 0
+        return {
+            'codes': len(self.states),
+            'calls_per_minute_budget': self.calls_per_minute,
+            'calls_per_minute_planned': round(calls, 2),
+            'budget_scale': round(self.scale, 3),
+            'min_interval': self.min_interval,
+            'max_interval': self.max_interval,
+            'schedule': [
+                {
+                    'code': s.code,
+                    'type': s.data_type,
+                    'priority': round(s.priority, 3),
+                    'interval': round(s.interval, 2),
+                    'next_due_in': round(max(0.0, s.next_due - now), 2),
+                    'volatility': round(s.volatility, 5),
+                    'change': round(s.change, 2),
+                    'favorite': s.code in self.favorites,
+                    'open_signal': s.code in self.open_signals,
+                }
+                for s in states[:limit]
+            ],
+        }
+
+
+# 全局调度器实例
+refresh_scheduler = RefreshScheduler()
@@ -0,0 +1,203 @@
+"""
+分钟K线增量汇总
+
+TickWriter 写入行情时，在同一事务中把这批行情按 (代码, 周期, K线开始时间) 聚合为部分 K 线，
+再用 INSERT ... ON CONFLICT DO UPDATE 与已有 K 线合并: 开盘取最早一条、收盘和累计量取最晚一条、
+最高/最低取极值、条数相加。合并与顺序无关，分批写入或晚到的行情结果不变。
+
+图表接口只读取 price_bars 中的几百根 K 线，ma5/ma10/ma20 在读取时按收盘价计算，不扫描原始行情:
+- 1d: 最近一个交易日的 1 分钟 K 线
+- 5d: 最近五个交易日的 5 分钟 K 线
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.dialects import sqlite
+
+from app.core.database import get_db
+from app.models.database import PriceBar as PriceBarModel
+from app.models.schemas import ChartDataPoint
+from app.services.trading_calendar import trading_calendar
+
+
+PERIODS = (1, 5)
+MA_WINDOWS = (5, 10, 20)
+# 图表周期 -> (K线周期(分钟), 交易日数)
+INTRADAY_RANGES = {'1d': (1, 1), '5d': (5, 5)}
+
+
+def bar_start(timestamp: datetime, period: int) -> datetime:
+    return timestamp.replace(minute=timestamp.minute - timestamp.minute % period, second=0, microsecond=0)
+
+
+def aggregate(rows: Iterable[Dict], periods: Iterable[int] = PERIODS) -> List[Dict]:
+    """把一批行情 (stock_code/price/volume/amount/timestamp) 聚合为部分 K 线"""
+    bars: Dict[tuple, Dict] = {}
+    for row in rows:
+        timestamp, price = row['timestamp'], row['price']
+        for period in periods:
+            key = (row['stock_code'], period, bar_start(timestamp, period))
+            bar = bars.get(key)
+            if bar is None:
+                bars[key] = {
+                    'stock_code': key[0], 'period': period, 'bar_time': key[2],
+                    'open': price, 'high': price, 'low': price, 'close': price,
+                    'cum_volume': row['volume'], 'cum_amount': row['amount'],
+                    'ticks': 1, 'first_at': timestamp, 'last_at': timestamp,
+                }
+                continue
+            if timestamp < bar['first_at']:
+                bar['first_at'], bar['open'] = timestamp, price
+            if timestamp >= bar['last_at']:
+                bar['last_at'], bar['close'] = timestamp, price
+                if row['volume'] is not None:
+                    bar['cum_volume'] = row['volume']
+                if row['amount'] is not None:
+                    bar['cum_amount'] = row['amount']
+            if price > bar['high']:
+                bar['high'] = price
+            elif price < bar['low']:
+                bar['low'] = price
+            bar['ticks'] += 1
+    return list(bars.values())
+
+
+def _merge_statement(session):
+    """插入部分 K 线，与已有 K 线合并 (SET 中的列均为更新前的值)"""
+    table = PriceBarModel.__table__
+    if session.bind.dialect.name == 'postgresql':
+        from sqlalchemy.dialects import postgresql as dialect  # 只在使用 PostgreSQL 时导入
+    else:
+        dialect = sqlite
+    stmt = dialect.insert(table)
+    new, old = stmt.excluded, table.c
+    earlier = new.first_at < old.first_at
+    later = new.last_at >= old.last_at
+    return stmt.on_conflict_do_update(
+        index_elements=[old.stock_code, old.period, old.bar_time],
+        set_={
+            'open': case((earlier, new.open), else_=old.open),
+            'first_at': case((earlier, new.first_at), else_=old.first_at),
+            'high': case((new.high > old.high, new.high), else_=old.high),
+            'low': case((new.low < old.low, new.low), else_=old.low),
+            'close': case((later, new.close), else_=old.close),
+            'cum_volume': case((later, func.coalesce(new.cum_volume, old.cum_volume)), else_=old.cum_volume),
+            'cum_amount': case((later, func.coalesce(new.cum_amount, old.cum_amount)), else_=old.cum_amount),
+            'last_at': case((later, new.last_at), else_=old.last_at),
+            'ticks': old.ticks + new.ticks,
+        },
+    )
+
+
+async def update_bars(session, rows: List[Dict]) -> int:
+    """用一批新写入的行情更新 K 线，返回涉及的 K 线数"""
+    bars = aggregate(rows)
+    if bars:
+        await session.execute(_merge_statement(session), bars)
+    return len(bars)
+
+
+async def rebuild_bars(start: datetime, end: datetime) -> int:
+    """用 [start, end) 内已保存的行情重建 K 线 (开启汇总前的历史数据)"""
+    from app.services.tick_store import iter_ticks
+
+    async with get_db() as session:
+        await session.execute(delete(PriceBarModel).where(
+            PriceBarModel.bar_time >= bar_start(start, max(PERIODS)), PriceBarModel.bar_time < end
+        ))
+        count = 0
+        async for batch in iter_ticks(session, bar_start(start, max(PERIODS)), end):
+            rows = [{'stock_code': code, 'timestamp': timestamp, 'price': price, 'volume': volume, 'amount': amount}
+                    for code, timestamp, price, volume, amount, _ in batch]
+            count += await update_bars(session, rows)
+    return count
+
+
+# ----------------------------------------------------------------------
+# 图表读取
+# ----------------------------------------------------------------------
+def to_chart_points(times: List[str], closes: List[Decimal], volumes: List[Optional[int]],
+                    skip: int = 0) -> List[ChartDataPoint]:
+    """按收盘价计算 ma5/ma10/ma20，前 skip 个点只用于均线预热，不输出"""
+    points = []
+    sums = {window: Decimal(0) for window in MA_WINDOWS}
+    for index, close in enumerate(closes):
+        averages = {}
+        for window in MA_WINDOWS:
+            sums[window] += close
+            if index >= window:
+                sums[window] -= closes[index - window]
+            if index >= window - 1:
+                averages[f'ma{window}'] = (sums[window] / window).quantize(Decimal('0.001'))
+        if index >= skip:
+            points.append(ChartDataPoint(time=times[index], price=close, volume=volumes[index], **averages))
+    return points
+
+
+async def intraday_chart(session, code: str, time_range: str, adjust: str = 'none') -> List[ChartDataPoint]:
+    """从 K 线汇总表读取分时图数据 (adjust 为 qfq/hfq 时按 K 线所在交易日的复权因子复权)"""
+    period, days = INTRADAY_RANGES[time_range]
+    last = (await session.execute(
+        select(func.max(PriceBarModel.bar_time))
+        .where(PriceBarModel.stock_code == code, PriceBarModel.period == period)
+    )).scalar()
+    if last is None:
+        return []
+    start = datetime.strptime(trading_calendar.trade_days_back(days, now=last), '%Y%m%d')
+
+    columns = (PriceBarModel.bar_time, PriceBarModel.close, PriceBarModel.cum_volume)
+    current = (await session.execute(
+        select(*columns)
+        .where(PriceBarModel.stock_code == code, PriceBarModel.period == period, PriceBarModel.bar_time >= start)
+        .order_by(PriceBarModel.bar_time)
+    )).all()
+    # 均线预热需要起点之前的 K 线 (同时用于计算第一根 K 线的成交量)
+    warmup = (await session.execute(
+        select(*columns)
+        .where(PriceBarModel.stock_code == code, PriceBarModel.period == period, PriceBarModel.bar_time < start)
+        .order_by(PriceBarModel.bar_time.desc()).limit(max(MA_WINDOWS))
+    )).all()[::-1]
+
+    times, closes, volumes = [], [], []
+    previous = None
+    for bar_time, close, cum_volume in warmup + current:
+        # 累计成交量与同一交易日前一根 K 线相减得到本根 K 线的成交量
+        if cum_volume is None:
+            volume = None
+        elif previous is not None and previous[0].date() == bar_time.date() and previous[1] is not None:
+            volume = max(cum_volume - previous[1], 0)
+        else:
+            volume = cum_volume
+        previous = (bar_time, cum_volume)
+        times.append(bar_time.strftime('%Y-%m-%d %H:%M'))
+        closes.append(close)
+        volumes.append(volume)
+    if adjust != 'none':
+        from app.services.adj_factors import adj_factor_store
+
+        dates = [int(row[0].strftime('%Y%m%d')) for row in warmup + current]
+        closes = adj_factor_store.adjust_prices(code, dates, closes, adjust)
+    return to_chart_points(times, closes, volumes, skip=len(warmup))
+
+
+def daily_chart(history: List[Dict], points: int) -> List[ChartDataPoint]:
+    """日线历史 (get_price_history 的结果) 转为图表数据，保留最后 points 个交易日"""
+    skip = max(len(history) - points, 0)
+    return to_chart_points(
+        [str(item['time']) for item in history],
+        [Decimal(str(item['price'])) for item in history],
+        [item.get('volume') for item in history],
+        skip=skip,
+    )
+
+
+# 日线图表周期 -> 交易日数
+DAILY_RANGES = {'1M': 22, '3M': 66, '1Y': 250}
+
+
+def history_days(time_range: str) -> int:
+    """获取日线历史时的自然日数 (含均线预热)"""
+    return int((DAILY_RANGES[time_range] + max(MA_WINDOWS)) * 1.5) + 10
@@ -0,0 +1,180 @@
+"""
+股票/可转债本地搜索索引
+
+把 stock_basic 和 cb_basic 全量加载到内存，支持:
+- 代码前缀 (600、600000、600000.SH)
+- 名称子串 (按单字倒排索引求交集后校验)
+- 拼音首字母前缀 (需要安装 pypinyin，未安装时跳过)
+每天刷新一次，查询不访问 Tushare。
+"""
+
+import bisect
+import logging
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_pinyin = None  # (Style, lazy_pinyin)，首次建索引时导入 (pypinyin 加载词典较慢)
+
+
+def _load_pinyin():
+    global _pinyin
+    if _pinyin is None:
+        try:
+            from pypinyin import Style, lazy_pinyin
+            _pinyin = (Style, lazy_pinyin)
+        except ImportError:  # pypinyin 为可选依赖
+            _pinyin = ()
+    return _pinyin
+
+
+def pinyin_initials(name: str) -> str:
+    """名称的拼音首字母，如 平安银行 -> payh"""
+    pinyin = _load_pinyin()
+    if not pinyin or not name:
+        return ''
+    style, lazy_pinyin = pinyin
+    return ''.join(part[0] for part in lazy_pinyin(name, style=style.FIRST_LETTER) if part).lower()
+
+
+class SearchEntry:
+    """索引条目"""
+
+    __slots__ = ('code', 'symbol', 'name', 'kind', 'area', 'industry', 'stock_code', 'initials')
+
+    def __init__(self, code: str, name: str, kind: str, symbol: str = '', area: str = '',
+                 industry: str = '', stock_code: str = ''):
+        self.code = code
+        self.symbol = symbol or code.split('.')[0]
+        self.name = name or ''
+        self.kind = kind  # stock / bond
+        self.area = area or ''
+        self.industry = industry or ''
+        self.stock_code = stock_code or ''
+        self.initials = pinyin_initials(self.name)
+
+
+class StockSearchIndex:
+    """内存搜索索引"""
+
+    def __init__(self):
+        self.entries: List[SearchEntry] = []
+        self.loaded_date: Optional[str] = None
+        self._code_keys: List[tuple] = []  # (小写代码, 条目下标)，有序
+        self._initial_keys: List[tuple] = []  # (拼音首字母, 条目下标)，有序
+        self._char_index: Dict[str, Set[int]] = {}  # 名称单字 -> 条目下标
+        self._bonds_by_stock: Dict[str, List[int]] = {}
+        self._stock_by_code: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def build(self, stocks: List[Dict], bonds: List[Dict], loaded_date: Optional[str] = None):
+        """全量构建索引 (CPU 密集，建议在线程中调用)"""
+        entries = [
+            SearchEntry(s['ts_code'], s.get('name', ''), 'stock', symbol=s.get('symbol', ''),
+                        area=s.get('area', ''), industry=s.get('industry', ''))
+            for s in stocks
+        ]
+        entries += [
+            SearchEntry(b['ts_code'], b.get('bond_name', ''), 'bond', stock_code=b.get('stock_code', ''))
+            for b in bonds
+        ]
+
+        code_keys, initial_keys = [], []
+        char_index: Dict[str, Set[int]] = {}
+        bonds_by_stock: Dict[str, List[int]] = {}
+        stock_by_code: Dict[str, int] = {}
+        for i, entry in enumerate(entries):
+            code_keys.append((entry.code.lower(), i))
+            if entry.symbol.lower() != entry.code.lower():
+                code_keys.append((entry.symbol.lower(), i))
+            if entry.initials:
+                initial_keys.append((entry.initials, i))
+            for char in set(entry.name.lower()):
+                char_index.setdefault(char, set()).add(i)
+            if entry.kind == 'bond' and entry.stock_code:
+                bonds_by_stock.setdefault(entry.stock_code, []).append(i)
+            elif entry.kind == 'stock':
+                stock_by_code[entry.code] = i
+
+        code_keys.sort()
+        initial_keys.sort()
+
+        # 一次性替换，查询期间不会看到半成品
+        (self.entries, self._code_keys, self._initial_keys, self._char_index,
+         self._bonds_by_stock, self._stock_by_code, self.loaded_date) = (
+            entries, code_keys, initial_keys, char_index, bonds_by_stock, stock_by_code, loaded_date
+        )
+        logger.info(f"搜索索引已构建: {len(stocks)} 只股票, {len(bonds)} 只可转债")
+
+    @staticmethod
+    def _prefix_matches(keys: List[tuple], prefix: str) -> List[int]:
+        start = bisect.bisect_left(keys, (prefix,))
+        matches = []
+        for key, index in keys[start:]:
+            if not key.startswith(prefix):
+                break
+            matches.append(index)
+        return matches
+
+    def _name_matches(self, keyword: str) -> Set[int]:
+        candidates: Optional[Set[int]] = None
+        for char in set(keyword):
+            indices = self._char_index.get(char)
+            if not indices:
+                return set()
+            candidates = set(indices) if candidates is None else candidates & indices
+        return {i for i in candidates or () if keyword in self.entries[i].name.lower()}
+
+    def search(self, keyword: str, limit: int = 20) -> List[Dict]:
+        """搜索并按匹配程度排序"""
+        keyword = keyword.strip().lower()
+        if not keyword or not self.entries:
+            return []
+
+        # 匹配等级: 0 代码/名称完全一致, 1 代码前缀, 2 名称前缀, 3 拼音首字母前缀, 4 名称子串
+        ranks: Dict[int, int] = {}
+
+        def rank(index: int, level: int):
+            if level < ranks.get(index, 99):
+                ranks[index] = level
+
+        for index in self._prefix_matches(self._code_keys, keyword):
+            entry = self.entries[index]
+            exact = keyword in (entry.code.lower(), entry.symbol.lower())
+            rank(index, 0 if exact else 1)
+        if keyword.isascii() and keyword.isalpha():
+            for index in self._prefix_matches(self._initial_keys, keyword):
+                rank(index, 3)
+        for index in self._name_matches(keyword):
+            name = self.entries[index].name.lower()
+            rank(index, 0 if name == keyword else 2 if name.startswith(keyword) else 4)
+
+        ordered = sorted(ranks, key=lambda i: (ranks[i], self.entries[i].kind != 'stock', self.entries[i].code))
+        return [self._to_result(i) for i in ordered[:limit]]
+
+    def _to_result(self, index: int) -> Dict:
+        entry = self.entries[index]
+        if entry.kind == 'stock':
+            return {
+                'code': entry.code,
+                'symbol': entry.symbol,
+                'name': entry.name,
+                'area': entry.area,
+                'industry': entry.industry,
+                'type': 'stock',
+                'bonds': [
+                    {'code': self.entries[i].code, 'name': self.entries[i].name}
+                    for i in self._bonds_by_stock.get(entry.code, [])
+                ],
+            }
+        stock_index = self._stock_by_code.get(entry.stock_code)
+        return {
+            'code': entry.code,
+            'symbol': entry.symbol,
+            'name': entry.name,
+            'type': 'bond',
+            'stock_code': entry.stock_code,
+            'stock_name': self.entries[stock_index].name if stock_index is not None else '',
+        }
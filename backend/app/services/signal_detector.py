@@ -0,0 +1,112 @@
+"""
+逐笔信号检测
+
+按代码维护状态，对每条行情判断:
+- limit_up: 价格达到涨停价
+- big_rise: 涨幅超过阈值
+- volume_spike: 单笔成交量增量超过近期平均增量的若干倍; 设置了 min_large_flow 时还要求正股上一交易日
+  大单净流入占比不低于该值 (大单净流出时的放量多为出货，不触发)，没有资金流向数据 (nan) 时不限制
+同一代码同一交易日每种信号只触发一次。检测器只依赖标准库，
+既可在主进程中直接使用，也可在 signal_engine 的工作进程中使用。
+"""
+
+import math
+from typing import Dict, Hashable, List, Optional
+
+LIMIT_UP = 'limit_up'
+BIG_RISE = 'big_rise'
+VOLUME_SPIKE = 'volume_spike'
+
+VOLUME_EWMA_ALPHA = 0.1
+VOLUME_WARMUP = 5  # 计算放量基准前至少需要的增量样本数
+
+
+class CodeWindow:
+    """单个代码的检测状态"""
+
+    __slots__ = ('trade_date', 'last_volume', 'volume_avg', 'samples', 'fired')
+
+    def __init__(self, trade_date):
+        self.trade_date = trade_date
+        self.last_volume: Optional[float] = None
+        self.volume_avg = 0.0
+        self.samples = 0
+        self.fired = set()
+
+
+class SignalDetector:
+    """按代码的信号检测器 (同一代码的行情必须按时间顺序输入)"""
+
+    def __init__(self, big_rise_threshold: float = 5.0, volume_spike_ratio: float = 5.0,
+                 min_large_flow: Optional[float] = None):
+        self.big_rise_threshold = big_rise_threshold  # 涨幅阈值(%)
+        self.volume_spike_ratio = volume_spike_ratio
+        self.min_large_flow = min_large_flow  # 放量信号要求的大单净流入占比(%)
+        self.windows: Dict[Hashable, CodeWindow] = {}
+
+    def process(self, code: Hashable, trade_date, price: float, pre_close: float, volume: float,
+                limit_pct: float, timestamp: float = 0.0, large_flow: float = math.nan) -> List[Dict]:
+        """处理一条行情，返回新触发的信号 (volume 为当日累计成交量，limit_pct 为涨停幅度%，
+        large_flow 为上一交易日大单净流入占比%)"""
+        window = self.windows.get(code)
+        if window is None or window.trade_date != trade_date:
+            window = self.windows[code] = CodeWindow(trade_date)
+        if price <= 0 or pre_close <= 0:
+            return []
+
+        signals = []
+        change = (price / pre_close - 1) * 100
+        limit_price = round(pre_close * (1 + limit_pct / 100) + 1e-9, 2)
+
+        if price >= limit_price and LIMIT_UP not in window.fired:
+            signals.append(self._signal(window, code, LIMIT_UP, change, price, timestamp))
+        if change >= self.big_rise_threshold and BIG_RISE not in window.fired:
+            signals.append(self._signal(window, code, BIG_RISE, change, price, timestamp))
+
+        if window.last_volume is not None:
+            delta = volume - window.last_volume
+            if delta > 0:
+                if (window.samples >= VOLUME_WARMUP and VOLUME_SPIKE not in window.fired
+                        and delta >= self.volume_spike_ratio * window.volume_avg
+                        and self._large_flow_ok(large_flow)):
+                    ratio = delta / window.volume_avg if window.volume_avg else 0.0
+                    signals.append(self._signal(window, code, VOLUME_SPIKE, ratio, price, timestamp))
+                window.volume_avg = (delta if window.samples == 0 else
+                                     VOLUME_EWMA_ALPHA * delta + (1 - VOLUME_EWMA_ALPHA) * window.volume_avg)
+                window.samples += 1
+        window.last_volume = volume
+        return signals
+
+    def _large_flow_ok(self, large_flow: float) -> bool:
+        return self.min_large_flow is None or math.isnan(large_flow) or large_flow >= self.min_large_flow
+
+    @staticmethod
+    def _signal(window: CodeWindow, code, signal_type: str, value: float, price: float, timestamp: float) -> Dict:
+        window.fired.add(signal_type)
+        return {
+            'code': code,
+            'signal_type': signal_type,
+            'trigger_value': round(value, 2),
+            'trigger_price': price,
+            'timestamp': timestamp,
+        }
+
+    def reset(self):
+        self.windows.clear()
+
+    def export_windows(self) -> List[list]:
+        """导出各代码的检测状态 [代码, 交易日, 上次累计量, 平均增量, 样本数, 已触发信号]"""
+        return [
+            [code, window.trade_date, window.last_volume, window.volume_avg, window.samples, sorted(window.fired)]
+            for code, window in self.windows.items()
+        ]
+
+    def restore_windows(self, rows: List[list]):
+        """恢复 export_windows 导出的状态 (交易日变化后会自动重置)"""
+        for code, trade_date, last_volume, volume_avg, samples, fired in rows:
+            window = CodeWindow(trade_date)
+            window.last_volume = last_volume
+            window.volume_avg = volume_avg
+            window.samples = samples
+            window.fired = set(fired)
+            self.windows[code] = window
@@ -0,0 +1,489 @@
+"""
+多进程分片信号检测
+
+按 stock_code 的 crc32 哈希把代码分配到固定的工作进程，行情以定长记录写入
+每个分片独立的共享内存环形缓冲区 (单生产者/单消费者)，工作进程批量读出后用
+SignalDetector 检测，信号通过结果队列回到主进程批量写入 signals 表。
+同一代码总是进入同一分片并按写入顺序处理，因此单代码内的顺序得到保证；
+吞吐随工作进程数近似线性扩展，主进程只负责打包和写库。
+workers=0 时在主进程内直接检测 (单核部署或调试用)。
+检测状态 (各代码的滚动窗口) 可以导出和恢复，用于重启后保持信号检测的连续性 (见 warm_state.py)。
+主进程定期检查工作进程是否存活: 异常退出 (OOM、未捕获异常) 的分片以新的环形缓冲区和结果队列重新启动，
+旧缓冲区中尚未读出的记录和积压记录一起写入新的缓冲区，已被读出但没有返回结果的行情计为丢弃，
+该分片的检测窗口从空开始。
+每个工作进程使用独立的结果队列，被杀死的进程不会占住其他分片共用的队列锁。
+"""
+
+import asyncio
+import logging
+import math
+import multiprocessing as mp
+import queue
+import time
+import zlib
+from collections import deque
+from decimal import Decimal
+from multiprocessing import shared_memory
+from typing import Deque, Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import insert
+
+from app.core.database import get_db
+from app.core.metrics import metrics
+from app.models.database import Signal as SignalModel
+from app.services.refresh_scheduler import limit_up_pct
+from app.services.signal_detector import SignalDetector
+
+logger = logging.getLogger(__name__)
+
+# 环形缓冲区中的定长行情记录
+TICK_DTYPE = np.dtype([
+    ('code_id', '<i4'),
+    ('trade_date', '<i4'),
+    ('price', '<f8'),
+    ('pre_close', '<f8'),
+    ('volume', '<f8'),
+    ('limit_pct', '<f4'),
+    ('timestamp', '<f8'),
+    ('large_flow', '<f4'),  # 上一交易日大单净流入占比(%)，没有资金流向数据时为 nan
+])
+READ_BATCH = 4096
+WORKER_CHECK_INTERVAL = 1.0  # 检查工作进程是否存活的最小间隔(秒)
+
+
+class TickRing:
+    """共享内存环形缓冲区 (头部为累计写入数、累计读取数、状态导出请求序号三个 int64)"""
+
+    header_size = 24
+
+    def __init__(self, capacity: int, name: Optional[str] = None):
+        self.capacity = capacity
+        size = self.header_size + capacity * TICK_DTYPE.itemsize
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self._counters = np.ndarray(3, dtype=np.int64, buffer=self.shm.buf)
+        self._records = np.ndarray(capacity, dtype=TICK_DTYPE, buffer=self.shm.buf, offset=self.header_size)
+        if self.owner:
+            self._counters[:] = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def __len__(self) -> int:
+        return int(self._counters[0] - self._counters[1])
+
+    def write(self, records: np.ndarray) -> int:
+        """写入尽可能多的记录，返回写入条数 (仅生产者调用)"""
+        head, tail = int(self._counters[0]), int(self._counters[1])
+        count = min(len(records), self.capacity - (head - tail))
+        if count <= 0:
+            return 0
+        start = head % self.capacity
+        first = min(count, self.capacity - start)
+        self._records[start:start + first] = records[:first]
+        if count > first:
+            self._records[:count - first] = records[first:count]
+        # 数据写完后再推进写指针，消费者不会读到未写完的记录
+        self._counters[0] = head + count
+        return count
+
+    def read(self, limit: int = READ_BATCH) -> np.ndarray:
+        """读出最多 limit 条记录的副本 (仅消费者调用)"""
+        head, tail = int(self._counters[0]), int(self._counters[1])
+        count = min(limit, head - tail)
+        if count <= 0:
+            return self._records[:0].copy()
+        start = tail % self.capacity
+        first = min(count, self.capacity - start)
+        batch = self._records[start:start + first].copy()
+        if count > first:
+            batch = np.concatenate([batch, self._records[:count - first]])
+        self._counters[1] = tail + count
+        return batch
+
+    def request_export(self) -> int:
+        """请求工作进程导出检测状态，返回请求序号"""
+        self._counters[2] += 1
+        return int(self._counters[2])
+
+    @property
+    def export_seq(self) -> int:
+        return int(self._counters[2])
+
+    def close(self):
+        # 先释放对共享内存的视图引用，否则无法关闭
+        self._counters = self._records = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _worker_main(shard: int, ring_name: str, capacity: int, results, stop,
+                 big_rise_threshold: float, volume_spike_ratio: float, min_large_flow: Optional[float] = None,
+                 windows: Optional[List[list]] = None):
+    """工作进程: 从环形缓冲区读取行情并检测信号"""
+    ring = TickRing(capacity, name=ring_name)
+    detector = SignalDetector(big_rise_threshold, volume_spike_ratio, min_large_flow)
+    if windows:
+        detector.restore_windows(windows)
+    exported = 0  # 进程启动前发出的导出请求也要响应
+    try:
+        while True:
+            if ring.export_seq != exported:
+                # 已读出的行情都处理完后再导出，状态与已提交的行情一致
+                exported = ring.export_seq
+                results.put(('state', shard, exported, detector.export_windows()))
+            batch = ring.read()
+            if not len(batch):
+                if stop.is_set():
+                    break
+                time.sleep(0.0005)
+                continue
+            signals = []
+            for row in batch.tolist():
+                fired = detector.process(*row)
+                if fired:
+                    signals.extend(fired)
+            results.put(('ticks', shard, len(batch), signals))
+    finally:
+        ring.close()
+
+
+class ShardedSignalEngine:
+    """按代码哈希分片的信号检测引擎"""
+
+    def __init__(self, workers: int = 2, ring_capacity: int = 65536,
+                 big_rise_threshold: float = 5.0, volume_spike_ratio: float = 5.0,
+                 min_large_flow: Optional[float] = None, moneyflow=None):
+        self.workers = workers
+        self.ring_capacity = ring_capacity
+        self.big_rise_threshold = big_rise_threshold
+        self.volume_spike_ratio = volume_spike_ratio
+        self.min_large_flow = min_large_flow
+        # 资金流向 (MoneyflowStore)，各代码的大单净流入占比随行情写入记录
+        self.moneyflow = moneyflow
+        self._moneyflow_version = None
+
+        # 代码 <-> 整数编号 (记录中只存编号)
+        self.code_ids: Dict[str, int] = {}
+        self.codes: List[str] = []
+        self._shard_of: List[int] = []
+        self._limit_pct: List[float] = []
+        self._large_flow: List[float] = []
+        self.bond_by_stock: Dict[str, str] = {}
+
+        self.submitted = 0
+        self.processed = 0
+        self._signals: List[Dict] = []
+        self._pending: List[Deque[np.ndarray]] = []
+        self._rings: List[TickRing] = []
+        self._processes: List = []
+        self._results: List = []  # 每个分片的结果队列
+        self._written: List[int] = []  # 每个分片写入当前环形缓冲区的记录数
+        self._done: List[int] = []  # 每个分片已返回结果的记录数
+        self._ctx = None
+        self._stop = None
+        self._checked_at = 0.0
+        self.restarts = 0
+        self.dropped = 0  # 工作进程异常退出时丢弃的行情数
+        self._detector: Optional[SignalDetector] = None
+        self._task: Optional[asyncio.Task] = None
+        self._initial_windows: List[list] = []  # start 前恢复的检测状态
+        self._exports: Dict[int, List[list]] = {}
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+    def start(self, persist: bool = True):
+        """启动工作进程；persist 为 True 时在后台定期把信号写入数据库"""
+        if persist:
+            self._task = asyncio.create_task(self.run(), name="signal-persist")
+        if self.workers <= 0:
+            self._detector = SignalDetector(self.big_rise_threshold, self.volume_spike_ratio, self.min_large_flow)
+            self._detector.restore_windows(self._initial_windows)
+            self._initial_windows = []
+            return
+        # spawn 避免在已有事件循环和线程的进程中 fork
+        self._ctx = mp.get_context('spawn')
+        self._stop = self._ctx.Event()
+        shard_windows: List[List[list]] = [[] for _ in range(self.workers)]
+        for row in self._initial_windows:
+            shard_windows[self._shard_of[row[0]]].append(row)
+        self._initial_windows = []
+        self._rings = [None] * self.workers
+        self._processes = [None] * self.workers
+        self._results = [None] * self.workers
+        self._written = [0] * self.workers
+        self._done = [0] * self.workers
+        self._pending = [deque() for _ in range(self.workers)]
+        for shard in range(self.workers):
+            self._spawn(shard, shard_windows[shard])
+        self._checked_at = time.monotonic()
+        logger.info(f"信号检测引擎已启动: {self.workers} 个工作进程")
+
+    def _spawn(self, shard: int, windows: Optional[List[list]] = None):
+        """以新的环形缓冲区和结果队列启动一个分片的工作进程"""
+        ring = TickRing(self.ring_capacity)
+        results = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main, name=f"signal-worker-{shard}", daemon=True,
+            args=(shard, ring.name, self.ring_capacity, results, self._stop,
+                  self.big_rise_threshold, self.volume_spike_ratio, self.min_large_flow, windows)
+        )
+        process.start()
+        self._rings[shard] = ring
+        self._results[shard] = results
+        self._processes[shard] = process
+        self._written[shard] = self._done[shard] = 0
+
+    def check_workers(self, force: bool = False) -> int:
+        """重启异常退出的工作进程，返回重启数量 (每 WORKER_CHECK_INTERVAL 秒最多检查一次)"""
+        if not self._processes or self._stop.is_set():
+            return 0
+        now = time.monotonic()
+        if not force and now - self._checked_at < WORKER_CHECK_INTERVAL:
+            return 0
+        self._checked_at = now
+        restarted = 0
+        for shard, process in enumerate(self._processes):
+            if process.is_alive():
+                continue
+            exitcode = process.exitcode
+            # 正常退出 (如未捕获异常) 时结果已写完，先取出；被信号杀死时队列可能残缺，直接丢弃
+            if exitcode is not None and exitcode >= 0:
+                self._collect_shard(shard)
+            # 工作进程已退出，由主进程读出旧缓冲区中未读的记录，放回积压队列的最前面
+            unread = self._rings[shard].read(len(self._rings[shard]))
+            if len(unread):
+                self._pending[shard].appendleft(unread)
+            lost = self._written[shard] - self._done[shard] - len(unread)
+            self.processed += lost
+            self.dropped += lost
+            self.restarts += 1
+            restarted += 1
+            metrics.inc("signal_worker_restarts_total")
+            logger.error(f"信号检测工作进程 {shard} 已退出 (exitcode={exitcode})，重新启动; "
+                         f"丢弃 {lost} 条未处理的行情，积压 {sum(map(len, self._pending[shard]))} 批保留")
+            process.join(timeout=0)
+            self._results[shard].close()
+            self._rings[shard].close()
+            self._spawn(shard)
+        return restarted
+
+    async def stop(self, timeout: float = 10.0):
+        """处理完已提交的行情后停止工作进程"""
+        if self._processes:
+            await self.drain(timeout)
+            self._stop.set()
+            for process in self._processes:
+                await asyncio.to_thread(process.join, timeout)
+                if process.is_alive():
+                    process.terminate()
+            self._collect_results()
+            for ring in self._rings:
+                ring.close()
+            for results in self._results:
+                results.close()
+            self._processes, self._rings, self._pending, self._results = [], [], [], []
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self.persist()
+
+    # ------------------------------------------------------------------
+    # 输入
+    # ------------------------------------------------------------------
+    def set_bond_mapping(self, bond_by_stock: Dict[str, str]):
+        """正股 -> 可转债，用于填充信号的 bond_code"""
+        self.bond_by_stock = dict(bond_by_stock)
+
+    def _code_id(self, code: str) -> int:
+        code_id = self.code_ids.get(code)
+        if code_id is None:
+            code_id = self.code_ids[code] = len(self.codes)
+            self.codes.append(code)
+            self._shard_of.append(zlib.crc32(code.encode()) % max(1, self.workers))
+            self._limit_pct.append(limit_up_pct(code))
+            self._large_flow.append(self.moneyflow.large_ratio(code) if self.moneyflow is not None else math.nan)
+        return code_id
+
+    def _sync_moneyflow(self):
+        """资金流向更新 (新交易日) 后重新读取各代码的大单净流入占比"""
+        if self.moneyflow is None or self.moneyflow.version == self._moneyflow_version:
+            return
+        self._moneyflow_version = self.moneyflow.version
+        self._large_flow = [self.moneyflow.large_ratio(code) for code in self.codes]
+
+    def submit(self, quotes: Iterable[Dict]) -> int:
+        """提交一批正股行情 (与 get_realtime_quotes 返回格式相同)，返回提交条数"""
+        shards: List[List[tuple]] = [[] for _ in range(max(1, self.workers))]
+        self._sync_moneyflow()
+        for quote in quotes:
+            if quote.get('is_stale'):
+                continue  # 旧数据不参与信号检测
+            code_id = self._code_id(quote['code'])
+            timestamp = quote['timestamp']
+            shards[self._shard_of[code_id]].append((
+                code_id, int(quote['trade_date']), float(quote['price']), float(quote['pre_close']),
+                float(quote['volume']), self._limit_pct[code_id],
+                timestamp.timestamp() if hasattr(timestamp, 'timestamp') else float(timestamp or 0),
+                self._large_flow[code_id],
+            ))
+
+        count = sum(len(rows) for rows in shards)
+        self.submitted += count
+        if self._detector is not None:
+            for rows in shards:
+                for row in rows:
+                    fired = self._detector.process(*row)
+                    if fired:
+                        self._signals.extend(self._resolve(fired))
+            self.processed += count
+            return count
+
+        for shard, rows in enumerate(shards):
+            if rows:
+                self._pending[shard].append(np.array(rows, dtype=TICK_DTYPE))
+        self.pump()
+        return count
+
+    def pump(self):
+        """把积压的记录写入环形缓冲区 (缓冲区满时保留到下次)"""
+        self.check_workers()
+        for shard, pending in enumerate(self._pending):
+            ring = self._rings[shard]
+            while pending:
+                records = pending[0]
+                written = ring.write(records)
+                self._written[shard] += written
+                if written < len(records):
+                    pending[0] = records[written:]
+                    break
+                pending.popleft()
+
+    @property
+    def backlog(self) -> int:
+        return self.submitted - self.processed
+
+    # ------------------------------------------------------------------
+    # 输出
+    # ------------------------------------------------------------------
+    def _resolve(self, fired: List[Dict]) -> List[Dict]:
+        signals = []
+        for signal in fired:
+            stock_code = self.codes[signal['code']]
+            signals.append({
+                'stock_code': stock_code,
+                'bond_code': self.bond_by_stock.get(stock_code),
+                'signal_type': signal['signal_type'],
+                'trigger_value': Decimal(str(signal['trigger_value'])),
+                'trigger_price': Decimal(str(round(signal['trigger_price'], 2))),
+            })
+        return signals
+
+    def _collect_results(self):
+        for shard in range(len(self._results)):
+            self._collect_shard(shard)
+
+    def _collect_shard(self, shard: int):
+        results = self._results[shard]
+        while True:
+            try:
+                message = results.get_nowait()
+            except queue.Empty:
+                return
+            if message[0] == 'state':
+                _, _, _, windows = message
+                self._exports[shard] = windows
+                continue
+            _, _, processed, fired = message
+            self.processed += processed
+            self._done[shard] += processed
+            if fired:
+                self._signals.extend(self._resolve(fired))
+
+    def take_signals(self) -> List[Dict]:
+        """取出已检测到的信号"""
+        self.pump()
+        self._collect_results()
+        signals, self._signals = self._signals, []
+        return signals
+
+    async def drain(self, timeout: float = 10.0) -> bool:
+        """等待已提交的行情全部处理完"""
+        deadline = time.monotonic() + timeout
+        while self.backlog > 0:
+            self.pump()
+            self._collect_results()
+            if time.monotonic() > deadline:
+                return False
+            await asyncio.sleep(0.001)
+        return True
+
+    # ------------------------------------------------------------------
+    # 检测状态导出 / 恢复
+    # ------------------------------------------------------------------
+    def restore_state(self, windows: List[list]):
+        """恢复 export_state 导出的检测状态 (需在 start 之前调用)"""
+        for row in windows:
+            self._initial_windows.append([self._code_id(row[0]), *row[1:]])
+
+    async def export_state(self, timeout: float = 5.0) -> List[list]:
+        """导出各代码的检测状态 (代码为字符串，可在新进程中恢复)"""
+        if self._detector is not None:
+            rows = self._detector.export_windows()
+        elif self._processes:
+            self._exports = {}
+            for ring in self._rings:
+                ring.request_export()
+            deadline = time.monotonic() + timeout
+            while len(self._exports) < len(self._rings):
+                self.pump()
+                self._collect_results()
+                if time.monotonic() > deadline:
+                    logger.warning(f"导出检测状态超时 ({len(self._exports)}/{len(self._rings)} 个工作进程)")
+                    break
+                await asyncio.sleep(0.001)
+            rows = [row for shard_rows in self._exports.values() for row in shard_rows]
+        else:
+            rows = self._initial_windows
+        return [[self.codes[row[0]], *row[1:]] for row in rows]
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+    async def persist(self) -> int:
+        """把已检测到的信号批量写入 signals 表，返回写入条数"""
+        signals = self.take_signals()
+        if not signals:
+            return 0
+        try:
+            async with get_db() as session:
+                await session.execute(insert(SignalModel), signals)
+        except Exception as e:
+            logger.error(f"写入信号失败 ({len(signals)} 条): {e}")
+            # 放回队列，下次重试
+            self._signals = signals + self._signals
+            return 0
+        metrics.inc("signals_detected_total", len(signals))
+        return len(signals)
+
+    async def run(self, interval: float = 0.5):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.persist()
+                metrics.set_gauge("signal_engine_backlog", self.backlog)
+                metrics.set_gauge("signal_engine_ticks_processed", self.processed)
+            except Exception as e:
+                logger.error(f"信号持久化失败: {e}")
@@ -0,0 +1,374 @@
+"""
+确定性的仿真行情数据源
+
+按随机种子生成成千上万个代码的相关行情:
+- 正股收益 = 市场因子 + 个股噪声 (相关系数 market_correlation)，按板块涨跌停幅度截断
+- 可转债收益 = delta × 正股收益 + 少量噪声，保持与正股联动
+- 可按时间脚本注入涨停封板、放量等事件
+相同的种子和步进序列总是产生相同的行情，不访问网络，
+用于配对构建、信号检测、行情写入等路径的压测和长时间浸泡测试。
+"""
+
+import asyncio
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from app.models.schemas import MonitoringPair
+from app.services.data_source import DataSource, build_monitoring_pair
+from app.services.refresh_scheduler import limit_up_pct
+from app.services.search_index import StockSearchIndex
+
+# 仿真交易时段 (连续竞价)
+MORNING = ((9, 30), (11, 30))
+AFTERNOON = ((13, 0), (15, 0))
+
+
+@dataclass
+class SimEvent:
+    """脚本事件 (at 为相对仿真开始的秒数)"""
+    at: float
+    code: str
+    kind: str  # limit_up / volume_spike
+    duration: float = 300.0
+    magnitude: float = 10.0  # volume_spike 的成交量倍数
+
+
+class SimulatedDataSource(DataSource):
+    """实现 DataSource 接口的仿真市场"""
+
+    def __init__(self, seed: int = 42, n_bonds: int = 500, n_stocks: int = 0,
+                 tick_interval: float = 3.0, start: Optional[datetime] = None,
+                 volatility: float = 0.3, market_correlation: float = 0.5,
+                 events: Optional[List[SimEvent]] = None, follow_wall_clock: bool = True):
+        self.seed = seed
+        self.n_bonds = n_bonds
+        self.n_stocks = max(n_stocks, n_bonds)  # 前 n_bonds 只正股各对应一只可转债
+        self.tick_interval = tick_interval  # 每步推进的仿真秒数
+        self.volatility = volatility  # 年化波动率
+        self.market_correlation = market_correlation
+        self.follow_wall_clock = follow_wall_clock  # 接口调用时按真实时间推进行情
+        self.rng = np.random.default_rng(seed)
+
+        self.start = start or datetime(2024, 1, 2, 9, 30)
+        self.clock = self.start
+        self.elapsed = 0.0  # 已仿真的交易秒数
+        self.steps = 0
+        self._wall_synced_at = time.monotonic()
+
+        self._build_universe()
+        self.events: List[SimEvent] = sorted(events or [], key=lambda e: e.at)
+        self._event_cursor = 0
+        self._pinned_until = np.zeros(self.n_stocks)  # 涨停封板结束时间
+        self._spike_until = np.zeros(self.n_stocks)
+        self._spike_factor = np.ones(self.n_stocks)
+        self.search_index = StockSearchIndex()
+
+    # ------------------------------------------------------------------
+    # 代码池
+    # ------------------------------------------------------------------
+    def _build_universe(self):
+        n, m = self.n_stocks, self.n_bonds
+        # 每5只中有1只创业板(20%涨跌幅)，其余为沪市主板
+        self.stock_codes = [
+            f"{300000 + i:06d}.SZ" if i % 5 == 4 else f"{600000 + i:06d}.SH" for i in range(n)
+        ]
+        self.stock_names = [f"仿真股份{i:04d}" for i in range(n)]
+        self.bond_codes = [f"{113000 + i:06d}.SH" for i in range(m)]
+        self.bond_names = [f"仿真转债{i:04d}" for i in range(m)]
+        self.stock_index = {code: i for i, code in enumerate(self.stock_codes)}
+        self.bond_index = {code: i for i, code in enumerate(self.bond_codes)}
+
+        rng = self.rng
+        self.stock_pre_close = np.round(rng.uniform(3, 60, n), 2)
+        self.stock_price = self.stock_pre_close.copy()
+        self.stock_open = self.stock_price.copy()
+        self.stock_high = self.stock_price.copy()
+        self.stock_low = self.stock_price.copy()
+        self.stock_limit = np.array([limit_up_pct(code) / 100 for code in self.stock_codes])
+        self.stock_volume = np.zeros(n, dtype=np.int64)
+        self.stock_amount = np.zeros(n)
+        self.volume_rate = rng.lognormal(np.log(2000), 1.0, n)  # 每秒平均成交量(股)
+
+        # 转股价围绕正股价上下浮动，转债价格 = 转股价值 × (1 + 溢价率)，不低于债底
+        self.conversion_price = np.round(self.stock_pre_close[:m] * rng.uniform(0.8, 1.3, m), 2)
+        conversion_value = 100 * self.stock_pre_close[:m] / self.conversion_price
+        self.bond_pre_close = np.round(np.maximum(90.0, conversion_value * (1 + rng.uniform(0.02, 0.4, m))), 3)
+        self.bond_price = self.bond_pre_close.copy()
+        self.bond_open = self.bond_price.copy()
+        self.bond_high = self.bond_price.copy()
+        self.bond_low = self.bond_price.copy()
+        self.bond_delta = np.clip(conversion_value / self.bond_pre_close, 0.2, 0.95)
+        self.bond_volume = np.zeros(m, dtype=np.int64)
+        self.bond_amount = np.zeros(m)
+        self.maturity_years = rng.uniform(0.5, 6, m)
+
+    # ------------------------------------------------------------------
+    # 仿真步进
+    # ------------------------------------------------------------------
+    def _advance_clock(self, seconds: float):
+        """推进仿真时钟，跳过午休，收盘后滚动到下一个工作日"""
+        self.clock += timedelta(seconds=seconds)
+        self.elapsed += seconds
+        hm = (self.clock.hour, self.clock.minute)
+        if MORNING[1] <= hm < AFTERNOON[0]:
+            self.clock = self.clock.replace(hour=AFTERNOON[0][0], minute=AFTERNOON[0][1], second=0, microsecond=0)
+        elif hm >= AFTERNOON[1]:
+            self._roll_day()
+
+    def _roll_day(self):
+        next_day = self.clock.date() + timedelta(days=1)
+        while next_day.weekday() >= 5:
+            next_day += timedelta(days=1)
+        self.clock = datetime.combine(next_day, datetime.min.time()).replace(hour=MORNING[0][0], minute=MORNING[0][1])
+        for prefix in ('stock', 'bond'):
+            price = getattr(self, f'{prefix}_price')
+            setattr(self, f'{prefix}_pre_close', price.copy())
+            for field in ('open', 'high', 'low'):
+                setattr(self, f'{prefix}_{field}', price.copy())
+            getattr(self, f'{prefix}_volume')[:] = 0
+            getattr(self, f'{prefix}_amount')[:] = 0
+
+    def _apply_events(self):
+        while self._event_cursor < len(self.events) and self.events[self._event_cursor].at <= self.elapsed:
+            event = self.events[self._event_cursor]
+            self._event_cursor += 1
+            index = self.stock_index.get(event.code)
+            if index is None:
+                continue
+            if event.kind == 'limit_up':
+                self._pinned_until[index] = self.elapsed + event.duration
+            elif event.kind == 'volume_spike':
+                self._spike_until[index] = self.elapsed + event.duration
+                self._spike_factor[index] = event.magnitude
+
+    def step(self) -> float:
+        """推进一步 (tick_interval 秒)，更新全部代码的价格和成交量，返回仿真时间"""
+        dt = self.tick_interval
+        self._advance_clock(dt)
+        self._apply_events()
+        n, m = self.n_stocks, self.n_bonds
+        rng = self.rng
+
+        # 相关的对数收益
+        sigma = self.volatility * np.sqrt(dt / (252 * 4 * 3600))
+        rho = self.market_correlation
+        shocks = rho * rng.standard_normal() + np.sqrt(1 - rho ** 2) * rng.standard_normal(n)
+        previous = self.stock_price
+        upper = np.round(self.stock_pre_close * (1 + self.stock_limit), 2)
+        lower = np.round(self.stock_pre_close * (1 - self.stock_limit), 2)
+        price = np.clip(np.round(previous * np.exp(sigma * shocks), 2), lower, upper)
+        pinned = self._pinned_until > self.elapsed
+        price[pinned] = upper[pinned]
+        stock_return = np.log(price / previous)
+        self.stock_price = price
+
+        spiking = self._spike_until > self.elapsed
+        factor = np.where(spiking, self._spike_factor, 1.0)
+        factor[pinned] = np.maximum(factor[pinned], 3.0)  # 封板期间成交放大
+        volume = (rng.poisson(self.volume_rate * dt * factor / 100) * 100).astype(np.int64)
+        self.stock_volume += volume
+        self.stock_amount += volume * price
+        self.stock_high = np.maximum(self.stock_high, price)
+        self.stock_low = np.minimum(self.stock_low, price)
+
+        # 可转债跟随正股
+        bond_noise = sigma * 0.2 * rng.standard_normal(m)
+        bond_upper = self.bond_pre_close * 1.2
+        bond_lower = self.bond_pre_close * 0.8
+        bond_price = np.clip(np.round(self.bond_price * np.exp(self.bond_delta * stock_return[:m] + bond_noise), 3),
+                             bond_lower, bond_upper)
+        self.bond_price = bond_price
+        bond_volume = (rng.poisson(self.volume_rate[:m] * dt * factor[:m] / 1000) * 10).astype(np.int64)
+        self.bond_volume += bond_volume
+        self.bond_amount += bond_volume * bond_price
+        self.bond_high = np.maximum(self.bond_high, bond_price)
+        self.bond_low = np.minimum(self.bond_low, bond_price)
+
+        self.steps += 1
+        return self.elapsed
+
+    def _sync_wall_clock(self):
+        """按真实流逝时间推进仿真 (单次最多推进1000步)"""
+        if not self.follow_wall_clock:
+            return
+        now = time.monotonic()
+        steps = min(1000, int((now - self._wall_synced_at) / self.tick_interval))
+        for _ in range(steps):
+            self.step()
+        if steps:
+            self._wall_synced_at += steps * self.tick_interval
+
+    # ------------------------------------------------------------------
+    # 事件脚本
+    # ------------------------------------------------------------------
+    def schedule(self, event: SimEvent):
+        """追加脚本事件"""
+        self.events.append(event)
+        self.events[self._event_cursor:] = sorted(self.events[self._event_cursor:], key=lambda e: e.at)
+
+    def script_random_events(self, count: int, horizon: float, kinds=('limit_up', 'volume_spike')) -> List[SimEvent]:
+        """在 [0, horizon) 秒内按种子随机生成事件"""
+        rng = np.random.default_rng(self.seed + 1)
+        events = [
+            SimEvent(at=float(at), code=self.stock_codes[int(index)], kind=kinds[int(kind)])
+            for at, index, kind in zip(rng.uniform(0, horizon, count),
+                                       rng.integers(0, self.n_stocks, count),
+                                       rng.integers(0, len(kinds), count))
+        ]
+        for event in events:
+            self.schedule(event)
+        return events
+
+    # ------------------------------------------------------------------
+    # 行情输出
+    # ------------------------------------------------------------------
+    def _quote(self, code: str) -> Optional[Dict[str, Any]]:
+        index = self.stock_index.get(code)
+        prefix = 'stock'
+        if index is None:
+            index = self.bond_index.get(code)
+            prefix = 'bond'
+        if index is None:
+            return None
+        price = float(getattr(self, f'{prefix}_price')[index])
+        pre_close = float(getattr(self, f'{prefix}_pre_close')[index])
+        return {
+            'code': code,
+            'price': Decimal(str(price)),
+            'change': Decimal(str(round((price / pre_close - 1) * 100, 4))),
+            'volume': int(getattr(self, f'{prefix}_volume')[index]),
+            'amount': Decimal(str(round(float(getattr(self, f'{prefix}_amount')[index]), 2))),
+            'open': Decimal(str(float(getattr(self, f'{prefix}_open')[index]))),
+            'high': Decimal(str(float(getattr(self, f'{prefix}_high')[index]))),
+            'low': Decimal(str(float(getattr(self, f'{prefix}_low')[index]))),
+            'pre_close': Decimal(str(pre_close)),
+            'timestamp': self.clock,
+            'trade_date': self.clock.strftime('%Y%m%d'),
+        }
+
+    def ticks(self) -> Iterator[Dict[str, Any]]:
+        """当前时刻全部代码的行情 (每步 n_stocks + n_bonds 条)"""
+        for code in self.stock_codes:
+            yield self._quote(code)
+        for code in self.bond_codes:
+            yield self._quote(code)
+
+    async def stream_ticks(self, rate: Optional[float] = None, max_ticks: Optional[int] = None):
+        """按目标速率(条/秒)持续产生行情批次；rate 为空时尽可能快"""
+        produced = 0
+        started = time.perf_counter()
+        while max_ticks is None or produced < max_ticks:
+            self.step()
+            batch = list(self.ticks())
+            produced += len(batch)
+            yield batch
+            if rate:
+                delay = produced / rate - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                await asyncio.sleep(0)
+
+    # ------------------------------------------------------------------
+    # DataSource 接口
+    # ------------------------------------------------------------------
+    async def get_bonds(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                'ts_code': code,
+                'bond_name': self.bond_names[i],
+                'stock_code': self.stock_codes[i],
+                'stock_name': self.stock_names[i],
+                'conversion_price': Decimal(str(float(self.conversion_price[i]))),
+                'conversion_ratio': None,
+                'maturity_date': (self.start + timedelta(days=365 * float(self.maturity_years[i]))).strftime('%Y%m%d'),
+                'bond_rating': 'AA',
+            }
+            for i, code in enumerate(self.bond_codes)
+        ]
+
+    async def get_stock_price(self, stock_code: str) -> Optional[Dict[str, Any]]:
+        self._sync_wall_clock()
+        return self._quote(stock_code) if stock_code in self.stock_index else None
+
+    async def get_bond_price(self, bond_code: str) -> Optional[Dict[str, Any]]:
+        self._sync_wall_clock()
+        return self._quote(bond_code) if bond_code in self.bond_index else None
+
+    async def get_price_history(self, code: str, days: int = 30, adjust: str = 'none') -> List[Dict[str, Any]]:
+        """由当前昨收价倒推的确定性日线 (没有除权，复权与不复权相同)"""
+        quote = self._quote(code)
+        if quote is None:
+            return []
+        rng = np.random.default_rng([self.seed, zlib.crc32(code.encode())])
+        closes = [float(quote['pre_close'])]
+        for ret in rng.normal(0, self.volatility / np.sqrt(252), days - 1):
+            closes.append(round(closes[-1] / np.exp(ret), 2))
+        closes.reverse()
+
+        history = []
+        day = self.clock.date()
+        dates = []
+        while len(dates) < days:
+            day -= timedelta(days=1)
+            if day.weekday() < 5:
+                dates.append(day)
+        for date, close in zip(reversed(dates), closes):
+            spread = close * 0.01
+            history.append({
+                'time': date.strftime('%Y%m%d'),
+                'price': Decimal(str(close)),
+                'volume': int(rng.integers(1_000, 100_000)),
+                'open': Decimal(str(round(close - spread / 2, 2))),
+                'high': Decimal(str(round(close + spread, 2))),
+                'low': Decimal(str(round(close - spread, 2)))
+            })
+        return history
+
+    async def get_monitoring_pairs(self, limit: int = 100) -> List[MonitoringPair]:
+        self._sync_wall_clock()
+        bonds = await self.get_bonds()
+        pairs = [
+            build_monitoring_pair(bond, self._quote(bond['stock_code']), self._quote(bond['ts_code']), now=self.clock)
+            for bond in bonds[:limit]
+        ]
+        # 与 Tushare 数据源一致，按股票涨幅降序排序
+        pairs.sort(key=lambda x: x.stock_change, reverse=True)
+        return pairs
+
+    async def search_stocks(self, keyword: str, limit: int = 20) -> List[Dict[str, Any]]:
+        if not len(self.search_index):
+            stocks = [
+                {'ts_code': code, 'name': self.stock_names[i], 'area': '仿真', 'industry': '仿真行业'}
+                for i, code in enumerate(self.stock_codes)
+            ]
+            self.search_index.build(stocks, await self.get_bonds(), self.clock.strftime('%Y%m%d'))
+        return self.search_index.search(keyword, limit=limit)
+
+    async def get_market_status(self) -> Dict[str, Any]:
+        self._sync_wall_clock()
+        change = Decimal(str(round(float(np.mean(self.stock_price / self.stock_pre_close - 1)) * 100, 4)))
+        if change > 1:
+            status = 'bull'  # 强势
+        elif change < -1:
+            status = 'bear'  # 弱势
+        else:
+            status = 'neutral'  # 平稳
+        return {'status': status, 'index_change': change, 'message': f'仿真市场平均涨跌幅: {change}%'}
+
+    # 行情轮询器使用的接口
+    async def ensure_calendar(self):
+        pass
+
+    async def get_realtime_quotes(self, codes: List[str]) -> List[Dict[str, Any]]:
+        self._sync_wall_clock()
+        return [quote for quote in (self._quote(code) for code in codes) if quote is not None]
+
+    def cache_quote(self, code: str, data_type: str, price_data: Dict[str, Any]):
+        pass  # 仿真行情本身就是最新数据
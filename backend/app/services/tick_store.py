@@ -0,0 +1,361 @@
+"""
+价格Tick写入与读取
+
+缓冲 PriceTick 记录，按批次一次性写入，避免逐行提交。按 TICK_STORAGE_MODE 写入三种存储之一:
+- standard: price_ticks，每条行情一行 (DECIMAL 价格、字符串代码和数据源、自增 id)
+- compact: price_ticks_compact，价格/成交额为分、代码为 symbols 编号、数据源为枚举，
+  主键 (ts, symbol_id)，同一代码同一毫秒的重复行情只保存一次
+- packed: price_ticks_packed，每个代码每分钟一行，逐笔行情打包为按列差分、zlib 压缩的数组
+
+同一事务中增量更新 1/5 分钟K线汇总 (见 app/services/rollups.py)。
+读取 (回测、冷归档、清理) 统一经过 iter_ticks / iter_rows，三张表同时读取并解码为
+(代码, 时间, 价格, 成交量, 成交额, 数据源)，切换存储模式后旧数据仍然可读。
+紧凑存储的时间精度为毫秒，价格和成交额精度为分 (与 price_ticks 的 DECIMAL(x,2) 一致)。
+"""
+
+import logging
+import zlib
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import sqlite
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.models.database import CompactPriceTick as CompactPriceTickModel
+from app.models.database import PackedPriceTicks as PackedPriceTicksModel
+from app.models.database import PriceTick as PriceTickModel
+from app.models.database import Symbol as SymbolModel
+from app.models.schemas import PriceTickBase
+from app.services.rollups import update_bars
+
+logger = logging.getLogger(__name__)
+
+TICK_STORAGE_MODES = ('standard', 'compact', 'packed')
+# 数据源枚举 (编号只能追加，不能调整顺序)
+TICK_SOURCES = ('unknown', 'tushare', 'realtime_quote', 'simulated')
+SOURCE_IDS = {name: index for index, name in enumerate(TICK_SOURCES)}
+
+EPOCH = datetime(1970, 1, 1)
+MILLISECOND = timedelta(milliseconds=1)
+NULL = -1  # 打包数组中表示空的成交量/成交额
+# 打包行情: 分钟内毫秒偏移、价格(分)、成交量、成交额(分)，每条 22 字节，见 pack_ticks
+PACKED_DTYPE = np.dtype([('ms', '<u2'), ('price', '<i4'), ('volume', '<i8'), ('amount', '<i8')])
+
+
+def encode_ms(value: datetime) -> int:
+    """时间 -> 毫秒时间戳 (按无时区的本地时间编码，与 price_ticks 的 TIMESTAMP 一致)"""
+    return (value - EPOCH) // MILLISECOND
+
+
+def decode_ms(value: int) -> datetime:
+    return EPOCH + value * MILLISECOND
+
+
+def encode_minute(value: datetime) -> int:
+    return encode_ms(value) // 60000
+
+
+def to_fen(value) -> Optional[int]:
+    if value is None:
+        return None
+    return int((Decimal(str(value)) * 100).to_integral_value())
+
+
+def from_fen(value: Optional[int]) -> Optional[Decimal]:
+    if value is None:
+        return None
+    return Decimal(value).scaleb(-2)
+
+
+def pack_ticks(ticks: np.ndarray) -> bytes:
+    """按列差分后 zlib 压缩 (同一分钟内时间、价格、累计成交量的变化很小，差分后多为小整数)"""
+    return zlib.compress(b''.join(
+        np.diff(ticks[name], prepend=0).astype(PACKED_DTYPE[name]).tobytes() for name in PACKED_DTYPE.names
+    ))
+
+
+def unpack_ticks(payload: bytes, count: int) -> np.ndarray:
+    raw = zlib.decompress(payload)
+    ticks = np.empty(count, dtype=PACKED_DTYPE)
+    offset = 0
+    for name in PACKED_DTYPE.names:
+        dtype = PACKED_DTYPE[name]
+        deltas = np.frombuffer(raw, dtype=dtype, count=count, offset=offset)
+        ticks[name] = np.cumsum(deltas, dtype=dtype)
+        offset += count * dtype.itemsize
+    return ticks
+
+
+def _insert_ignore(session, model):
+    """插入时忽略主键/唯一约束冲突"""
+    if session.bind.dialect.name == 'postgresql':
+        from sqlalchemy.dialects import postgresql  # 只在使用 PostgreSQL 时导入
+        return postgresql.insert(model).on_conflict_do_nothing()
+    return sqlite.insert(model).on_conflict_do_nothing()
+
+
+class SymbolRegistry:
+    """代码 <-> symbols 编号 (进程内缓存，新代码在写入时登记)"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.codes: Dict[int, str] = {}
+
+    async def _load(self, session, codes: Optional[List[str]] = None):
+        query = select(SymbolModel.id, SymbolModel.code)
+        if codes is not None:
+            query = query.where(SymbolModel.code.in_(codes))
+        for symbol_id, code in (await session.execute(query)).all():
+            self.ids[code] = symbol_id
+            self.codes[symbol_id] = code
+
+    async def resolve(self, session, codes: Iterable[str]) -> Dict[str, int]:
+        """返回代码对应的编号，不存在的代码先登记"""
+        missing = [code for code in set(codes) if code not in self.ids]
+        if missing:
+            await self._load(session, missing)
+            missing = [code for code in missing if code not in self.ids]
+            if missing:
+                # 多个进程同时登记同一代码时以先写入的为准
+                await session.execute(_insert_ignore(session, SymbolModel), [{'code': code} for code in missing])
+                await self._load(session, missing)
+        return self.ids
+
+    async def lookup(self, session, codes: Iterable[str]) -> List[int]:
+        """已登记代码的编号 (未登记的代码不可能有行情，直接忽略)"""
+        codes = list(codes)
+        if any(code not in self.ids for code in codes):
+            await self._load(session, [code for code in codes if code not in self.ids])
+        return [self.ids[code] for code in codes if code in self.ids]
+
+    async def decode(self, session, symbol_ids: Iterable[int]) -> Dict[int, str]:
+        if any(symbol_id not in self.codes for symbol_id in symbol_ids):
+            await self._load(session)
+        return self.codes
+
+
+symbol_registry = SymbolRegistry()
+
+
+class TickWriter:
+    """行情批量写入器"""
+
+    def __init__(self, max_buffer: int = 20000, mode: Optional[str] = None):
+        self.max_buffer = max_buffer
+        self.mode = mode or settings.tick_storage_mode
+        if self.mode not in TICK_STORAGE_MODES:
+            raise ValueError(f"不支持的行情存储模式: {self.mode}")
+        self._buffer: List[dict] = []
+
+    def add(self, tick: PriceTickBase, timestamp=None):
+        row = tick.model_dump()
+        row['timestamp'] = timestamp if timestamp is not None else datetime.now()
+        self._buffer.append(row)
+        if len(self._buffer) > self.max_buffer:
+            # 数据库持续不可用时丢弃最旧的数据，防止内存无限增长
+            dropped = len(self._buffer) - self.max_buffer
+            del self._buffer[:dropped]
+            logger.warning(f"Tick缓冲区已满，丢弃 {dropped} 条最旧记录")
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    async def flush(self) -> int:
+        """把缓冲区写入数据库，返回写入条数"""
+        if not self._buffer:
+            return 0
+
+        rows, self._buffer = self._buffer, []
+        try:
+            async with get_db() as session:
+                if self.mode == 'compact':
+                    await self._write_compact(session, rows)
+                elif self.mode == 'packed':
+                    await self._write_packed(session, rows)
+                else:
+                    await session.execute(insert(PriceTickModel), rows)
+                if settings.bar_rollups_enabled:
+                    await update_bars(session, rows)
+            return len(rows)
+        except Exception as e:
+            logger.error(f"写入价格数据失败 ({len(rows)} 条): {e}")
+            # 放回缓冲区，下次重试
+            self._buffer = rows + self._buffer
+            return 0
+
+    @staticmethod
+    async def _write_compact(session, rows: List[dict]):
+        ids = await symbol_registry.resolve(session, (row['stock_code'] for row in rows))
+        await session.execute(_insert_ignore(session, CompactPriceTickModel), [{
+            'symbol_id': ids[row['stock_code']],
+            'ts': encode_ms(row['timestamp']),
+            'price': to_fen(row['price']),
+            'volume': row['volume'],
+            'amount': to_fen(row['amount']),
+            'source': SOURCE_IDS.get(row['data_source'], 0),
+        } for row in rows])
+
+    @staticmethod
+    async def _write_packed(session, rows: List[dict]):
+        ids = await symbol_registry.resolve(session, (row['stock_code'] for row in rows))
+        groups: Dict[tuple, list] = {}
+        sources: Dict[tuple, int] = {}
+        for row in rows:
+            ts = encode_ms(row['timestamp'])
+            key = (ids[row['stock_code']], ts // 60000)
+            volume, amount = row['volume'], to_fen(row['amount'])
+            groups.setdefault(key, []).append((
+                ts % 60000, to_fen(row['price']),
+                NULL if volume is None else volume, NULL if amount is None else amount,
+            ))
+            sources[key] = SOURCE_IDS.get(row['data_source'], 0)
+
+        # 已有同一分钟的行 (上次刷新时该分钟尚未结束) 时合并后更新
+        symbol_ids = {symbol_id for symbol_id, _ in groups}
+        minutes = [minute for _, minute in groups]
+        existing = {}
+        result = await session.execute(
+            select(PackedPriceTicksModel.symbol_id, PackedPriceTicksModel.minute,
+                   PackedPriceTicksModel.count, PackedPriceTicksModel.payload)
+            .where(PackedPriceTicksModel.minute.between(min(minutes), max(minutes)),
+                   PackedPriceTicksModel.symbol_id.in_(symbol_ids))
+        )
+        for symbol_id, minute, count, payload in result.all():
+            if (symbol_id, minute) in groups:
+                existing[(symbol_id, minute)] = unpack_ticks(payload, count)
+
+        inserts, updates = [], []
+        for key, ticks in groups.items():
+            packed = np.array(ticks, dtype=PACKED_DTYPE)
+            if key in existing:
+                packed = np.concatenate([existing[key], packed])
+            # 按分钟内偏移排序，同一毫秒只保留最后一条
+            packed = packed[np.argsort(packed['ms'], kind='stable')]
+            keep = np.append(packed['ms'][1:] != packed['ms'][:-1], True)
+            packed = packed[keep]
+            row = {'symbol_id': key[0], 'minute': key[1], 'source': sources[key],
+                   'count': len(packed), 'payload': pack_ticks(packed)}
+            (updates if key in existing else inserts).append(row)
+        if inserts:
+            await session.execute(insert(PackedPriceTicksModel), inserts)
+        if updates:
+            await session.execute(update(PackedPriceTicksModel), updates)
+
+
+# ----------------------------------------------------------------------
+# 读取 / 清理
+# ----------------------------------------------------------------------
+# (模型, 时间列, 时间编码函数)，清理时按时间列构造条件
+TICK_TABLES = (
+    (PriceTickModel, PriceTickModel.timestamp, None),
+    (CompactPriceTickModel, CompactPriceTickModel.ts, encode_ms),
+    (PackedPriceTicksModel, PackedPriceTicksModel.minute, encode_minute),
+)
+
+
+async def _iter_table(session, model, conditions: List, codes: Optional[List[str]] = None,
+                      decimals: bool = True, window: Optional[tuple] = None,
+                      batch_size: int = 20000) -> AsyncIterator[List[tuple]]:
+    """按时间顺序读取一张行情表，逐批产出 (代码, 时间, 价格, 成交量, 成交额, 数据源)"""
+    if model is PriceTickModel:
+        query = select(PriceTickModel.stock_code, PriceTickModel.timestamp, PriceTickModel.price,
+                       PriceTickModel.volume, PriceTickModel.amount, PriceTickModel.data_source)
+        if codes is not None:
+            query = query.where(PriceTickModel.stock_code.in_(codes))
+        query = query.where(*conditions).order_by(PriceTickModel.timestamp, PriceTickModel.id)
+        result = await session.stream(query.execution_options(yield_per=batch_size))
+        async for partition in result.partitions():
+            if decimals:
+                yield [tuple(row) for row in partition]
+            else:
+                yield [(code, timestamp, float(price), volume, None if amount is None else float(amount), source)
+                       for code, timestamp, price, volume, amount, source in partition]
+        return
+
+    symbol_ids = await symbol_registry.lookup(session, codes) if codes is not None else None
+    if symbol_ids is not None and not symbol_ids:
+        return
+    scale = from_fen if decimals else (lambda value: None if value is None else value / 100)
+
+    if model is CompactPriceTickModel:
+        query = select(CompactPriceTickModel.symbol_id, CompactPriceTickModel.ts, CompactPriceTickModel.price,
+                       CompactPriceTickModel.volume, CompactPriceTickModel.amount, CompactPriceTickModel.source)
+        if symbol_ids is not None:
+            query = query.where(CompactPriceTickModel.symbol_id.in_(symbol_ids))
+        query = query.where(*conditions).order_by(CompactPriceTickModel.ts)
+        result = await session.stream(query.execution_options(yield_per=batch_size))
+        async for partition in result.partitions():
+            names = await symbol_registry.decode(session, {row[0] for row in partition})
+            yield [(names[symbol_id], decode_ms(ts), scale(price), volume, scale(amount), TICK_SOURCES[source])
+                   for symbol_id, ts, price, volume, amount, source in partition]
+        return
+
+    query = select(PackedPriceTicksModel.symbol_id, PackedPriceTicksModel.minute, PackedPriceTicksModel.source,
+                   PackedPriceTicksModel.count, PackedPriceTicksModel.payload)
+    if symbol_ids is not None:
+        query = query.where(PackedPriceTicksModel.symbol_id.in_(symbol_ids))
+    query = query.where(*conditions).order_by(PackedPriceTicksModel.minute)
+    low, high = (encode_ms(window[0]), encode_ms(window[1])) if window else (None, None)
+    result = await session.stream(query.execution_options(yield_per=max(1, batch_size // 20)))
+    async for partition in result.partitions():
+        names = await symbol_registry.decode(session, {row[0] for row in partition})
+        rows = []
+        for symbol_id, minute, source, count, payload in partition:
+            code, source = names[symbol_id], TICK_SOURCES[source]
+            base = minute * 60000
+            for ms, price, volume, amount in unpack_ticks(payload, count).tolist():
+                ts = base + ms
+                if low is not None and not low <= ts < high:
+                    continue  # 分钟行只有部分在时间窗口内
+                rows.append((code, decode_ms(ts), scale(price), None if volume == NULL else volume,
+                             None if amount == NULL else scale(amount), source))
+        yield rows
+
+
+async def iter_ticks(session, start: datetime, end: datetime, codes: Optional[Iterable[str]] = None,
+                     decimals: bool = True) -> AsyncIterator[List[tuple]]:
+    """读取 [start, end) 内三种存储中的行情 (每张表内按时间排序，表之间不保证顺序)
+
+    decimals 为 False 时价格和成交额以 float 返回 (回测等只需要浮点数的场景更快)。
+    """
+    codes = list(codes) if codes is not None else None
+    tables = (
+        (PriceTickModel, [PriceTickModel.timestamp >= start, PriceTickModel.timestamp < end], None),
+        (CompactPriceTickModel,
+         [CompactPriceTickModel.ts >= encode_ms(start), CompactPriceTickModel.ts < encode_ms(end)], None),
+        (PackedPriceTicksModel,
+         [PackedPriceTicksModel.minute >= encode_minute(start), PackedPriceTicksModel.minute <= encode_minute(end)],
+         (start, end)),
+    )
+    for model, conditions, window in tables:
+        async for rows in _iter_table(session, model, conditions, codes, decimals, window):
+            yield rows
+
+
+async def iter_rows(session, model, conditions: List) -> AsyncIterator[List[tuple]]:
+    """按 price_ticks 的列顺序读取满足条件的行 (冷归档使用，紧凑存储没有 id)"""
+    if model is PriceTickModel:
+        columns = list(PriceTickModel.__table__.columns)
+        query = select(*columns).where(*conditions).order_by(PriceTickModel.timestamp)
+        result = await session.stream(query.execution_options(yield_per=50000))
+        async for partition in result.partitions():
+            yield partition
+        return
+    async for rows in _iter_table(session, model, conditions, batch_size=50000):
+        yield [(None, code, price, volume, amount, timestamp, source)
+               for code, timestamp, price, volume, amount, source in rows]
+
+
+async def delete_ticks(session, model, conditions: List) -> int:
+    """删除满足条件的行情，返回删除的行情条数 (打包存储按分钟行中的条数计)"""
+    count = None
+    if model is PackedPriceTicksModel:
+        count = (await session.execute(
+            select(func.coalesce(func.sum(PackedPriceTicksModel.count), 0)).where(*conditions)
+        )).scalar()
+    result = await session.execute(delete(model).where(*conditions))
+    return int(count) if count is not None else result.rowcount
@@ -0,0 +1,177 @@
+"""
+交易日历
+
+本地缓存上交所 trade_cal，并提供交易时段判断:
+- 交易时段内行情按 TTL 刷新
+- 非交易时段(收盘后、周末、节假日)缓存的最近交易日数据可以无限期使用，不再请求 Tushare
+- 回看窗口按精确的交易日数计算，不再用60个自然日粗略覆盖
+trade_cal 不可用(积分不足或网络故障)时退化为"工作日即交易日"。
+"""
+
+import json
+import logging
+import os
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta, timezone
+from typing import Iterable, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# A股使用北京时间，无夏令时
+CHINA_TZ = timezone(timedelta(hours=8))
+
+# 交易时段 (含早盘集合竞价)
+SESSIONS = (
+    (time(9, 15), time(11, 30)),
+    (time(13, 0), time(15, 0)),
+)
+MARKET_OPEN = SESSIONS[0][0]
+MARKET_CLOSE = SESSIONS[-1][1]
+
+
+class TradingCalendar:
+    """上交所交易日历"""
+
+    def __init__(self, cache_path: Optional[str] = None):
+        self.cache_path = cache_path if cache_path is not None else settings.trade_cal_cache_path
+        self.open_dates: List[str] = []  # 升序的交易日
+        self.start_date: Optional[str] = None  # 已加载的日历范围
+        self.end_date: Optional[str] = None
+        self._load_file()
+
+    # ------------------------------------------------------------------
+    # 加载
+    # ------------------------------------------------------------------
+    def _load_file(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                data = json.load(f)
+            self.open_dates = sorted(data['open_dates'])
+            self.start_date = data['start_date']
+            self.end_date = data['end_date']
+        except Exception as e:
+            logger.warning(f"读取交易日历缓存失败: {e}")
+
+    def _save_file(self):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'start_date': self.start_date,
+                    'end_date': self.end_date,
+                    'open_dates': self.open_dates,
+                }, f)
+        except OSError as e:
+            logger.warning(f"写入交易日历缓存失败: {e}")
+
+    def covers(self, date_str: Optional[str] = None) -> bool:
+        """已加载的日历是否覆盖指定日期 (默认今天)"""
+        date_str = date_str or self.today()
+        return bool(self.start_date and self.end_date and self.start_date <= date_str <= self.end_date)
+
+    def fetch_range(self) -> tuple:
+        """需要从 Tushare 拉取的日期范围 (去年年初至明年年初)"""
+        year = self.now().year
+        return f"{year - 1}0101", f"{year + 1}0131"
+
+    def update(self, start_date: str, end_date: str, open_dates: Iterable[str]):
+        """用 trade_cal 结果更新日历并写入本地缓存"""
+        self.open_dates = sorted(set(open_dates))
+        self.start_date = start_date
+        self.end_date = end_date
+        self._save_file()
+        logger.info(f"交易日历已更新: {start_date} - {end_date}, {len(self.open_dates)} 个交易日")
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+    @staticmethod
+    def now() -> datetime:
+        return datetime.now(CHINA_TZ).replace(tzinfo=None)
+
+    def today(self) -> str:
+        return self.now().strftime('%Y%m%d')
+
+    def is_trade_date(self, date_str: str) -> bool:
+        if self.covers(date_str):
+            index = bisect_left(self.open_dates, date_str)
+            return index < len(self.open_dates) and self.open_dates[index] == date_str
+        # 日历不可用时按工作日判断
+        return datetime.strptime(date_str, '%Y%m%d').weekday() < 5
+
+    def is_trading_time(self, now: Optional[datetime] = None) -> bool:
+        """当前是否处于交易时段"""
+        now = now or self.now()
+        if not self.is_trade_date(now.strftime('%Y%m%d')):
+            return False
+        current = now.time()
+        return any(start <= current <= end for start, end in SESSIONS)
+
+    def previous_trade_date(self, date_str: str) -> str:
+        """严格早于 date_str 的最近交易日"""
+        if self.covers(date_str):
+            index = bisect_left(self.open_dates, date_str)
+            if index > 0:
+                return self.open_dates[index - 1]
+        current = datetime.strptime(date_str, '%Y%m%d') - timedelta(days=1)
+        while not self.is_trade_date(current.strftime('%Y%m%d')):
+            current -= timedelta(days=1)
+        return current.strftime('%Y%m%d')
+
+    def last_closed_trade_date(self, now: Optional[datetime] = None) -> str:
+        """最近一个已收盘的交易日"""
+        now = now or self.now()
+        today = now.strftime('%Y%m%d')
+        if self.is_trade_date(today) and now.time() >= MARKET_CLOSE:
+            return today
+        return self.previous_trade_date(today)
+
+    def last_session_close(self, now: Optional[datetime] = None) -> datetime:
+        """最近一次收盘时刻"""
+        date_str = self.last_closed_trade_date(now)
+        return datetime.combine(datetime.strptime(date_str, '%Y%m%d').date(), MARKET_CLOSE)
+
+    def trade_days_back(self, n: int, now: Optional[datetime] = None) -> str:
+        """包含最近交易日在内往前数第 n 个交易日 (用作 start_date)"""
+        now = now or self.now()
+        today = now.strftime('%Y%m%d')
+        latest = today if self.is_trade_date(today) else self.previous_trade_date(today)
+        if self.covers(latest):
+            index = bisect_right(self.open_dates, latest) - 1
+            if index - (n - 1) >= 0:
+                return self.open_dates[index - (n - 1)]
+        date_str = latest
+        for _ in range(n - 1):
+            date_str = self.previous_trade_date(date_str)
+        return date_str
+
+    def can_serve_cached(self, trade_date: Optional[str], now: Optional[datetime] = None) -> bool:
+        """非交易时段且缓存数据已是最近收盘交易日时，缓存可以无限期使用"""
+        if not trade_date:
+            return False
+        now = now or self.now()
+        return not self.is_trading_time(now) and str(trade_date) >= self.last_closed_trade_date(now)
+
+    def market_phase(self, now: Optional[datetime] = None) -> str:
+        """pre_open / trading / lunch_break / closed / holiday"""
+        now = now or self.now()
+        if not self.is_trade_date(now.strftime('%Y%m%d')):
+            return 'holiday'
+        current = now.time()
+        if self.is_trading_time(now):
+            return 'trading'
+        if current < MARKET_OPEN:
+            return 'pre_open'
+        if current < MARKET_CLOSE:
+            return 'lunch_break'
+        return 'closed'
+
+
+# 全局交易日历实例
+trading_calendar = TradingCalendar()
@@ -0,0 +1,205 @@
+"""
+热状态检查点 (重启预热)
+
+部署重启后行情缓存、可转债列表、信号检测的滚动窗口和刷新调度的优先级都是空的，
+最初几分钟会集中请求 Tushare 并漏掉信号。这里定期 (以及关闭时) 把这些状态保存为检查点，
+启动时在行情轮询开始之前恢复:
+- 格式为 b'BWS1' + zlib 压缩的 JSON，Decimal / datetime / date 用带标记的对象保存，
+  不使用 pickle (检查点可能来自共享的数据库，不能反序列化任意对象)
+- warm_state_path 非空时写入本地文件 (先写临时文件再替换)，否则保存在
+  system_snapshots 表中 snapshot_type='warm_state' 的一行 (原地更新)
+- 恢复的行情缓存保留原写入时间，过期规则与正常缓存相同；检测窗口在交易日变化后自动重置
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.metrics import metrics
+from app.models.database import SystemSnapshot as SystemSnapshotModel
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'BWS1'
+VERSION = 1
+SNAPSHOT_TYPE = 'warm_state'
+
+
+def _encode(value: Any):
+    if isinstance(value, Decimal):
+        return {'$d': str(value)}
+    if isinstance(value, datetime):
+        return {'$t': value.isoformat()}
+    if isinstance(value, date):
+        return {'$D': value.isoformat()}
+    if hasattr(value, 'item'):  # numpy 标量
+        return value.item()
+    raise TypeError(f"检查点不支持的类型: {type(value).__name__}")
+
+
+def _decode(obj: Dict):
+    if len(obj) == 1:
+        if '$d' in obj:
+            return Decimal(obj['$d'])
+        if '$t' in obj:
+            return datetime.fromisoformat(obj['$t'])
+        if '$D' in obj:
+            return date.fromisoformat(obj['$D'])
+    return obj
+
+
+def dumps(state: Dict) -> bytes:
+    payload = json.dumps(state, default=_encode, ensure_ascii=False, separators=(',', ':'))
+    return MAGIC + zlib.compress(payload.encode(), 6)
+
+
+def loads(data: bytes) -> Dict:
+    if not data.startswith(MAGIC):
+        raise ValueError("不是有效的热状态检查点")
+    return json.loads(zlib.decompress(data[len(MAGIC):]), object_hook=_decode)
+
+
+class WarmStateStore:
+    """检查点存储 (本地文件或 system_snapshots 表)"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path if path is not None else settings.warm_state_path
+
+    async def save(self, data: bytes):
+        if self.path:
+            await asyncio.to_thread(self._write_file, data)
+            return
+        text = base64.b64encode(data).decode()
+        async with get_db() as session:
+            result = await session.execute(
+                update(SystemSnapshotModel)
+                .where(SystemSnapshotModel.snapshot_type == SNAPSHOT_TYPE)
+                .values(snapshot_data=text, created_at=datetime.now())
+            )
+            if not result.rowcount:
+                session.add(SystemSnapshotModel(snapshot_type=SNAPSHOT_TYPE, snapshot_data=text))
+
+    async def load(self) -> Optional[bytes]:
+        if self.path:
+            if not os.path.exists(self.path):
+                return None
+            return await asyncio.to_thread(self._read_file)
+        async with get_db() as session:
+            text = (await session.execute(
+                select(SystemSnapshotModel.snapshot_data)
+                .where(SystemSnapshotModel.snapshot_type == SNAPSHOT_TYPE)
+                .order_by(SystemSnapshotModel.id.desc()).limit(1)
+            )).scalar()
+        return base64.b64decode(text) if text else None
+
+    def _write_file(self, data: bytes):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def _read_file(self) -> bytes:
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+
+class WarmRestart:
+    """热状态的保存和恢复"""
+
+    def __init__(self, store: WarmStateStore, data_source=None, scheduler=None, signal_engine=None,
+                 interval: Optional[float] = None):
+        self.store = store
+        self.data_source = data_source
+        self.scheduler = scheduler
+        self.signal_engine = signal_engine
+        self.interval = interval if interval is not None else settings.warm_state_interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def collect(self) -> Dict:
+        state: Dict[str, Any] = {'version': VERSION, 'saved_at': datetime.now()}
+        if self.data_source is not None and hasattr(self.data_source, 'export_state'):
+            state['data_source'] = self.data_source.export_state()
+        if self.scheduler is not None:
+            state['scheduler'] = self.scheduler.export_state()
+        if self.signal_engine is not None:
+            state['signal_windows'] = await self.signal_engine.export_state()
+        return state
+
+    async def checkpoint(self) -> int:
+        """保存检查点，返回字节数"""
+        start = time.perf_counter()
+        data = dumps(await self.collect())
+        await self.store.save(data)
+        metrics.set_gauge('warm_state_bytes', len(data))
+        metrics.set_gauge('warm_state_checkpoint_seconds', time.perf_counter() - start)
+        return len(data)
+
+    async def restore(self) -> bool:
+        """恢复检查点 (需在信号检测引擎和行情轮询启动之前调用)，没有可用检查点时返回 False"""
+        start = time.perf_counter()
+        try:
+            data = await self.store.load()
+            if data is None:
+                return False
+            state = loads(data)
+        except Exception as e:
+            logger.warning(f"读取热状态检查点失败: {e}")
+            return False
+        if state.get('version') != VERSION:
+            logger.warning(f"忽略版本不兼容的热状态检查点: {state.get('version')}")
+            return False
+
+        restored = {}
+        if self.data_source is not None and 'data_source' in state and hasattr(self.data_source, 'restore_state'):
+            restored['quotes'] = self.data_source.restore_state(state['data_source'])
+        if self.scheduler is not None and 'scheduler' in state:
+            restored['scheduled_codes'] = self.scheduler.restore_state(state['scheduler'])
+        if self.signal_engine is not None and 'signal_windows' in state:
+            self.signal_engine.restore_state(state['signal_windows'])
+            restored['signal_windows'] = len(state['signal_windows'])
+
+        elapsed = time.perf_counter() - start
+        metrics.set_gauge('warm_state_restore_seconds', elapsed)
+        logger.info(f"已恢复 {state['saved_at']} 的热状态检查点 ({len(data)} 字节, {elapsed:.3f}s): {restored}")
+        return True
+
+    # ------------------------------------------------------------------
+    # 定期保存
+    # ------------------------------------------------------------------
+    def start(self):
+        self._task = asyncio.create_task(self.run(), name="warm-state-checkpoint")
+
+    async def stop(self, checkpoint: bool = True):
+        """停止定期保存；checkpoint 为 True 时最后保存一次"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if checkpoint:
+            try:
+                await self.checkpoint()
+            except Exception as e:
+                logger.error(f"保存热状态检查点失败: {e}")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.checkpoint()
+            except Exception as e:
+                logger.error(f"保存热状态检查点失败: {e}")
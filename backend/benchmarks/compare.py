@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+对比两次基准测试结果
+
+指标命名约定: *_s / *_ms 越小越好，*_per_s 越大越好，其余字段仅展示。
+
+用法:
+    python benchmarks/compare.py benchmarks/results/base.json benchmarks/results/head.json --threshold 0.1
+"""
+
+import argparse
+import json
+import sys
+
+
+def _direction(metric: str) -> int:
+    """返回 1 表示越大越好，-1 表示越小越好，0 表示不参与比较"""
+    if metric.endswith("_per_s"):
+        return 1
+    if metric.endswith("_s") or metric.endswith("_ms"):
+        return -1
+    return 0
+
+
+def compare(base: dict, head: dict, threshold: float):
+    regressions = []
+    print(f"{'benchmark':<28}{'metric':<22}{'base':>12}{'head':>12}{'change':>10}")
+    for name, head_metrics in head["results"].items():
+        base_metrics = base["results"].get(name, {})
+        for metric, head_value in head_metrics.items():
+            direction = _direction(metric)
+            base_value = base_metrics.get(metric)
+            if not direction or not isinstance(base_value, (int, float)) or not base_value:
+                continue
+            change = (head_value - base_value) / base_value
+            marker = ""
+            if change * direction < -threshold:
+                marker = " !"
+                regressions.append((name, metric, change))
+            print(f"{name:<28}{metric:<22}{base_value:>12}{head_value:>12}{change:>+9.1%}{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比两次基准测试结果")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.1, help="判定回归的相对变化阈值")
+    args = parser.parse_args()
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.head, encoding="utf-8") as f:
+        head = json.load(f)
+
+    print(f"base: {base['commit']}  head: {head['commit']}")
+    regressions = compare(base, head, args.threshold)
+    if regressions:
+        print(f"\n发现 {len(regressions)} 项回归 (阈值 {args.threshold:.0%})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
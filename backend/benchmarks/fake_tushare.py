@@ -0,0 +1,204 @@
+"""
+确定性的模拟 Tushare pro_api
+
+按随机种子生成 cb_basic / daily / cb_daily 等接口的数据帧，或从录制的 CSV 文件回放，
+并可为每次调用注入固定延迟(同步 sleep，与真实 SDK 一样会阻塞调用线程)，
+用于基准测试和离线复现性能问题。
+"""
+
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+DAILY_COLUMNS = ['ts_code', 'trade_date', 'open', 'high', 'low', 'close',
+                 'pre_close', 'change', 'pct_chg', 'vol', 'amount']
+
+
+class FakeProApi:
+    """模拟的 pro_api 客户端"""
+
+    def __init__(self, n_bonds: int = 500, seed: int = 42, latency: float = 0.0,
+                 history_days: int = 120, end_date: Optional[str] = None,
+                 fixtures_dir: Optional[str] = None):
+        self.n_bonds = n_bonds
+        self.seed = seed
+        self.latency = latency  # 每次调用的模拟延迟(秒)
+        self.fixtures_dir = fixtures_dir
+        self.calls: Counter = Counter()
+        self.outage = False  # 为 True 时所有接口在延迟后抛出异常 (模拟 Tushare 故障)
+
+        end = datetime.strptime(end_date, '%Y%m%d') if end_date else datetime.now()
+        self.trade_dates = self._build_trade_dates(end, history_days)
+        self._frames: Dict[str, pd.DataFrame] = {}
+
+    # ------------------------------------------------------------------
+    # 数据生成
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _build_trade_dates(end: datetime, days: int) -> List[str]:
+        """生成最近 days 个工作日(降序，与 Tushare 返回顺序一致)"""
+        dates = []
+        current = end
+        while len(dates) < days:
+            if current.weekday() < 5:
+                dates.append(current.strftime('%Y%m%d'))
+            current -= timedelta(days=1)
+        return dates
+
+    def bond_code(self, i: int) -> str:
+        return f"{113000 + i:06d}.SH"
+
+    def stock_code(self, i: int) -> str:
+        return f"{600000 + i:06d}.SH"
+
+    def _rng(self, key: str) -> random.Random:
+        return random.Random(f"{self.seed}:{key}")
+
+    def _generate_bars(self, ts_code: str, base_price: float) -> pd.DataFrame:
+        """生成单个代码的日线(随机游走)"""
+        rng = self._rng(ts_code)
+        rows = []
+        close = base_price * rng.uniform(0.5, 1.5)
+        for trade_date in reversed(self.trade_dates):
+            pre_close = close
+            pct = max(-10.0, min(10.0, rng.gauss(0, 2)))
+            close = round(pre_close * (1 + pct / 100), 2)
+            high = round(max(pre_close, close) * (1 + rng.uniform(0, 0.02)), 2)
+            low = round(min(pre_close, close) * (1 - rng.uniform(0, 0.02)), 2)
+            vol = round(rng.uniform(1e4, 1e6), 2)
+            rows.append([ts_code, trade_date, round(pre_close, 2), high, low, close,
+                         round(pre_close, 2), round(close - pre_close, 2), round(pct, 4),
+                         vol, round(vol * close / 10, 3)])
+        return pd.DataFrame(rows[::-1], columns=DAILY_COLUMNS)
+
+    def _generated_frame(self, api_name: str) -> pd.DataFrame:
+        if api_name == 'cb_basic':
+            rows = []
+            for i in range(self.n_bonds):
+                rng = self._rng(f"cb_basic:{i}")
+                maturity = datetime.now() + timedelta(days=rng.randint(180, 6 * 365))
+                rows.append({
+                    'ts_code': self.bond_code(i),
+                    'bond_full_name': f"模拟转债{i:04d}",
+                    'stk_code': self.stock_code(i),
+                    'stk_short_name': f"模拟股份{i:04d}",
+                    'conv_price': round(rng.uniform(5, 50), 2),
+                    'maturity_date': maturity.strftime('%Y%m%d'),
+                })
+            return pd.DataFrame(rows)
+        if api_name == 'stock_basic':
+            return pd.DataFrame([{
+                'ts_code': self.stock_code(i),
+                'symbol': self.stock_code(i)[:6],
+                'name': f"模拟股份{i:04d}",
+                'area': '上海',
+                'industry': '模拟行业',
+            } for i in range(self.n_bonds)])
+        if api_name in ('daily', 'cb_daily'):
+            frames = [self._generate_bars(self.stock_code(i), 20) for i in range(self.n_bonds)]
+            frames += [self._generate_bars(self.bond_code(i), 115) for i in range(self.n_bonds)]
+            return pd.concat(frames, ignore_index=True)
+        if api_name == 'index_daily':
+            return self._generate_bars('000001.SH', 3000)
+        raise NotImplementedError(f"FakeProApi 不支持接口: {api_name}")
+
+    def _frame(self, api_name: str) -> pd.DataFrame:
+        """获取接口的完整数据帧(优先使用录制的 CSV)"""
+        if api_name not in self._frames:
+            path = os.path.join(self.fixtures_dir, f"{api_name}.csv") if self.fixtures_dir else None
+            if path and os.path.exists(path):
+                self._frames[api_name] = pd.read_csv(path, dtype={'trade_date': str, 'maturity_date': str})
+            else:
+                self._frames[api_name] = self._generated_frame(api_name)
+        return self._frames[api_name]
+
+    # ------------------------------------------------------------------
+    # 调用入口
+    # ------------------------------------------------------------------
+    def query(self, api_name: str, fields: str = '', **kwargs) -> pd.DataFrame:
+        self.calls[api_name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.outage:
+            raise ConnectionError(f"模拟 Tushare 故障: {api_name}")
+
+        df = self._frame(api_name)
+        if 'ts_code' in kwargs and 'ts_code' in df.columns:
+            df = df[df['ts_code'].isin(str(kwargs['ts_code']).split(','))]
+        if kwargs.get('name') and 'name' in df.columns:
+            df = df[df['name'] == kwargs['name']]
+        if 'trade_date' in df.columns:
+            if kwargs.get('trade_date'):
+                df = df[df['trade_date'] == kwargs['trade_date']]
+            if kwargs.get('start_date'):
+                df = df[df['trade_date'] >= kwargs['start_date']]
+            if kwargs.get('end_date'):
+                df = df[df['trade_date'] <= kwargs['end_date']]
+        if fields:
+            df = df[[c for c in fields.split(',') if c in df.columns]]
+        return df.reset_index(drop=True)
+
+    def trade_cal(self, exchange: str = 'SSE', start_date: str = '', end_date: str = '',
+                  fields: str = '', **kwargs) -> pd.DataFrame:
+        """模拟交易日历 (工作日开市)"""
+        self.calls['trade_cal'] += 1
+        start = datetime.strptime(start_date, '%Y%m%d')
+        end = datetime.strptime(end_date, '%Y%m%d')
+        rows = []
+        while start <= end:
+            rows.append({'exchange': exchange or 'SSE', 'cal_date': start.strftime('%Y%m%d'),
+                         'is_open': 1 if start.weekday() < 5 else 0})
+            start += timedelta(days=1)
+        df = pd.DataFrame(rows)
+        return df[fields.split(',')] if fields else df
+
+    def realtime_quote(self, ts_code: str = '', src: str = 'sina') -> pd.DataFrame:
+        """模拟爬虫版实时行情 (列名大写，与 sina 源一致)"""
+        codes = [c for c in ts_code.split(',') if c]
+        if src == 'sina' and len(codes) > 50:
+            raise ValueError("sina 源一次最多50个代码")
+        self.calls['realtime_quote'] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.outage:
+            raise ConnectionError("模拟 Tushare 故障: realtime_quote")
+
+        bars = self._frame('daily')
+        latest = bars[bars['trade_date'] == self.trade_dates[0]].set_index('ts_code')
+        now = datetime.now()
+        rows = []
+        for code in codes:
+            if code not in latest.index:
+                continue
+            bar = latest.loc[code]
+            rng = self._rng(f"quote:{code}:{self.calls['realtime_quote']}")
+            price = round(bar['pre_close'] * (1 + rng.uniform(-0.03, 0.03)), 3)
+            rows.append({
+                'NAME': code, 'TS_CODE': code,
+                'DATE': now.strftime('%Y%m%d'), 'TIME': now.strftime('%H:%M:%S'),
+                'OPEN': bar['open'], 'PRE_CLOSE': bar['pre_close'], 'PRICE': price,
+                'HIGH': max(bar['high'], price), 'LOW': min(bar['low'], price),
+                'BID': price, 'ASK': price,
+                'VOLUME': int(bar['vol'] * 100), 'AMOUNT': bar['amount'] * 1000,
+            })
+        return pd.DataFrame(rows)
+
+    def cb_basic(self, **kwargs):
+        return self.query('cb_basic', **kwargs)
+
+    def daily(self, **kwargs):
+        return self.query('daily', **kwargs)
+
+    def cb_daily(self, **kwargs):
+        return self.query('cb_daily', **kwargs)
+
+    def stock_basic(self, **kwargs):
+        return self.query('stock_basic', **kwargs)
+
+    def index_daily(self, **kwargs):
+        return self.query('index_daily', **kwargs)
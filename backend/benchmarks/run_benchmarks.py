@@ -0,0 +1,695 @@
+#!/usr/bin/env python3
+"""
+后端热点路径基准测试
+
+使用确定性的模拟 Tushare (benchmarks/fake_tushare.py) 和临时 SQLite 数据库，测量:
+- get_monitoring_pairs (50/200/500 个可转债)
+- /api/monitoring/pairs 并发负载
+- 盘中批量实时行情全市场刷新
+- Tushare 故障期间的配对刷新延迟 (熔断 + 过期缓存兜底)
+- 仿真行情 (app/services/simulated_source.py) 的生成、配对构建和 Tick 写入吞吐
+- 三种行情存储模式 (standard/compact/packed) 的每行字节数和写入/读取吞吐
+- 分时图表: 读取 K 线汇总表 vs 扫描原始行情
+- 多进程分片信号检测在不同工作进程数下的吞吐
+- 按交易日并行的信号回放 (回测) 吞吐
+- 价格缓存淘汰 (cache churn)
+- API 进程冷启动 (导入 app.main 和 lifespan 初始化，新数据库 / 已有数据库)
+- get_db_size
+- 百万行表上的数据清理 (含冷归档) 和归档文件的按代码读取
+
+结果写为 JSON，可用 benchmarks/compare.py 对比两次提交之间的回归。
+
+用法:
+    cd backend
+    python benchmarks/run_benchmarks.py --output benchmarks/results/head.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+# 必须在导入 app 之前配置临时数据库
+WORK_DIR = tempfile.mkdtemp(prefix="bond-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'bench.db')}"
+os.environ["ARCHIVE_DIR"] = os.path.join(WORK_DIR, "archive")
+os.environ.setdefault("APP_ENV", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from benchmarks.fake_tushare import FakeProApi  # noqa: E402
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def _make_data_source(args, n_bonds: int):
+    from app.services.data_source import TushareDataSource
+
+    pro = FakeProApi(n_bonds=n_bonds, seed=args.seed, latency=args.latency,
+                     fixtures_dir=args.fixtures)
+    data_source = TushareDataSource(token="", pro=pro)
+    data_source.request_delay = args.request_delay
+    return data_source, pro
+
+
+async def bench_monitoring_pairs(args, n_bonds: int) -> dict:
+    """单次构建 n_bonds 个配对的耗时 (冷缓存 / 热缓存)"""
+    data_source, pro = _make_data_source(args, n_bonds)
+
+    start = time.perf_counter()
+    pairs = await data_source.get_monitoring_pairs(limit=n_bonds)
+    cold = time.perf_counter() - start
+    cold_calls = sum(pro.calls.values())
+
+    start = time.perf_counter()
+    await data_source.get_monitoring_pairs(limit=n_bonds)
+    warm = time.perf_counter() - start
+
+    return {
+        "bonds": n_bonds,
+        "pairs": len(pairs),
+        "cold_s": round(cold, 4),
+        "warm_s": round(warm, 4),
+        "tushare_calls_cold": cold_calls,
+        "tushare_calls_total": sum(pro.calls.values()),
+    }
+
+
+async def bench_pairs_endpoint(args) -> dict:
+    """并发请求 /api/monitoring/pairs"""
+    import httpx
+    from app.main import app
+    from app.api.monitoring import get_data_source
+
+    data_source, pro = _make_data_source(args, max(args.bonds))
+    app.dependency_overrides[get_data_source] = lambda: data_source
+
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        async def one_request():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get("/api/monitoring/pairs", params={"limit": 50})
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "total_s": round(elapsed, 4),
+        "requests_per_s": round(args.requests / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+        "tushare_calls": sum(pro.calls.values()),
+    }
+
+
+async def bench_outage(args) -> dict:
+    """缓存过期后 Tushare 故障 (每次调用先等待 outage_latency 再失败) 时的配对刷新"""
+    n_bonds = min(args.bonds)
+    data_source, pro = _make_data_source(args, n_bonds)
+    await data_source.get_monitoring_pairs(limit=n_bonds)
+
+    # 让全部缓存过期并开启故障
+    data_source.cache_timeout = 0
+    data_source.calendar.can_serve_cached = lambda *a, **k: False
+    pro.outage = True
+    pro.latency = args.outage_latency
+    pro.calls.clear()
+
+    rounds = []
+    stale = 0
+    for _ in range(3):
+        start = time.perf_counter()
+        pairs = await data_source.get_monitoring_pairs(limit=n_bonds)
+        rounds.append(time.perf_counter() - start)
+        stale = sum(1 for pair in pairs if pair.is_stale)
+        # 等待后台刷新结束
+        await asyncio.gather(*list(data_source._revalidating.values()), return_exceptions=True)
+
+    return {
+        "bonds": n_bonds,
+        "pairs": len(pairs),
+        "stale_pairs": stale,
+        "first_round_s": round(rounds[0], 4),
+        "steady_round_s": round(statistics.median(rounds[1:]), 4),
+        "tushare_calls": sum(pro.calls.values()),
+        "open_breakers": sum(1 for b in data_source.breakers.breakers.values() if b.state != "closed"),
+    }
+
+
+async def bench_simulated(args) -> dict:
+    """仿真市场: 行情生成、配对构建、Tick 批量写入吞吐"""
+    from app.core.database import create_tables
+    from app.models.schemas import PriceTickBase
+    from app.services.simulated_source import SimulatedDataSource
+    from app.services.tick_store import TickWriter
+
+    n_bonds = max(args.bonds)
+    source = SimulatedDataSource(seed=args.seed, n_bonds=n_bonds, n_stocks=args.sim_stocks,
+                                 follow_wall_clock=False)
+    events = source.script_random_events(100, horizon=3600)
+
+    start = time.perf_counter()
+    generated = 0
+    async for batch in source.stream_ticks(max_ticks=args.sim_ticks):
+        generated += len(batch)
+    generate = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pairs = await source.get_monitoring_pairs(limit=n_bonds)
+    build = time.perf_counter() - start
+
+    await create_tables()
+    writer = TickWriter(max_buffer=args.sim_ticks)
+    written = 0
+    start = time.perf_counter()
+    async for batch in source.stream_ticks(max_ticks=args.sim_ticks):
+        for quote in batch:
+            writer.add(PriceTickBase(stock_code=quote['code'], price=quote['price'], volume=quote['volume'],
+                                     amount=quote['amount'], data_source='simulated'),
+                       timestamp=quote['timestamp'])
+        written += await writer.flush()
+    write = time.perf_counter() - start
+
+    return {
+        "codes": source.n_stocks + source.n_bonds,
+        "events": len(events),
+        "ticks": generated,
+        "generate_ticks_per_s": round(generated / generate, 2),
+        "pairs": len(pairs),
+        "pairs_build_s": round(build, 4),
+        "ticks_written": written,
+        "write_ticks_per_s": round(written / write, 2),
+    }
+
+
+def _table_bytes(tables) -> int:
+    """SQLite 中若干表 (含其索引) 占用的页大小之和"""
+    db_path = os.environ["DATABASE_URL"].replace("sqlite:///", "")
+    conn = sqlite3.connect(db_path)
+    try:
+        placeholders = ",".join("?" * len(tables))
+        return conn.execute(
+            f"SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name IN "
+            f"(SELECT name FROM sqlite_master WHERE tbl_name IN ({placeholders}))", list(tables)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+TICK_TABLES = ("price_ticks", "price_ticks_compact", "price_ticks_packed")
+
+
+def _clear_ticks():
+    """清空三种行情存储表和 K 线汇总表 (各项基准共用同一个数据库，避免其他基准留下的行情影响读取吞吐、
+    清理行数和分时图的时间锚点)"""
+    db_path = os.environ["DATABASE_URL"].replace("sqlite:///", "")
+    conn = sqlite3.connect(db_path)
+    try:
+        for table in TICK_TABLES + ("price_bars",):
+            conn.execute(f"DELETE FROM {table}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+async def bench_tick_storage(args) -> dict:
+    """同一批仿真行情分别以 standard/compact/packed 写入，比较占用空间和读写吞吐"""
+    from app.core.database import create_tables, get_db
+    from app.models.schemas import PriceTickBase
+    from app.services.simulated_source import SimulatedDataSource
+    from app.services.tick_store import TickWriter, iter_ticks
+
+    await create_tables()
+    tables = {
+        "standard": ["price_ticks"],
+        "compact": ["price_ticks_compact", "symbols"],
+        "packed": ["price_ticks_packed", "symbols"],
+    }
+    start_time = datetime(2024, 3, 1, 9, 30)
+    result = {}
+    for mode, names in tables.items():
+        source = SimulatedDataSource(seed=args.seed, n_bonds=max(args.bonds), n_stocks=args.sim_stocks,
+                                     start=start_time, follow_wall_clock=False)
+        _clear_ticks()
+        before = _table_bytes(names)
+        writer = TickWriter(max_buffer=args.sim_ticks, mode=mode)
+        written = 0
+        start = time.perf_counter()
+        async for batch in source.stream_ticks(max_ticks=args.sim_ticks):
+            for quote in batch:
+                writer.add(PriceTickBase(stock_code=quote["code"], price=quote["price"], volume=quote["volume"],
+                                         amount=quote["amount"], data_source="simulated"),
+                           timestamp=quote["timestamp"])
+            written += await writer.flush()
+        write = time.perf_counter() - start
+        size = _table_bytes(names) - before
+
+        read = 0
+        start = time.perf_counter()
+        async with get_db() as session:
+            async for rows in iter_ticks(session, start_time, start_time + timedelta(days=1)):
+                read += len(rows)
+        elapsed = time.perf_counter() - start
+        result[mode] = {
+            "ticks_written": written,
+            "bytes_per_tick": round(size / written, 2),
+            "write_ticks_per_s": round(written / write, 2),
+            "read_ticks_per_s": round(read / elapsed, 2),
+        }
+    return result
+
+
+async def bench_chart(args) -> dict:
+    """五个交易日的仿真行情写入后，/chart 分时图读取 K 线汇总表，与扫描原始行情聚合对比"""
+    import httpx
+    from app.main import app
+    from app.core.database import create_tables, get_db
+    from app.models.schemas import PriceTickBase
+    from app.services.rollups import aggregate
+    from app.services.simulated_source import SimulatedDataSource
+    from app.services.tick_store import TickWriter, iter_ticks
+
+    await create_tables()
+    _clear_ticks()  # 行情轮询基准以当前时间写入了同一正股的行情和 K 线
+    source = SimulatedDataSource(seed=args.seed, n_bonds=50, tick_interval=15.0,
+                                 start=datetime(2024, 4, 1, 9, 30), follow_wall_clock=False)
+    writer = TickWriter(max_buffer=10 ** 6)
+    written = 0
+    while source.clock < datetime(2024, 4, 6):
+        for quote in source.ticks():
+            writer.add(PriceTickBase(stock_code=quote["code"], price=quote["price"], volume=quote["volume"],
+                                     amount=quote["amount"], data_source="simulated"),
+                       timestamp=quote["timestamp"])
+        if len(writer) >= 20000:
+            written += await writer.flush()
+        source.step()
+    written += await writer.flush()
+
+    code = source.stock_codes[0]
+    result = {"ticks": written}
+    async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+        for time_range in ("1d", "5d"):
+            samples = []
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                response = await client.get("/api/monitoring/chart", params={
+                    "stock_code": code, "bond_code": source.bond_codes[0], "time_range": time_range,
+                })
+                samples.append(time.perf_counter() - start)
+                response.raise_for_status()
+            result[f"chart_{time_range}_points"] = len(response.json()["stock_chart"])
+            result[f"chart_{time_range}_p50_s"] = round(_percentile(samples, 50), 5)
+
+    # 对照: 直接扫描5天原始行情并聚合 (两个代码)
+    start = time.perf_counter()
+    rows = []
+    async with get_db() as session:
+        async for batch in iter_ticks(session, datetime(2024, 4, 1), datetime(2024, 4, 6),
+                                      [code, source.bond_codes[0]]):
+            rows.extend({"stock_code": c, "timestamp": t, "price": p, "volume": v, "amount": a}
+                        for c, t, p, v, a, _ in batch)
+    aggregate(rows, periods=(5,))
+    result["raw_scan_5d_s"] = round(time.perf_counter() - start, 5)
+    return result
+
+
+async def bench_signals(args) -> dict:
+    """相同的仿真行情分别用 0/1/2/... 个工作进程检测信号，比较吞吐和结果一致性"""
+    from app.services.signal_engine import ShardedSignalEngine
+    from app.services.simulated_source import SimulatedDataSource
+
+    source = SimulatedDataSource(seed=args.seed, n_bonds=max(args.bonds), n_stocks=args.sim_stocks,
+                                 follow_wall_clock=False)
+    source.script_random_events(200, horizon=600)
+    batches = []
+    async for batch in source.stream_ticks(max_ticks=args.sim_ticks):
+        batches.append([quote for quote in batch if quote['code'] in source.stock_index])
+    ticks = sum(len(batch) for batch in batches)
+
+    result = {"ticks": ticks, "cpu_count": os.cpu_count()}
+    baseline = None
+    for workers in args.signal_workers:
+        engine = ShardedSignalEngine(workers=workers)
+        engine.start(persist=False)
+        if workers:
+            await asyncio.sleep(2)  # 等待工作进程启动
+
+        start = time.perf_counter()
+        for batch in batches:
+            engine.submit(batch)
+            await asyncio.sleep(0)
+        await engine.drain(timeout=300)
+        elapsed = time.perf_counter() - start
+        signals = engine.take_signals()
+        await engine.stop()
+
+        key = sorted((s["stock_code"], s["signal_type"], str(s["trigger_price"])) for s in signals)
+        baseline = key if baseline is None else baseline
+        result[f"workers_{workers}_ticks_per_s"] = round(ticks / elapsed, 2)
+        result[f"workers_{workers}_signals"] = len(signals)
+        result[f"workers_{workers}_consistent"] = key == baseline
+    return result
+
+
+def _simulated_days(source, days: int) -> list:
+    """把仿真行情按交易日整理为回放输入 [(DayTicks, 昨收价)]"""
+    from app.services.backtest import DayTicks
+
+    codes = source.stock_codes + source.bond_codes
+    result = []
+    for _ in range(days):
+        day = DayTicks(source.clock.strftime("%Y%m%d"))
+        pre_close = dict(zip(source.stock_codes, source.stock_pre_close.tolist()))
+        while source.clock.strftime("%Y%m%d") == day.trade_date:
+            timestamp = source.clock.timestamp()
+            day.codes.extend(codes)
+            day.timestamps.extend([timestamp] * len(codes))
+            day.prices.extend(source.stock_price.tolist() + source.bond_price.tolist())
+            day.volumes.extend(source.stock_volume.tolist() + source.bond_volume.tolist())
+            source.step()
+        result.append((day, pre_close))
+    return result
+
+
+async def bench_backtest(args) -> dict:
+    """仿真行情上的多日回放"""
+    from app.services.backtest import BacktestEngine
+    from app.services.simulated_source import SimulatedDataSource
+
+    source = SimulatedDataSource(seed=args.seed, n_bonds=200, tick_interval=30.0, follow_wall_clock=False)
+    source.script_random_events(50 * args.backtest_days, horizon=4 * 3600 * args.backtest_days)
+    days = _simulated_days(source, args.backtest_days)
+    bond_by_stock = dict(zip(source.stock_codes, source.bond_codes))
+
+    result = {"days": len(days), "ticks": sum(len(day) for day, _ in days)}
+    for workers in args.signal_workers:
+        engine = BacktestEngine(bond_by_stock, workers=workers)
+        report = await engine.run_days(days)
+        result[f"workers_{workers}_ticks_per_s"] = report["ticks_per_s"]
+        result[f"workers_{workers}_trades"] = report["latency"]["0.0"]["trades"]
+    result["hit_rate"] = report["latency"]["0.0"]["hit_rate"]
+    return result
+
+
+async def bench_cache_churn(args) -> dict:
+    """价格缓存在超过容量上限时的写入/淘汰吞吐 (默认写入容量 4 倍的不同代码)，以及回读命中率"""
+    data_source, _ = _make_data_source(args, 1)
+    payload = {"price": 1}
+    operations = args.cache_ops or data_source.cache_size * 4
+    before = len(data_source.price_cache)
+
+    start = time.perf_counter()
+    for i in range(operations):
+        data_source._set_cached_price(f"stock_{i}", payload)
+    set_elapsed = time.perf_counter() - start
+    evictions = before + operations - len(data_source.price_cache)
+
+    start = time.perf_counter()
+    hits = 0
+    for i in range(operations):
+        if data_source._get_cached_price(f"stock_{i}") is not None:
+            hits += 1
+    get_elapsed = time.perf_counter() - start
+
+    return {
+        "operations": operations,
+        "cache_capacity": data_source.cache_size,
+        "evictions": evictions,
+        "set_per_s": round(operations / set_elapsed, 2),
+        "get_per_s": round(operations / get_elapsed, 2),
+        "read_back_hit_ratio": round(hits / operations, 4),
+        "cache_size": len(data_source.price_cache),
+    }
+
+
+async def bench_quote_poller(args) -> dict:
+    """全市场一次批量实时行情刷新 (含写入 price_ticks)"""
+    from app.services.quote_poller import IntradayQuotePoller
+    from app.services.tick_store import TickWriter
+
+    data_source, pro = _make_data_source(args, max(args.bonds))
+    poller = IntradayQuotePoller(data_source, tick_writer=TickWriter(mode="standard"))
+    await poller.load_universe()
+    # 预热模拟数据帧，避免把数据生成计入耗时
+    pro.realtime_quote(ts_code=next(iter(poller.code_types)))
+    pro.calls.clear()
+
+    before = _table_rows("price_ticks")
+    start = time.perf_counter()
+    calls, received = await poller.poll_once()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "codes": len(poller.code_types),
+        "quotes": received,
+        "ticks_written": _table_rows("price_ticks") - before,
+        "tushare_calls": calls,
+        "refresh_s": round(elapsed, 4),
+    }
+
+
+def _table_rows(table: str) -> int:
+    db_path = os.environ["DATABASE_URL"].replace("sqlite:///", "")
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _populate_price_ticks(rows: int):
+    """直接用 sqlite3 批量写入价格数据 (时间均匀分布在过去48小时)"""
+    db_path = os.environ["DATABASE_URL"].replace("sqlite:///", "")
+    now = datetime.now()
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+
+    def generate():
+        for i in range(rows):
+            ts = now - timedelta(seconds=(i * 172800) // rows)
+            yield (f"{600000 + i % 500:06d}.SH", 10 + (i % 100) / 10, i % 10000,
+                   (i % 1000) * 10.0, ts.strftime("%Y-%m-%d %H:%M:%S.%f"), "tushare")
+
+    conn.executemany(
+        "INSERT INTO price_ticks (stock_code, price, volume, amount, timestamp, data_source) "
+        "VALUES (?, ?, ?, ?, ?, ?)", generate()
+    )
+    conn.commit()
+    conn.close()
+
+
+async def bench_database(args) -> dict:
+    """百万行价格表上的 get_db_size 和数据清理"""
+    import httpx
+    from app.main import app
+    from app.core.database import create_tables, get_db_size
+
+    await create_tables()
+    _clear_ticks()
+    start = time.perf_counter()
+    _populate_price_ticks(args.rows)
+    populate = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await get_db_size()
+    db_size = time.perf_counter() - start
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        response = await client.post("/api/monitoring/cleanup", json={
+            "data_types": ["price_cache"],
+            "time_range": {"hours": 24},
+            "preview_only": False,
+        })
+        cleanup = time.perf_counter() - start
+        response.raise_for_status()
+
+    result = {
+        "rows": args.rows,
+        "populate_s": round(populate, 4),
+        "get_db_size_s": round(db_size, 4),
+        "cleanup_s": round(cleanup, 4),
+        "rows_deleted": response.json()["prices_deleted"],
+    }
+
+    from app.services.cold_archive import cold_archive
+    if cold_archive.available:
+        # 从归档中读取单个代码一天的行情 (内存映射，只解压相关记录批)
+        day = datetime.now() - timedelta(days=1)
+        day = datetime(day.year, day.month, day.day)
+        start = time.perf_counter()
+        table = cold_archive.read("price_ticks", day, day + timedelta(days=1), ["600001.SH"])
+        result.update({
+            "rows_archived": (response.json()["archived"] or {}).get("price_ticks", 0),
+            "archive_mb": cold_archive.describe()["tables"]["price_ticks"]["size_mb"],
+            "archive_read_code_day_s": round(time.perf_counter() - start, 4),
+            "archive_read_rows": table.num_rows,
+        })
+    return result
+
+
+STARTUP_SCRIPT = """
+import asyncio, json, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter() - started
+
+async def boot():
+    start = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        return time.perf_counter() - start
+
+print(json.dumps({"import_s": imported, "boot_s": asyncio.run(boot())}))
+"""
+
+
+async def bench_startup(args) -> dict:
+    """在子进程中测量 API 进程的导入和启动耗时 (首次为新数据库)"""
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(WORK_DIR, 'startup.db')}")
+    samples = []
+    for _ in range(args.startup_runs):
+        started = time.perf_counter()
+        output = await asyncio.to_thread(
+            subprocess.check_output, [sys.executable, "-c", STARTUP_SCRIPT], cwd=BACKEND_DIR, env=env, text=True
+        )
+        sample = json.loads(output.strip().splitlines()[-1])
+        sample["process_s"] = time.perf_counter() - started
+        samples.append(sample)
+
+    warm = samples[1:] or samples
+    return {
+        "runs": len(samples),
+        "first_boot_s": round(samples[0]["boot_s"], 4),
+        "import_s": round(statistics.median(s["import_s"] for s in warm), 4),
+        "boot_s": round(statistics.median(s["boot_s"] for s in warm), 4),
+        "process_s": round(statistics.median(s["process_s"] for s in warm), 4),
+    }
+
+
+async def run(args) -> dict:
+    from app.core.database import ensure_schema
+
+    results = {}
+    skip = set(args.skip.split(",")) if args.skip else set()
+    # 各项基准共用的数据库 (_store_bonds 写 bonds 表、行情轮询写 price_ticks) 先建表
+    await ensure_schema()
+
+    if "pairs" not in skip:
+        for n_bonds in args.bonds:
+            print(f"get_monitoring_pairs ({n_bonds})...")
+            results[f"monitoring_pairs_{n_bonds}"] = await bench_monitoring_pairs(args, n_bonds)
+    if "endpoint" not in skip:
+        print("/pairs 并发负载...")
+        results["pairs_endpoint"] = await bench_pairs_endpoint(args)
+    if "poller" not in skip:
+        print("批量实时行情刷新...")
+        results["quote_poller"] = await bench_quote_poller(args)
+    if "outage" not in skip:
+        print("Tushare 故障...")
+        results["outage"] = await bench_outage(args)
+    if "simulated" not in skip:
+        print("仿真行情...")
+        results["simulated"] = await bench_simulated(args)
+    if "storage" not in skip:
+        print("行情存储模式...")
+        results["tick_storage"] = await bench_tick_storage(args)
+    if "chart" not in skip:
+        print("分时图表...")
+        results["chart"] = await bench_chart(args)
+    if "signals" not in skip:
+        print("信号检测...")
+        results["signals"] = await bench_signals(args)
+    if "backtest" not in skip:
+        print("信号回放...")
+        results["backtest"] = await bench_backtest(args)
+    if "startup" not in skip:
+        print("冷启动...")
+        results["startup"] = await bench_startup(args)
+    if "cache" not in skip:
+        print("缓存淘汰...")
+        results["cache_churn"] = await bench_cache_churn(args)
+    if "database" not in skip:
+        print(f"数据库 ({args.rows} 行)...")
+        results["database"] = await bench_database(args)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="后端热点路径基准测试")
+    parser.add_argument("--output", help="结果 JSON 路径 (默认 benchmarks/results/<commit>.json)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--bonds", type=lambda s: [int(x) for x in s.split(",")], default=[50, 200, 500])
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟 Tushare 每次调用延迟(秒)")
+    parser.add_argument("--request-delay", type=float, default=0.0, help="覆盖数据源的请求间隔(秒)")
+    parser.add_argument("--fixtures", help="录制的 <接口名>.csv 所在目录")
+    parser.add_argument("--outage-latency", type=float, default=0.05, help="模拟故障时每次调用的等待(秒)")
+    parser.add_argument("--sim-stocks", type=int, default=5000, help="仿真正股数量")
+    parser.add_argument("--sim-ticks", type=int, default=100_000, help="仿真行情条数")
+    parser.add_argument("--signal-workers", type=lambda s: [int(x) for x in s.split(",")], default=[0, 1, 2],
+                        help="信号检测工作进程数 (逗号分隔，0 表示主进程内检测)")
+    parser.add_argument("--backtest-days", type=int, default=4, help="回放的仿真交易日数")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--cache-ops", type=int, default=None, help="缓存写入次数 (默认为缓存容量的 4 倍)")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--startup-runs", type=int, default=5, help="冷启动测量次数 (首次为新数据库)")
+    parser.add_argument("--skip", default="", help="逗号分隔: pairs,endpoint,poller,outage,simulated,storage,chart,signals,backtest,startup,cache,database")
+    args = parser.parse_args()
+
+    commit = _git_commit()
+    started = time.perf_counter()
+    results = asyncio.run(run(args))
+
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {k: v for k, v in vars(args).items() if k != "output"},
+        "duration_s": round(time.perf_counter() - started, 2),
+        "results": results,
+    }
+
+    output = args.output or os.path.join(BACKEND_DIR, "benchmarks", "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    print(f"结果已写入 {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+信号规则回测脚本
+
+回放数据库中已保存的 price_ticks，评估 big_rise 阈值、volume_spike 倍数等参数。
+
+用法:
+    cd backend
+    python scripts/backtest.py --start 20240102 --end 20240131 --workers 4 \
+        --big-rise 5 --volume-spike 5 --latencies 0,3,30
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.backtest import BacktestEngine
+from app.services.data_source import DataSourceFactory
+
+
+async def run_backtest(args) -> dict:
+    data_source = DataSourceFactory.create_data_source(settings.data_source_type, token=settings.tushare_token)
+    bonds = await data_source.get_bonds()
+    bond_by_stock = {}
+    for bond in bonds:
+        if bond.get('stock_code'):
+            bond_by_stock.setdefault(bond['stock_code'], bond['ts_code'])
+
+    engine = BacktestEngine(
+        bond_by_stock,
+        workers=args.workers,
+        latencies=args.latencies,
+        order_volume=args.order_volume,
+        slippage=args.slippage,
+        big_rise_threshold=args.big_rise,
+        volume_spike_ratio=args.volume_spike,
+    )
+    return await engine.run(args.start, args.end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="信号规则回测")
+    parser.add_argument("--start", required=True, help="开始交易日 YYYYMMDD")
+    parser.add_argument("--end", required=True, help="结束交易日 YYYYMMDD")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="回放进程数，0 表示单进程")
+    parser.add_argument("--latencies", type=lambda s: [float(x) for x in s.split(",")], default=[0.0, 3.0, 30.0],
+                        help="信号到下单的延迟(秒)，逗号分隔")
+    parser.add_argument("--order-volume", type=int, default=10, help="每笔买入张数")
+    parser.add_argument("--slippage", type=float, default=0.001)
+    parser.add_argument("--big-rise", type=float, default=settings.big_rise_threshold, help="大涨阈值(%%)")
+    parser.add_argument("--volume-spike", type=float, default=settings.volume_spike_ratio, help="放量倍数")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_backtest(args))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,7 @@ import os
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.core.database import create_tables
+from app.core.database import ensure_schema
 from app.core.config import settings
 
 
@@ -20,9 +20,11 @@ async def init_database():
     print("开始初始化数据库...")
 
     try:
-        # 创建表
-        await create_tables()
-        print("✅ 数据库表创建成功")
+        # 创建表 (与应用启动时相同的版本检查，表结构已是最新时跳过)
+        if await ensure_schema():
+            print("✅ 数据库表创建成功")
+        else:
+            print("✅ 数据库表结构已是最新")
 
         # 这里可以添加初始数据
         print("✅ 数据库初始化完成")
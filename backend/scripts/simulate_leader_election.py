@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+主节点选举模拟
+
+在本机启动多个工作进程竞争同一把锁 (与多个 uvicorn 工作进程相同)，依次模拟:
+1. 启动选举
+2. 主节点被强制杀死 (kill -9)
+3. 主节点正常退出 (释放锁)
+4. 主节点事件循环阻塞超过租约 (主动退位)
+记录每次接管耗时，并检查任一时刻最多只有一个主节点。
+
+用法:
+    cd backend
+    python scripts/simulate_leader_election.py --workers 4
+    # PostgreSQL advisory lock (需要 DATABASE_URL 指向 PostgreSQL)
+    python scripts/simulate_leader_election.py --backend advisory
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import queue
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def worker_main(index: int, backend: str, lock_path: str, lease: float, renew: float, events, commands):
+    """工作进程: 参与选举，成为主节点 / 退位时上报事件，按指令退出或阻塞事件循环"""
+    from app.core.leader import AdvisoryLock, FileLock, LeaderElection
+
+    async def run():
+        if backend == 'file':
+            lock = FileLock(lock_path)
+        else:
+            from app.core.database import engine
+            lock = AdvisoryLock(engine, 'leader-simulation')
+
+        async def elected():
+            events.put(('elected', index, os.getpid(), time.time()))
+
+        async def demoted():
+            events.put(('demoted', index, os.getpid(), time.time()))
+
+        election = LeaderElection(lock, on_elected=elected, on_demoted=demoted,
+                                  lease_seconds=lease, renew_interval=renew)
+        await election.start()
+        while True:
+            try:
+                command = commands.get_nowait()
+            except queue.Empty:
+                await asyncio.sleep(0.02)
+                continue
+            if command == 'stop':
+                await election.stop()
+                return
+            if command == 'stall':
+                time.sleep(lease + renew)  # 模拟阻塞事件循环的同步调用
+
+    asyncio.run(run())
+
+
+class Simulation:
+    def __init__(self, args):
+        self.args = args
+        self.ctx = mp.get_context('spawn')
+        self.lock_path = os.path.join(tempfile.mkdtemp(prefix='leader-sim-'), 'leader.lock')
+        self.workers = {}  # 工作进程 -> (进程, 指令队列, 事件队列)；被杀死的进程可能持有队列的锁，因此不共用队列
+        self.log = []  # (事件, 工作进程, 时间)
+        self.leader = None
+
+    def spawn(self, index: int):
+        commands, events = self.ctx.Queue(), self.ctx.Queue()
+        process = self.ctx.Process(
+            target=worker_main, daemon=True,
+            args=(index, self.args.backend, self.lock_path, self.args.lease, self.args.renew, events, commands)
+        )
+        process.start()
+        self.workers[index] = (process, commands, events)
+
+    def poll_events(self) -> list:
+        received = []
+        for _, _, events in self.workers.values():
+            while True:
+                try:
+                    kind, index, _, at = events.get_nowait()
+                except queue.Empty:
+                    break
+                received.append((kind, index, at))
+        self.log.extend(received)
+        return received
+
+    def wait_elected(self, timeout: float = 30.0) -> float:
+        """等待新的主节点，返回事件时间"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            for kind, index, at in self.poll_events():
+                if kind == 'elected':
+                    self.leader = index
+                    return at
+            time.sleep(0.01)
+        raise TimeoutError("等待主节点超时")
+
+    def failover(self, action: str) -> float:
+        """对当前主节点执行 action，返回到下一个主节点当选的耗时"""
+        leader = self.leader
+        process, commands, _ = self.workers[leader]
+        started = time.time()
+        if action == 'kill':
+            process.kill()
+            self.log.append(('killed', leader, started))
+        else:
+            commands.put(action)
+        elected_at = self.wait_elected()
+        if action != 'stall':
+            self.spawn(leader)  # 补回退出的工作进程
+        return round(elected_at - started, 3)
+
+    def check_exclusive(self) -> bool:
+        """任一时刻最多一个主节点: 新主节点当选前，上一个主节点已退位或已被杀死"""
+        holder = None
+        for kind, index, _ in sorted(self.log, key=lambda event: event[2]):
+            if kind == 'elected':
+                if holder is not None:
+                    return False
+                holder = index
+            elif holder == index:
+                holder = None
+        return True
+
+    def run(self) -> dict:
+        started = time.time()
+        for index in range(self.args.workers):
+            self.spawn(index)
+        first = self.wait_elected()
+        result = {
+            'workers': self.args.workers,
+            'backend': self.args.backend,
+            'lease_s': self.args.lease,
+            'renew_s': self.args.renew,
+            'first_election_s': round(first - started, 3),
+            'failover_kill_s': self.failover('kill'),
+            'failover_stop_s': self.failover('stop'),
+            'failover_stall_s': self.failover('stall'),
+        }
+        time.sleep(self.args.renew * 3)
+        self.poll_events()
+        result['elections'] = sum(1 for kind, _, _ in self.log if kind == 'elected')
+        result['exclusive'] = self.check_exclusive()
+        for process, _, _ in self.workers.values():
+            process.kill()
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="主节点选举模拟")
+    parser.add_argument("--workers", type=int, default=4, help="工作进程数")
+    parser.add_argument("--backend", choices=["file", "advisory"], default="file",
+                        help="file: 锁文件 (SQLite / 单机)，advisory: PostgreSQL advisory lock")
+    parser.add_argument("--lease", type=float, default=2.0, help="租约时长(秒)")
+    parser.add_argument("--renew", type=float, default=0.2, help="续约 / 重试间隔(秒)")
+    args = parser.parse_args()
+
+    result = Simulation(args).run()
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    sys.exit(0 if result['exclusive'] else 1)
+
+
+if __name__ == "__main__":
+    main()
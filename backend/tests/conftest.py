@@ -0,0 +1,12 @@
+"""
+测试环境: 在导入 app 之前指定独立的临时数据库，不读取本地 .env 中的数据库配置
+
+在 backend 目录下运行: python -m pytest -q
+"""
+
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/bond_monitoring_test_{os.getpid()}.db")
+os.environ.setdefault("APP_ENV", "test")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
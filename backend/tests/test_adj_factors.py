@@ -0,0 +1,80 @@
+import asyncio
+
+import pandas as pd
+from sqlalchemy import delete
+
+from app.core.database import engine, ensure_schema, get_db
+from app.models.database import AdjFactor as AdjFactorModel
+from app.services.adj_factors import AdjFactorStore
+
+# 两个交易日的全市场因子: 000002.SZ 在 20240102 除权
+MARKET = {
+    20240102: {'000001.SZ': 1.0, '000002.SZ': 2.0, '600000.SH': 3.0},
+    20240103: {'000001.SZ': 1.0, '000002.SZ': 4.0, '600000.SH': 3.0},
+}
+
+
+class FakeDataSource:
+    def __init__(self):
+        self.calls = 0
+
+    async def get_adj_factors(self, trade_date: str):
+        self.calls += 1
+        factors = MARKET[int(trade_date)]
+        return pd.DataFrame({'ts_code': list(factors), 'adj_factor': list(factors.values())})
+
+
+async def empty_table():
+    await ensure_schema()
+    async with get_db() as session:
+        await session.execute(delete(AdjFactorModel))
+
+
+def test_later_underlying_gets_full_window():
+    async def run():
+        await empty_table()
+        data_source = FakeDataSource()
+        store = AdjFactorStore()
+        await store.load(20240101, ['000001.SZ'])  # 取数时只知道 000001.SZ
+        for trade_date in MARKET:
+            assert await store.ingest(data_source, trade_date) == ['000001.SZ']
+        assert set(store._factors) == {'000001.SZ'}
+
+        # 之后上市的可转债的正股: 从表中加载整个窗口，不再调用接口
+        await store.load(20240101, ['000002.SZ'])
+        assert data_source.calls == 2
+        assert store.tracked == {'000001.SZ', '000002.SZ'}
+        assert store.multipliers('000002.SZ', [20240102, 20240103], 'qfq').tolist() == [0.5, 1.0]
+
+        # 另一个进程 (从节点) 按需加载图表请求的代码
+        follower = AdjFactorStore()
+        await follower.load(20240101, ['600000.SH'])
+        assert follower.loaded_dates == set(MARKET)
+        assert follower.multipliers('600000.SH', [20240103], 'hfq').tolist() == [3.0]
+        assert follower.multipliers('000002.SZ', [20240103], 'hfq') is None
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_failed_save_is_retried():
+    async def run():
+        await empty_table()
+        data_source = FakeDataSource()
+        store = AdjFactorStore()
+        await store.load(20240101, ['000001.SZ'])
+
+        async def failing_save(trade_date, factors):
+            raise RuntimeError("database is locked")
+
+        store.save = failing_save
+        assert await store.ingest(data_source, 20240102) is None
+        assert 20240102 not in store.loaded_dates
+        assert '000001.SZ' not in store.series
+
+        del store.save  # 恢复入库，下个周期重新获取
+        assert await store.ingest(data_source, 20240102) == ['000001.SZ']
+        assert 20240102 in store.loaded_dates
+        await engine.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+from app.core.circuit_breaker import CLOSED, HALF_OPEN
+from app.services.data_source import TushareDataSource
+
+
+def test_cancelled_probe_releases_half_open():
+    async def run():
+        data_source = TushareDataSource(token="", pro=object())
+        data_source.request_delay = 0
+
+        def stock_basic():
+            time.sleep(0.2)
+            return 'ok'
+
+        breaker = data_source.breakers.get('stock_basic')
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        breaker.opened_at -= breaker.reset_timeout  # 冷却期已过
+
+        probe = asyncio.create_task(data_source._make_request(stock_basic))
+        await asyncio.sleep(0.05)
+        assert breaker.state == HALF_OPEN
+        probe.cancel()
+        try:
+            await probe
+        except asyncio.CancelledError:
+            pass
+
+        # 下一个请求重新探测并恢复
+        assert await data_source._make_request(stock_basic) == 'ok'
+        assert breaker.state == CLOSED
+
+    asyncio.run(run())
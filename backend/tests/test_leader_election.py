@@ -0,0 +1,229 @@
+import asyncio
+import multiprocessing as mp
+import os
+import queue
+import time
+
+import pytest
+
+from app.core.leader import FileLock, LeaderElection, fcntl
+
+RENEW_INTERVAL = 0.3
+LEASE_SECONDS = 1.5
+TAKEOVER_SLACK = 0.5  # 进程调度等额外耗时
+
+
+def worker_main(index: int, lock_path: str, events, commands):
+    """工作进程: 竞争同一把文件锁，成为主节点 / 退位时上报事件，收到 stop 时正常退出"""
+
+    async def run():
+        async def elected():
+            events.put(('elected', index, time.time()))
+
+        async def demoted():
+            events.put(('demoted', index, time.time()))
+
+        election = LeaderElection(FileLock(lock_path), on_elected=elected, on_demoted=demoted,
+                                  lease_seconds=LEASE_SECONDS, renew_interval=RENEW_INTERVAL)
+        await election.start()
+        events.put(('started', index, time.time()))
+        while True:
+            try:
+                command = commands.get_nowait()
+            except queue.Empty:
+                await asyncio.sleep(0.02)
+                continue
+            if command == 'stop':
+                await election.stop()
+                events.put(('stopped', index, time.time()))
+                return
+
+    asyncio.run(run())
+
+
+class Cluster:
+    """本机上竞争同一把锁的多个工作进程 (每个进程独立的队列，被杀死的进程不会占住共享队列的锁)"""
+
+    def __init__(self, lock_path: str, size: int):
+        ctx = mp.get_context('spawn')
+        self.workers = {}
+        for index in range(size):
+            events, commands = ctx.Queue(), ctx.Queue()
+            process = ctx.Process(target=worker_main, args=(index, lock_path, events, commands), daemon=True)
+            process.start()
+            self.workers[index] = (process, events, commands)
+        self.leaders = set()
+        self.started = set()
+
+    def poll(self, timeout: float, until) -> bool:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            for index, (_, events, _) in self.workers.items():
+                try:
+                    while True:
+                        event, worker, _ = events.get_nowait()
+                        if event == 'elected':
+                            self.leaders.add(worker)
+                        elif event == 'demoted':
+                            self.leaders.discard(worker)
+                        elif event == 'started':
+                            self.started.add(worker)
+                except queue.Empty:
+                    pass
+            if until():
+                return True
+            time.sleep(0.01)
+        return until()
+
+    def leader(self) -> int:
+        assert len(self.leaders) == 1, self.leaders
+        return next(iter(self.leaders))
+
+    def remove(self, index: int):
+        process, _, _ = self.workers.pop(index)
+        process.join(timeout=5)
+        self.leaders.discard(index)
+
+    def close(self):
+        for process, _, _ in self.workers.values():
+            process.kill()
+            process.join(timeout=5)
+
+
+@pytest.fixture
+def cluster(tmp_path):
+    clusters = []
+
+    def start(size: int) -> Cluster:
+        result = Cluster(str(tmp_path / 'leader.lock'), size)
+        clusters.append(result)
+        assert result.poll(60, lambda: len(result.started) == size), "工作进程未能启动"
+        return result
+
+    yield start
+    for result in clusters:
+        result.close()
+
+
+pytestmark = pytest.mark.skipif(fcntl is None, reason="文件锁需要 fcntl")
+
+
+def test_exactly_one_leader(cluster):
+    workers = cluster(4)
+    assert workers.poll(5, lambda: len(workers.leaders) == 1)
+    # 多个续约周期后仍然只有一个主节点
+    workers.poll(RENEW_INTERVAL * 4, lambda: False)
+    workers.leader()
+
+
+def test_takeover_after_leader_killed(cluster):
+    workers = cluster(3)
+    assert workers.poll(5, lambda: len(workers.leaders) == 1)
+    leader = workers.leader()
+    workers.workers[leader][0].kill()
+    killed_at = time.time()
+    workers.remove(leader)
+
+    assert workers.poll(RENEW_INTERVAL + TAKEOVER_SLACK, lambda: len(workers.leaders) == 1)
+    assert time.time() - killed_at <= RENEW_INTERVAL + TAKEOVER_SLACK
+    assert workers.leader() != leader
+
+
+def test_takeover_after_leader_stopped(cluster):
+    workers = cluster(3)
+    assert workers.poll(5, lambda: len(workers.leaders) == 1)
+    leader = workers.leader()
+    process, events, commands = workers.workers[leader]
+    commands.put('stop')
+    assert workers.poll(5, lambda: leader not in workers.leaders)
+    stopped_at = time.time()
+    workers.remove(leader)
+
+    assert workers.poll(RENEW_INTERVAL + TAKEOVER_SLACK, lambda: len(workers.leaders) == 1)
+    assert time.time() - stopped_at <= RENEW_INTERVAL + TAKEOVER_SLACK
+    assert workers.leader() != leader
+
+
+class FakeLock:
+    def __init__(self):
+        self.held = False
+        self.renew_ok = True
+        self.released = 0
+
+    async def acquire(self) -> bool:
+        if self.held:
+            return False
+        self.held = True
+        return True
+
+    async def renew(self) -> bool:
+        return self.renew_ok
+
+    async def release(self):
+        self.held = False
+        self.released += 1
+
+
+def make_election(lock: FakeLock, calls: list) -> LeaderElection:
+    async def elected():
+        calls.append('elected')
+
+    async def demoted():
+        calls.append('demoted')
+
+    return LeaderElection(lock, on_elected=elected, on_demoted=demoted,
+                          lease_seconds=LEASE_SECONDS, renew_interval=RENEW_INTERVAL)
+
+
+def test_step_demotes_on_overdue_lease():
+    async def run():
+        lock, calls = FakeLock(), []
+        election = make_election(lock, calls)
+        await election._step()
+        assert election.is_leader and calls == ['elected']
+
+        await election._step()  # 按时续约
+        assert election.is_leader
+
+        election._renewed_at = time.monotonic() - LEASE_SECONDS - 1  # 事件循环被阻塞超过租约
+        await election._step()
+        assert not election.is_leader
+        assert calls == ['elected', 'demoted']
+        assert lock.released == 1 and not lock.held
+
+    asyncio.run(run())
+
+
+def test_step_demotes_on_failed_renew():
+    async def run():
+        lock, calls = FakeLock(), []
+        election = make_election(lock, calls)
+        await election._step()
+        assert election.is_leader
+
+        lock.renew_ok = False
+        await election._step()
+        assert not election.is_leader
+        assert calls == ['elected', 'demoted']
+        assert lock.released == 1
+
+        # 锁已释放，下一次重新竞选
+        lock.renew_ok = True
+        await election._step()
+        assert election.is_leader
+        assert calls == ['elected', 'demoted', 'elected']
+
+    asyncio.run(run())
+
+
+def test_filelock_is_exclusive(tmp_path):
+    async def run():
+        path = str(tmp_path / 'leader.lock')
+        first, second = FileLock(path), FileLock(path)
+        assert await first.acquire()
+        assert not await second.acquire()
+        await first.release()
+        assert await second.acquire()
+        await second.release()
+
+    asyncio.run(run())
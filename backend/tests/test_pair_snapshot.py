@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+from app.models.schemas import MonitoringPair
+from app.services.pair_snapshot import PairSnapshot
+
+
+def make_pair(bond_code: str, **fields) -> MonitoringPair:
+    values = dict(
+        stock_code=f"6{bond_code[1:6]}.SH", stock_name="正股", stock_price=Decimal("10"), stock_change=Decimal("1"),
+        stock_volume=None, stock_turnover=None, bond_code=bond_code, bond_name="转债", bond_price=Decimal("120"),
+        bond_change=Decimal("0.5"), conversion_price=Decimal("8"), premium=Decimal("20"), maturity_date="2030-01-01",
+        remaining_years=Decimal("3"), double_low=Decimal("140"), rating="AA",
+    )
+    values.update(fields)
+    return MonitoringPair(**values)
+
+
+def codes(snapshot: PairSnapshot, indices):
+    return [snapshot.pairs[i].bond_code for i in indices]
+
+
+def fundamentals_snapshot() -> PairSnapshot:
+    return PairSnapshot([
+        make_pair("113001.SH", stock_roe=Decimal("12"), stock_debt_ratio=Decimal("40")),
+        make_pair("113002.SH"),  # 没有财务指标
+        make_pair("113003.SH", stock_roe=Decimal("-8"), stock_debt_ratio=Decimal("70")),
+        make_pair("113004.SH", stock_roe=Decimal("0"), stock_debt_ratio=Decimal("0")),
+    ])
+
+
+def test_missing_fundamentals_do_not_match_ranges():
+    snapshot = fundamentals_snapshot()
+    assert codes(snapshot, snapshot.query([("stock_roe", True)], {"stock_debt_ratio": (None, 60)})) == [
+        "113001.SH", "113004.SH"]
+    assert set(codes(snapshot, snapshot.query([("stock_roe", True)], {"stock_roe": (-100, 100)}))) == {
+        "113001.SH", "113003.SH", "113004.SH"}
+
+
+def test_missing_fundamentals_sort_last_in_both_directions():
+    snapshot = fundamentals_snapshot()
+    assert codes(snapshot, snapshot.query([("stock_roe", True)])) == [
+        "113001.SH", "113004.SH", "113003.SH", "113002.SH"]
+    assert codes(snapshot, snapshot.query([("stock_roe", False)])) == [
+        "113003.SH", "113004.SH", "113001.SH", "113002.SH"]
+    # 多字段排序同样排在最后
+    assert codes(snapshot, snapshot.query([("stock_debt_ratio", True), ("premium", False)]))[-1] == "113002.SH"
+    assert codes(snapshot, snapshot.query([("stock_debt_ratio", False), ("premium", False)]))[-1] == "113002.SH"
+
+
+def test_ranges_match_nothing_when_fundamentals_disabled():
+    snapshot = PairSnapshot([make_pair("113001.SH"), make_pair("113002.SH")])
+    assert snapshot.query([("stock_change", True)], {"stock_debt_ratio": (None, 60)}) == []
+    assert len(snapshot.query([("stock_debt_ratio", True)])) == 2
+
+
+def test_large_flow_range_skips_stocks_without_moneyflow():
+    snapshot = PairSnapshot([
+        make_pair("113001.SH", stock_large_flow_ratio=Decimal("3.5")),
+        make_pair("113002.SH"),  # 没有资金流向数据
+        make_pair("113003.SH", stock_large_flow_ratio=Decimal("-2")),
+    ])
+    assert codes(snapshot, snapshot.query([("stock_change", True)], {"stock_large_flow_ratio": (-1, None)})) == [
+        "113001.SH"]
+    assert codes(snapshot, snapshot.query([("stock_change", True)], {"stock_large_flow_ratio": (None, 5)})) == [
+        "113001.SH", "113003.SH"]
+    assert codes(snapshot, snapshot.query([("stock_large_flow_ratio", False)])) == [
+        "113003.SH", "113001.SH", "113002.SH"]
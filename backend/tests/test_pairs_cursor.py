@@ -0,0 +1,70 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.monitoring import get_data_source
+from app.main import app
+from app.services import pair_snapshot as pair_snapshot_module
+from app.services.pair_snapshot import PairSnapshot, pair_snapshot_store
+
+from test_pair_snapshot import make_pair
+
+
+def universe(count: int, shift: int = 0):
+    # shift 改变涨幅，使快照重建后排序发生变化
+    return [make_pair(f"11{i:04d}.SH", stock_change=(i * 7 + shift) % count) for i in range(count)]
+
+
+class FakeDataSource:
+    async def get_monitoring_pairs(self, limit: int = 100):
+        return universe(50)
+
+
+@pytest.fixture
+def client():
+    app.dependency_overrides[get_data_source] = FakeDataSource
+    pair_snapshot_store.current = None
+    pair_snapshot_store._retained.clear()
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    pair_snapshot_store.current = None
+    pair_snapshot_store._retained.clear()
+
+
+def walk(client, rebuild_after_first=False):
+    codes = []
+    response = client.get("/api/monitoring/pairs", params={"limit": 20}).json()
+    codes += [pair["bond_code"] for pair in response["data"]]
+    if rebuild_after_first:
+        pair_snapshot_store._replace(PairSnapshot(universe(50, shift=3), version=response["snapshot_version"] + 1))
+    while response["next_cursor"]:
+        response = client.get("/api/monitoring/pairs", params={"limit": 20, "cursor": response["next_cursor"]})
+        assert response.status_code == 200, response.text
+        response = response.json()
+        codes += [pair["bond_code"] for pair in response["data"]]
+    return codes
+
+
+def test_cursor_stays_on_its_snapshot_across_rebuild(client):
+    codes = walk(client, rebuild_after_first=True)
+    assert len(codes) == 50
+    assert len(set(codes)) == 50
+
+
+def test_expired_cursor_returns_410(client, monkeypatch):
+    first = client.get("/api/monitoring/pairs", params={"limit": 20}).json()
+    pair_snapshot_store._replace(PairSnapshot(universe(50, shift=3), version=first["snapshot_version"] + 1))
+    monkeypatch.setattr(pair_snapshot_module, "RETAIN_SECONDS", 0.0)
+    time.sleep(0.01)
+    response = client.get("/api/monitoring/pairs", params={"limit": 20, "cursor": first["next_cursor"]})
+    assert response.status_code == 410
+
+
+def test_retained_snapshots_are_bounded():
+    store = pair_snapshot_module.PairSnapshotStore()
+    for version in range(pair_snapshot_module.RETAIN_SNAPSHOTS + 5):
+        store._replace(PairSnapshot([], version=version))
+    assert len(store._retained) == pair_snapshot_module.RETAIN_SNAPSHOTS
+    assert store.get_version(0) is None
+    assert store.get_version(store.current.version) is store.current
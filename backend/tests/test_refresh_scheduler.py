@@ -0,0 +1,30 @@
+import asyncio
+
+from app.core.config import settings
+from app.core.database import engine, ensure_schema
+from app.services.quote_poller import IntradayQuotePoller
+from app.services.refresh_scheduler import RefreshScheduler
+
+
+def test_removed_favorite_is_dropped(monkeypatch):
+    async def run():
+        await ensure_schema()
+        monkeypatch.setattr(settings, 'favorite_codes', '600000.SH,113001.SH')
+        scheduler = RefreshScheduler()
+        poller = IntradayQuotePoller(None, scheduler=scheduler)
+        await poller.refresh_priorities()
+        assert scheduler.favorites == {'600000.SH', '113001.SH'}
+
+        monkeypatch.setattr(settings, 'favorite_codes', '600000.SH')
+        await poller.refresh_priorities()
+        assert scheduler.favorites == {'600000.SH'}
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_restore_replaces_favorites(monkeypatch):
+    monkeypatch.setattr(settings, 'favorite_codes', '000001.SZ')
+    scheduler = RefreshScheduler()
+    scheduler.restore_state({'codes': [], 'favorites': ['600000.SH']})
+    assert scheduler.favorites == {'600000.SH'}
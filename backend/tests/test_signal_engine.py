@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+from app.services.signal_engine import ShardedSignalEngine
+
+
+def quote(code: str, price: float, volume: float = 1000.0) -> dict:
+    return {'code': code, 'trade_date': 20240102, 'price': price, 'pre_close': 10.0, 'volume': volume,
+            'timestamp': time.time()}
+
+
+def test_dead_worker_is_restarted():
+    async def run():
+        engine = ShardedSignalEngine(workers=1, ring_capacity=1024)
+        engine.start(persist=False)
+        try:
+            engine.submit([quote('600001.SH', 10.1)])
+            assert await engine.drain(30)
+
+            engine._processes[0].kill()
+            engine._processes[0].join(5)
+            engine.submit([quote('600002.SH', 11.0)])  # 涨停
+            assert engine.check_workers(force=True) == 1
+            assert engine.restarts == 1
+            assert engine._processes[0].is_alive()
+
+            # 积压的行情写入新的缓冲区并得到处理
+            assert await engine.drain(30)
+            assert engine.backlog == 0
+            assert {s['signal_type'] for s in engine.take_signals() if s['stock_code'] == '600002.SH'} >= {'limit_up'}
+        finally:
+            await engine.stop()
+
+    asyncio.run(run())
+
+
+def test_healthy_workers_are_left_alone():
+    async def run():
+        engine = ShardedSignalEngine(workers=2, ring_capacity=1024)
+        engine.start(persist=False)
+        try:
+            engine.submit([quote(f'60000{i}.SH', 10.2) for i in range(6)])
+            assert await engine.drain(30)
+            assert engine.check_workers(force=True) == 0
+            assert engine.restarts == 0 and engine.dropped == 0
+        finally:
+            await engine.stop()
+
+    asyncio.run(run())
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { memo, useCallback, useEffect, useRef, useState, type UIEvent } from 'react';
 
 interface MonitoringPair {
   stock_code: string;
@@ -21,27 +21,123 @@ interface MonitoringPair {
   is_favorite: boolean;
 }
 
+// 虚拟列表: 每行固定高度，只挂载可视区域内的行 (上下各多渲染 OVERSCAN 行)
+const ROW_HEIGHT = 188;
+const ROW_GAP = 16;
+const OVERSCAN = 4;
+const PAGE_SIZE = 200;  // /pairs 单页上限，按游标翻页加载全部配对
+const MAX_WALK_ATTEMPTS = 3;
+const REFRESH_INTERVAL = Number(process.env.NEXT_PUBLIC_AUTO_REFRESH_INTERVAL) || 30000;
+// 价格变动高亮: 持续 FLASH_DURATION，同一行两次高亮至少间隔 FLASH_MIN_INTERVAL
+const FLASH_DURATION = 600;
+const FLASH_MIN_INTERVAL = 1500;
+
+type PairStore = Map<string, MonitoringPair>;
+
+function samePair(a: MonitoringPair, b: MonitoringPair) {
+  for (const key of Object.keys(b) as (keyof MonitoringPair)[]) {
+    if (key !== 'is_favorite' && a[key] !== b[key]) {
+      return false;
+    }
+  }
+  return true;
+}
+
+// 按 bond_code 合并新数据: 未变化的行保留原对象 (卡片不重新渲染)，变化的行只替换该行
+function mergePairs(store: PairStore, incoming: MonitoringPair[], favorites: Set<string>) {
+  const next: PairStore = new Map();
+  let changed = incoming.length !== store.size;
+  for (const pair of incoming) {
+    const current = store.get(pair.bond_code);
+    if (current && samePair(current, pair)) {
+      next.set(pair.bond_code, current);
+    } else {
+      next.set(pair.bond_code, { ...pair, is_favorite: favorites.has(pair.bond_code) || pair.is_favorite });
+      changed = true;
+    }
+  }
+  return { next, changed };
+}
+
+function sameOrder(a: string[], b: string[]) {
+  return a.length === b.length && a.every((code, i) => code === b[i]);
+}
+
 export function MonitoringList() {
-  const [pairs, setPairs] = useState<MonitoringPair[]>([]);
+  const [pairs, setPairs] = useState<PairStore>(() => new Map());
+  const [order, setOrder] = useState<string[]>([]);
   const [loading, setLoading] = useState(true);
   const [sortBy, setSortBy] = useState('stock_change');
   const [sortOrder, setSortOrder] = useState<'asc' | 'desc'>('desc');
   const [signalFilter, setSignalFilter] = useState('all');
+  const [scrollTop, setScrollTop] = useState(0);
+  const [viewportHeight, setViewportHeight] = useState(800);
 
-  // 获取监控数据
-  const fetchData = async () => {
-    try {
-      const params = new URLSearchParams({
-        limit: '50',
-        sort_by: sortBy,
-        sort_order: sortOrder,
-        signal_filter: signalFilter,
-      });
+  const pairsRef = useRef<PairStore>(pairs);
+  const orderRef = useRef<string[]>(order);
+  const versionRef = useRef<number | null>(null);
+  const favoritesRef = useRef<Set<string>>(new Set());
+  const viewportRef = useRef<HTMLDivElement>(null);
+  const scrollFrame = useRef<number | null>(null);
 
+  // 获取监控数据 (快照版本未变化时跳过其余分页，也不触发渲染)
+  const fetchData = async (force = false) => {
+    try {
       const apiUrl = process.env.NEXT_PUBLIC_API_URL || '';
-      const response = await fetch(`${apiUrl}/api/monitoring/pairs?${params}`);
-      const data = await response.json();
-      setPairs(data.data || []);
+      let incoming: MonitoringPair[] = [];
+      let version: number | null = null;
+      let complete = false;
+      // 翻页期间快照重建 (后续页版本不同或游标过期 410) 时从第一页重新开始，避免重复或缺失的 bond_code
+      for (let attempt = 0; attempt < MAX_WALK_ATTEMPTS && !complete; attempt++) {
+        incoming = [];
+        version = null;
+        let cursor: string | null = null;
+        complete = true;
+        do {
+          const params = new URLSearchParams({
+            limit: String(PAGE_SIZE),
+            sort_by: sortBy,
+            sort_order: sortOrder,
+            signal_filter: signalFilter,
+          });
+          if (cursor) {
+            params.set('cursor', cursor);
+          }
+          const response = await fetch(`${apiUrl}/api/monitoring/pairs?${params}`);
+          if (cursor && response.status === 410) {
+            complete = false;
+            break;
+          }
+          const data = await response.json();
+          const pageVersion = data.snapshot_version ?? null;
+          if (!cursor) {
+            version = pageVersion;
+            if (!force && version !== null && version === versionRef.current) {
+              return;
+            }
+          } else if (pageVersion !== version) {
+            complete = false;
+            break;
+          }
+          incoming.push(...(data.data || []));
+          cursor = data.next_cursor || null;
+        } while (cursor);
+      }
+      if (!complete) {
+        return;  // 快照持续更新，保留当前列表，下个周期重试
+      }
+
+      versionRef.current = version;
+      const { next, changed } = mergePairs(pairsRef.current, incoming, favoritesRef.current);
+      const nextOrder = incoming.map(pair => pair.bond_code);
+      if (changed) {
+        pairsRef.current = next;
+        setPairs(next);
+      }
+      if (!sameOrder(orderRef.current, nextOrder)) {
+        orderRef.current = nextOrder;
+        setOrder(nextOrder);
+      }
     } catch (error) {
       console.error('获取监控数据失败:', error);
     } finally {
@@ -50,12 +146,48 @@ export function MonitoringList() {
   };
 
   useEffect(() => {
-    fetchData();
-    // 每30秒自动刷新
-    const interval = setInterval(fetchData, 30000);
+    fetchData(true);
+    const interval = setInterval(() => fetchData(), REFRESH_INTERVAL);
     return () => clearInterval(interval);
   }, [sortBy, sortOrder, signalFilter]);
 
+  // 排序或筛选变化后回到顶部
+  useEffect(() => {
+    if (viewportRef.current) {
+      viewportRef.current.scrollTop = 0;
+    }
+    setScrollTop(0);
+  }, [sortBy, sortOrder, signalFilter]);
+
+  useEffect(() => {
+    const viewport = viewportRef.current;
+    if (!viewport) {
+      return;
+    }
+    const observer = new ResizeObserver(() => setViewportHeight(viewport.clientHeight));
+    observer.observe(viewport);
+    setViewportHeight(viewport.clientHeight);
+    return () => observer.disconnect();
+  }, [loading]);
+
+  // 滚动位置每帧最多更新一次
+  const handleScroll = (e: UIEvent<HTMLDivElement>) => {
+    const target = e.currentTarget;
+    if (scrollFrame.current !== null) {
+      return;
+    }
+    scrollFrame.current = requestAnimationFrame(() => {
+      scrollFrame.current = null;
+      setScrollTop(target.scrollTop);
+    });
+  };
+
+  useEffect(() => () => {
+    if (scrollFrame.current !== null) {
+      cancelAnimationFrame(scrollFrame.current);
+    }
+  }, []);
+
   const handleSort = (field: string) => {
     if (sortBy === field) {
       setSortOrder(sortOrder === 'asc' ? 'desc' : 'asc');
@@ -65,13 +197,23 @@ export function MonitoringList() {
     }
   };
 
-  const toggleFavorite = (stockCode: string) => {
-    setPairs(pairs.map(pair =>
-      pair.stock_code === stockCode
-        ? { ...pair, is_favorite: !pair.is_favorite }
-        : pair
-    ));
-  };
+  // 引用保持不变，未变化的卡片不会因父组件渲染而重新渲染
+  const toggleFavorite = useCallback((bondCode: string) => {
+    const pair = pairsRef.current.get(bondCode);
+    if (!pair) {
+      return;
+    }
+    const favorites = favoritesRef.current;
+    if (pair.is_favorite) {
+      favorites.delete(bondCode);
+    } else {
+      favorites.add(bondCode);
+    }
+    const next = new Map(pairsRef.current);
+    next.set(bondCode, { ...pair, is_favorite: !pair.is_favorite });
+    pairsRef.current = next;
+    setPairs(next);
+  }, []);
 
   if (loading) {
     return (
@@ -85,10 +227,17 @@ export function MonitoringList() {
     );
   }
 
+  const first = Math.max(0, Math.floor(scrollTop / ROW_HEIGHT) - OVERSCAN);
+  const last = Math.min(order.length, Math.ceil((scrollTop + viewportHeight) / ROW_HEIGHT) + OVERSCAN);
+  const visible = order.slice(first, last);
+
   return (
     <div className="p-6">
       <div className="flex justify-between items-center mb-6">
-        <h2 className="text-2xl font-bold text-gray-900">监控面板</h2>
+        <h2 className="text-2xl font-bold text-gray-900">
+          监控面板
+          <span className="ml-3 text-sm font-normal text-gray-500">共 {order.length} 只</span>
+        </h2>
 
         {/* 控制栏 */}
         <div className="flex items-center space-x-4">
@@ -125,34 +274,79 @@ export function MonitoringList() {
         </div>
       </div>
 
-      {/* 数据列表 */}
-      <div className="space-y-4">
-        {pairs.map((pair) => (
-          <BondStockCard
-            key={pair.stock_code}
-            pair={pair}
-            onToggleFavorite={toggleFavorite}
-          />
-        ))}
-      </div>
-
-      {pairs.length === 0 && (
-        <div className="text-center py-12 text-gray-500">
-          暂无监控数据
+      {/* 数据列表 (虚拟滚动) */}
+      <div
+        ref={viewportRef}
+        onScroll={handleScroll}
+        className="overflow-y-auto"
+        style={{ height: 'calc(100vh - 240px)' }}
+      >
+        <div className="relative" style={{ height: order.length * ROW_HEIGHT }}>
+          {visible.map((bondCode, i) => {
+            const pair = pairs.get(bondCode);
+            return pair ? (
+              <div
+                key={bondCode}
+                className="absolute left-0 right-0"
+                style={{ transform: `translateY(${(first + i) * ROW_HEIGHT}px)`, height: ROW_HEIGHT - ROW_GAP }}
+              >
+                <BondStockCard pair={pair} onToggleFavorite={toggleFavorite} />
+              </div>
+            ) : null;
+          })}
         </div>
-      )}
+
+        {order.length === 0 && (
+          <div className="text-center py-12 text-gray-500">
+            暂无监控数据
+          </div>
+        )}
+      </div>
     </div>
   );
 }
 
+// 价格变动时短暂高亮 (上涨红、下跌绿)，同一行的高亮按 FLASH_MIN_INTERVAL 节流
+function useFlash(value: number) {
+  const [flash, setFlash] = useState<'up' | 'down' | null>(null);
+  const previous = useRef(value);
+  const lastFlash = useRef(0);
+  const timer = useRef<ReturnType<typeof setTimeout> | null>(null);
+
+  useEffect(() => {
+    const before = previous.current;
+    previous.current = value;
+    const now = Date.now();
+    if (value === before || now - lastFlash.current < FLASH_MIN_INTERVAL) {
+      return;
+    }
+    lastFlash.current = now;
+    setFlash(value > before ? 'up' : 'down');
+    timer.current = setTimeout(() => setFlash(null), FLASH_DURATION);
+  }, [value]);
+
+  useEffect(() => () => {
+    if (timer.current !== null) {
+      clearTimeout(timer.current);
+    }
+  }, []);
+
+  return flash === 'up' ? 'bg-red-50' : flash === 'down' ? 'bg-green-50' : '';
+}
+
 interface BondStockCardProps {
   pair: MonitoringPair;
-  onToggleFavorite: (stockCode: string) => void;
+  onToggleFavorite: (bondCode: string) => void;
 }
 
-function BondStockCard({ pair, onToggleFavorite }: BondStockCardProps) {
+// 只在该行数据对象变化时重新渲染
+const BondStockCard = memo(function BondStockCard({ pair, onToggleFavorite }: BondStockCardProps) {
+  // 接口把 Decimal 序列化为字符串，比较前转为数值
+  const stockFlash = useFlash(Number(pair.stock_price));
+  const bondFlash = useFlash(Number(pair.bond_price));
+
   return (
-    <div className="bg-white border border-gray-200 rounded-lg p-6 hover:shadow-md transition-shadow">
+    <div className="h-full overflow-hidden bg-white border border-gray-200 rounded-lg p-6 hover:shadow-md transition-shadow">
       <div className="flex items-center justify-between">
         {/* 股票信息 */}
         <div className="flex-1">
@@ -167,7 +361,7 @@ function BondStockCard({ pair, onToggleFavorite }: BondStockCardProps) {
               {pair.stock_change >= 0 ? '+' : ''}{pair.stock_change}%
             </span>
           </div>
-          <div className="text-2xl font-bold text-gray-900 mb-1">
+          <div className={`inline-block rounded px-1 -mx-1 text-2xl font-bold text-gray-900 mb-1 transition-colors duration-500 ${stockFlash}`}>
             ¥{pair.stock_price.toFixed(2)}
           </div>
           <div className="text-sm text-gray-600">
@@ -203,7 +397,7 @@ function BondStockCard({ pair, onToggleFavorite }: BondStockCardProps) {
               {pair.bond_change >= 0 ? '+' : ''}{pair.bond_change}%
             </span>
           </div>
-          <div className="text-2xl font-bold text-gray-900 mb-1">
+          <div className={`inline-block rounded px-1 -mx-1 text-2xl font-bold text-gray-900 mb-1 transition-colors duration-500 ${bondFlash}`}>
             ¥{pair.bond_price.toFixed(2)}
           </div>
           <div className="grid grid-cols-2 gap-2 text-sm">
@@ -244,7 +438,7 @@ function BondStockCard({ pair, onToggleFavorite }: BondStockCardProps) {
             📊 详情
           </button>
           <button
-            onClick={() => onToggleFavorite(pair.stock_code)}
+            onClick={() => onToggleFavorite(pair.bond_code)}
             className={`px-4 py-2 rounded-md transition-colors text-sm font-medium ${
               pair.is_favorite
                 ? 'bg-yellow-500 text-white hover:bg-yellow-600'
@@ -264,4 +458,4 @@ function BondStockCard({ pair, onToggleFavorite }: BondStockCardProps) {
       </div>
     </div>
   );
-}
+});